@@ -0,0 +1,169 @@
+"""
+wall time, rows/s and peak RSS of the main GAn operations, optionally checked against a stored baseline.
+every operation runs in a fresh interpreter so that peak RSS is its own (it includes the build_db the
+other operations start from)
+
+usage: python benchmarks/bench_ops.py <annotation> [gff|gtf] [--storage dict|columnar|sqlite] [--ops OP,...]
+                                      [--repeat N] [--workers N] [--save baseline.json] [--baseline baseline.json]
+                                      [--tolerance 0.2]
+annotation: any gff3 / gtf, e.g. one written by benchmarks/synth.py
+exits with status 1 when an operation is slower or uses more memory than baseline * (1 + tolerance)
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from mjol.gan import GAn, load_from_gix
+from mjol.tools import solve_synonym
+
+OPS = ['build_db', 'build_db_parallel', 'to_gff', 'pop_feature', 'solve_synonym', 'gix']
+SAMPLE = 1000 # genes popped / replaced by pop_feature and solve_synonym
+METRICS = ['seconds', 'peak_rss_mb'] # lower is better
+
+def _build(args, n_workers : int = 1):
+    kw = {'db_path' : os.path.join(args.tmp, 'bench.db')} if args.storage == 'sqlite' else {}
+    gan = GAn(file_name=args.annotation, file_fmt=args.fmt, storage=args.storage, **kw)
+    gan.build_db(n_workers=n_workers)
+    return gan
+
+def _genes(gan) -> list:
+    # top-level features, evenly spaced
+    roots = [uid for uid, f in gan.features.items() if f.puid is None]
+    step = max(len(roots) // SAMPLE, 1)
+    return roots[::step][:SAMPLE]
+
+def op_build_db(args) -> tuple:
+    t0 = time.perf_counter()
+    gan = _build(args)
+    return len(gan.features), time.perf_counter() - t0
+
+def op_build_db_parallel(args) -> tuple:
+    # capped at the CPUs available to the process: compare with build_db on a multi-core machine
+    t0 = time.perf_counter()
+    gan = _build(args, args.workers)
+    return len(gan.features), time.perf_counter() - t0
+
+def op_to_gff(args) -> tuple:
+    gan = _build(args)
+    t0 = time.perf_counter()
+    gan.to_gff(os.path.join(args.tmp, 'bench.' + args.fmt), sort=True)
+    return len(gan.features), time.perf_counter() - t0
+
+def op_pop_feature(args) -> tuple:
+    gan = _build(args)
+    n = len(gan.features)
+    genes = _genes(gan)
+    t0 = time.perf_counter()
+    for uid in genes:
+        gan.pop_feature(uid)
+    return n - len(gan.features), time.perf_counter() - t0
+
+def op_solve_synonym(args) -> tuple:
+    original, new = _build(args), _build(args)
+    genes = _genes(original)
+    n = 0
+    t0 = time.perf_counter()
+    for uid in genes:
+        old_entries, _ = solve_synonym(original, uid, new, uid)
+        n += len(old_entries.splitlines())
+    return n, time.perf_counter() - t0
+
+def op_gix(args) -> tuple:
+    gan = _build(args)
+    fp = os.path.join(args.tmp, 'bench.gix')
+    t0 = time.perf_counter()
+    gan.save_as_gix(fp)
+    res = load_from_gix(fp)
+    n = sum(1 for _ in res.features.values())
+    return n, time.perf_counter() - t0
+
+def run_op(args) -> dict:
+    """
+    runs one operation in this process; peak RSS is read from getrusage (KiB on linux)
+    """
+    fn = globals()['op_' + args.op]
+    best = None
+    for _ in range(args.repeat):
+        rows, dt = fn(args)
+        best = dt if best is None else min(best, dt)
+    return {
+        'rows' : rows,
+        'seconds' : best,
+        'rows_per_sec' : rows / best if best else 0.0,
+        'peak_rss_mb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+def run_all(args) -> dict:
+    res = {}
+    for op in args.ops:
+        cmd = [
+            sys.executable, __file__, args.annotation, args.fmt, '--op', op,
+            '--storage', args.storage, '--repeat', str(args.repeat), '--workers', str(args.workers)
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        res[op] = json.loads(out.splitlines()[-1])
+    return res
+
+def compare(res : dict, baseline : dict, tolerance : float) -> list[str]:
+    """
+    (op, metric) pairs worse than baseline by more than tolerance
+    """
+    worse = []
+    for op, r in res.items():
+        if op not in baseline:
+            continue
+        for k in METRICS:
+            if baseline[op][k] and r[k] > baseline[op][k] * (1 + tolerance):
+                worse.append(f'{op} {k}')
+    return worse
+
+def report(res : dict, baseline : dict = None):
+    print('op\trows\tseconds\trows/s\tpeak RSS (MB)' + ('\tvs baseline' if baseline else ''))
+    for op, r in res.items():
+        line = f"{op}\t{r['rows']}\t{r['seconds']:.3f}\t{r['rows_per_sec']:,.0f}\t{r['peak_rss_mb']:.1f}"
+        if baseline and op in baseline:
+            b = baseline[op]
+            line += f"\ttime x{r['seconds'] / b['seconds']:.2f}, rss x{r['peak_rss_mb'] / b['peak_rss_mb']:.2f}"
+        print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GAn operation benchmarks')
+    parser.add_argument('annotation')
+    parser.add_argument('fmt', nargs='?', default='gff', choices=['gff', 'gtf'])
+    parser.add_argument('--storage', default='dict', choices=['dict', 'columnar', 'sqlite'])
+    parser.add_argument('--ops', type=lambda s : s.split(','), default=OPS, help=f'comma-separated subset of {OPS}')
+    parser.add_argument('--repeat', type=int, default=1, help='best of N runs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='n_workers of build_db_parallel')
+    parser.add_argument('--save', help='write the results as a baseline')
+    parser.add_argument('--baseline', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--op', choices=OPS, help=argparse.SUPPRESS) # worker mode
+    args = parser.parse_args()
+    unknown = [op for op in args.ops if op not in OPS]
+    if unknown:
+        parser.error(f'unknown ops {unknown} (expected: {OPS})')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.tmp = tmp
+        if args.op:
+            print(json.dumps(run_op(args)))
+            sys.exit(0)
+        res = run_all(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    report(res, baseline)
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(res, fh, indent=2)
+    if baseline:
+        worse = compare(res, baseline, args.tolerance)
+        if worse:
+            print(f'regressions (> {args.tolerance:.0%} over baseline): ' + ', '.join(worse))
+            sys.exit(1)
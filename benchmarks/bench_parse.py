@@ -0,0 +1,44 @@
+"""
+rows/s of the streaming reader vs. the legacy pandas round-trip used by build_db
+
+usage: python benchmarks/bench_parse.py <annotation> [gff|gtf]
+exits with status 1 when the streaming reader is below TARGET_ROWS_PER_SEC
+"""
+import sys
+import time
+from mjol.parser import HDR, FLUSH, read_gff
+from mjol.utils import load_attributes
+
+# streaming reader target on a single core (GENCODE-like gff3, plain text)
+TARGET_ROWS_PER_SEC = 250_000
+
+def pandas_rows(file_name : str, file_fmt : str):
+    import pandas as pd
+    in_df = pd.read_csv(file_name, sep='\t', comment='#', header=None)
+    in_df.columns = HDR
+    in_df['attributes'] = in_df['attributes'].apply(
+        lambda s : load_attributes(
+            s, kv_sep=' ' if file_fmt.lower() == 'gtf' else '='
+        )
+    )
+    return in_df.to_dict('records')
+
+def streaming_rows(file_name : str, file_fmt : str):
+    return [row for row in read_gff(file_name, file_fmt) if row is not FLUSH]
+
+def timeit(fn, *args):
+    t0 = time.perf_counter()
+    rows = fn(*args)
+    return len(rows), time.perf_counter() - t0
+
+if __name__ == '__main__':
+    file_name = sys.argv[1]
+    file_fmt = sys.argv[2] if len(sys.argv) > 2 else 'gff'
+    rate = {}
+    for name, fn in [('pandas', pandas_rows), ('streaming', streaming_rows)]:
+        n, dt = timeit(fn, file_name, file_fmt)
+        rate[name] = n / dt
+        print(f'{name}\t{n} rows\t{dt:.3f} s\t{rate[name]:,.0f} rows/s')
+    ok = rate['streaming'] >= TARGET_ROWS_PER_SEC
+    print(f'target\t{TARGET_ROWS_PER_SEC:,} rows/s (streaming)\t{"PASS" if ok else "FAIL"}')
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,162 @@
+"""
+synthetic gene / transcript / exon / CDS hierarchies in gff3 or gtf, up to GENCODE scale
+(~60k genes, ~250k transcripts, ~1.6M exons: --genes 60000 --isoforms 8 --exons 12)
+
+every gene has a pool of exons; its transcripts take ordered subsets of the pool (shared exons,
+alternative first / last exons), coding genes get CDS segments. with --collision-rate, that fraction of
+genes is copied with the same IDs onto the last chromosome (PAR-like; onto the same chromosome,
+further downstream, when there is only one)
+
+usage: python benchmarks/synth.py <output> [--genes N] [--isoforms K] [--exons E] [--chrs C]
+                                           [--collision-rate R] [--fmt gff|gtf] [--seed S]
+"""
+import argparse
+import random
+
+CODING = 0.7 # fraction of protein_coding genes
+INTERGENIC = (1_000, 20_000)
+EXON_LENGTH = (50, 400)
+INTRON_LENGTH = (80, 5_000)
+FLUSH_LINES = 1 << 14
+
+def _gene(rng : random.Random, start : int, isoforms : int, exons : int) -> tuple:
+    """
+    (end, strand, coding, transcripts) for a gene starting at start; transcripts are exon lists
+    """
+    pool, pos = [], start
+    for _ in range(rng.randint(1, exons)):
+        length = rng.randint(*EXON_LENGTH)
+        pool.append((pos, pos + length - 1))
+        pos += length + rng.randint(*INTRON_LENGTH)
+    transcripts = [pool]
+    for _ in range(rng.randint(1, isoforms) - 1):
+        if len(pool) == 1:
+            s, e = pool[0]
+            transcripts.append([(s + rng.randint(0, (e - s) // 2), e)])
+            continue
+        kept = [x for x in pool[1:-1] if rng.random() < 0.7]
+        first = rng.randint(0, len(pool) - 2)
+        last = rng.randint(first + 1, len(pool) - 1)
+        transcripts.append([pool[first]] + [x for x in kept if pool[first] < x < pool[last]] + [pool[last]])
+    return pool[-1][1], rng.choice('+-'), rng.random() < CODING, transcripts
+
+def _cds(chain : list, strand : str) -> list:
+    """
+    (start, end, phase) of the CDS segments: the chain minus ~half of the first and last exon
+    """
+    if len(chain) == 1:
+        s, e = chain[0]
+        lo, hi = s + (e - s) // 4, e - (e - s) // 4
+        return [(lo, hi, 0)] if lo < hi else []
+    segs = [((chain[0][0] + chain[0][1]) // 2, chain[0][1])] + chain[1:-1] + [(chain[-1][0], (chain[-1][0] + chain[-1][1]) // 2)]
+    res, done = [], 0
+    for s, e in (segs if strand == '+' else segs[::-1]):
+        res.append((s, e, (3 - done % 3) % 3))
+        done += e - s + 1
+    return res if strand == '+' else res[::-1]
+
+def _gff_lines(chr : str, gid : str, name : str, start : int, end : int, strand : str, coding : bool, transcripts : list):
+    biotype = 'protein_coding' if coding else 'lncRNA'
+    yield f'{chr}\tsynth\tgene\t{start}\t{end}\t.\t{strand}\t.\tID={gid};Name={name};gene_type={biotype}\n'
+    for i, chain in enumerate(transcripts):
+        tid = f'{gid}.t{i}'
+        ttype = 'mRNA' if coding else 'lnc_RNA'
+        yield f'{chr}\tsynth\t{ttype}\t{chain[0][0]}\t{chain[-1][1]}\t.\t{strand}\t.\tID={tid};Parent={gid};transcript_type={biotype}\n'
+        for j, (s, e) in enumerate(chain):
+            yield f'{chr}\tsynth\texon\t{s}\t{e}\t.\t{strand}\t.\tID={tid}.e{j};Parent={tid}\n'
+        if coding:
+            for s, e, phase in _cds(chain, strand):
+                yield f'{chr}\tsynth\tCDS\t{s}\t{e}\t.\t{strand}\t{phase}\tID={tid}.cds;Parent={tid}\n'
+    yield '###\n'
+
+def _gtf_lines(chr : str, gid : str, name : str, start : int, end : int, strand : str, coding : bool, transcripts : list):
+    biotype = 'protein_coding' if coding else 'lncRNA'
+    g = f'gene_id "{gid}"; gene_name "{name}"; gene_type "{biotype}";'
+    yield f'{chr}\tsynth\tgene\t{start}\t{end}\t.\t{strand}\t.\t{g}\n'
+    for i, chain in enumerate(transcripts):
+        t = f'{g} transcript_id "{gid}.t{i}";'
+        yield f'{chr}\tsynth\ttranscript\t{chain[0][0]}\t{chain[-1][1]}\t.\t{strand}\t.\t{t}\n'
+        for j, (s, e) in enumerate(chain):
+            yield f'{chr}\tsynth\texon\t{s}\t{e}\t.\t{strand}\t.\t{t} exon_number "{j + 1}";\n'
+        if coding:
+            for s, e, phase in _cds(chain, strand):
+                yield f'{chr}\tsynth\tCDS\t{s}\t{e}\t.\t{strand}\t{phase}\t{t}\n'
+
+def generate(
+    output : str,
+    genes : int = 1000,
+    isoforms : int = 4,
+    exons : int = 10,
+    chrs : int = 3,
+    collision_rate : float = 0.0,
+    file_fmt : str = 'gff',
+    seed : int = 0
+) -> int:
+    """
+    writes the annotation to output and returns its number of feature lines;
+    genes are spread evenly over chr1..chr<chrs>, isoforms / exons are per-gene maxima
+    """
+    if file_fmt not in ['gff', 'gtf']:
+        raise ValueError(f'unknown file format {file_fmt} (expected: [gff, gtf])')
+    rng = random.Random(seed)
+    lines = _gtf_lines if file_fmt == 'gtf' else _gff_lines
+    names = [f'chr{i + 1}' for i in range(chrs)]
+    per_chr = [genes // chrs + (i < genes % chrs) for i in range(chrs)]
+    blocks = {c : [] for c in names}
+    reach = {}
+    g = 0
+    for c, n in zip(names, per_chr):
+        pos = 1
+        for _ in range(n):
+            start = pos + rng.randint(*INTERGENIC)
+            end, strand, coding, transcripts = _gene(rng, start, isoforms, exons)
+            blocks[c].append((f'ENSSG{g:011d}', f'SG{g}', start, end, strand, coding, transcripts))
+            pos = end
+            g += 1
+        reach[c] = pos
+
+    # same-ID copies, after the genes of the target chromosome
+    target = names[-1]
+    shift = reach[target] + INTERGENIC[1]
+    copies = []
+    for c in names:
+        for gid, name, start, end, strand, coding, transcripts in blocks[c]:
+            if rng.random() < collision_rate:
+                moved = [[(s + shift, e + shift) for s, e in chain] for chain in transcripts]
+                copies.append((gid, name, start + shift, end + shift, strand, coding, moved))
+    copies.sort(key=lambda b : b[2])
+    blocks[target].extend(copies)
+    if copies:
+        reach[target] = max(reach[target], copies[-1][3])
+
+    n = 0
+    with open(output, 'w') as out:
+        buf = []
+        if file_fmt == 'gff':
+            buf.append('##gff-version 3\n')
+            buf.extend(f'##sequence-region {c} 1 {reach[c] + INTERGENIC[0]}\n' for c in names)
+        for c in names:
+            for block in blocks[c]:
+                for line in lines(c, *block):
+                    if line[0] != '#':
+                        n += 1
+                    buf.append(line)
+                if len(buf) >= FLUSH_LINES:
+                    out.write(''.join(buf))
+                    buf = []
+        out.write(''.join(buf))
+    return n
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='synthetic gff3 / gtf annotation')
+    parser.add_argument('output')
+    parser.add_argument('--genes', type=int, default=1000)
+    parser.add_argument('--isoforms', type=int, default=4, help='max transcripts per gene')
+    parser.add_argument('--exons', type=int, default=10, help='max exons per gene')
+    parser.add_argument('--chrs', type=int, default=3)
+    parser.add_argument('--collision-rate', type=float, default=0.0, help='fraction of genes copied with the same IDs')
+    parser.add_argument('--fmt', default='gff', choices=['gff', 'gtf'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    n = generate(args.output, args.genes, args.isoforms, args.exons, args.chrs, args.collision_rate, args.fmt, args.seed)
+    print(f'{args.output}\t{n} rows')
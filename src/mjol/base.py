@@ -1,16 +1,150 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List, ForwardRef
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, ForwardRef, Union
+from mjol.utils import Attributes, attributes_str
 import hashlib
+import xxhash
+
+# sha256 -> 64-char hex str; xxh64 / xxh128 -> int hash of the same line; seq -> int handle assigned by GAn
+UID_MODES = ['sha256', 'xxh64', 'xxh128', 'seq']
 
 class GId(BaseModel):
-    uid : Optional[str] = None
+    uid : Optional[Union[str, int]] = None
     aid : Optional[str] = None
     paid : Optional[str] = None # parent_aid
-    puid : Optional[str] = None # parent_uid
+    puid : Optional[Union[str, int]] = None # parent_uid
 
 GFeatureRef = ForwardRef("GFeature")
 
+def bare_model(cls, values : dict):
+    """
+    model_construct without defaults / validation: values must hold every field
+    (used for the many GFeature views built from already-typed columns)
+    """
+    m = cls.__new__(cls)
+    object.__setattr__(m, '__dict__', values)
+    object.__setattr__(m, '__pydantic_fields_set__', set(values))
+    object.__setattr__(m, '__pydantic_extra__', None)
+    object.__setattr__(m, '__pydantic_private__', None)
+    return m
+
+class Children:
+    """
+    child features in insertion order, keyed by uid: O(1) append / remove / membership.
+    a child whose uid changed after insertion is still found by identity (see rekey)
+    """
+    __slots__ = ('_d',)
+
+    def __init__(self, features = ()):
+        self._d = {}
+        self.extend(features)
+
+    def append(self, f):
+        self._d[f.uid] = f
+
+    def extend(self, fs):
+        for f in fs:
+            self._d[f.uid] = f
+
+    def discard(self, f) -> bool:
+        if self._d.get(f.uid) is f:
+            del self._d[f.uid]
+            return True
+        for k, v in self._d.items():
+            if v is f:
+                del self._d[k]
+                return True
+        return False
+
+    def remove(self, f):
+        if not self.discard(f):
+            raise ValueError(f'{f!r} is not a child')
+
+    def rekey(self):
+        """
+        re-keys children whose uid changed since insertion (order is kept)
+        """
+        self._d = {f.uid : f for f in self._d.values()}
+
+    def get(self, uid, default = None):
+        return self._d.get(uid, default)
+
+    def __getitem__(self, i):
+        return list(self._d.values())[i]
+
+    def __contains__(self, f) -> bool:
+        return f.uid in self._d
+
+    def __iter__(self):
+        return iter(self._d.values())
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Children):
+            other = list(other._d.values())
+        return list(self._d.values()) == other
+
+    def __repr__(self) -> str:
+        return repr(list(self._d.values()))
+
+def uid_line(chr, src, feature_type, start, end, score, strand, frame, attributes) -> str:
+    """
+    the gtf/gff line hashed into a uid
+    """
+    s = f'{chr}\t{src}\t{feature_type}\t{start}\t{end}\t'
+    s += f'{'.' if not score else score}\t{strand}\t{frame}\t'
+    s += attributes_str(attributes)
+    return s
+
+def make_uid(
+    chr, src, feature_type, start, end, score, strand, frame, attributes, uid_mode : str = 'sha256'
+) -> Union[str, int]:
+    """
+    hashes the entire gtf/gff line to obtain a uid
+    """
+    s = uid_line(chr, src, feature_type, start, end, score, strand, frame, attributes).encode()
+    if uid_mode == 'xxh64':
+        return xxhash.xxh3_64_intdigest(s)
+    if uid_mode == 'xxh128':
+        return xxhash.xxh3_128_intdigest(s)
+    if uid_mode == 'sha256':
+        return hashlib.sha256(s).hexdigest()
+    raise ValueError(f'uid mode {uid_mode} is not hash-based (expected: [sha256, xxh64, xxh128])')
+
+def uid_to_str(uid, uid_mode : str = 'sha256') -> str:
+    if uid_mode == 'xxh64':
+        return f'{uid:016x}'
+    if uid_mode == 'xxh128':
+        return f'{uid:032x}'
+    return str(uid)
+
+def str_to_uid(s : str, uid_mode : str = 'sha256') -> Union[str, int]:
+    if uid_mode in ['xxh64', 'xxh128']:
+        return int(s, 16)
+    if uid_mode == 'seq':
+        return int(s)
+    return s
+
+def format_entry(chr, src, feature_type, start, end, score, strand, frame, attributes) -> str:
+    score = score if score and score >= 0.0 else '.'
+    return "\t".join([
+        str(x) if x is not None else '.' for x in [
+            chr, src, feature_type, start, end, score, strand, frame, attributes_str(attributes)
+        ]
+    ]) + '\n'
+
+def infer_attribute(attributes : dict, ak : str):
+    if isinstance(attributes, Attributes):
+        return attributes.get_ci(ak)
+    for k, v in attributes.items():
+        if ak.lower() == k.lower():
+            return v
+    return None
+
 class GFeature(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     chr : str
     src : str
     feature_type : str
@@ -19,12 +153,27 @@ class GFeature(BaseModel):
     score : Optional[float]
     strand : str # ['.', '-', '+']
     frame : str # ['.', '0', '1', '2']
-    attributes : Dict[str, str]
-    children : List[GFeatureRef] = Field(default_factory=list) # type: ignore
+    attributes : Attributes # lazily parsed; plain dicts are wrapped
+    children : Children = Field(default_factory=Children) # uid-keyed, insertion-ordered
     iak : str
     pak : str
+    uid_mode : str = 'sha256'
     gid : GId = Field(default_factory=GId)
 
+    @field_validator('attributes', mode='before')
+    @classmethod
+    def _wrap_attributes(cls, v):
+        if isinstance(v, Attributes):
+            return v
+        return Attributes(data=v)
+
+    @field_validator('children', mode='before')
+    @classmethod
+    def _wrap_children(cls, v):
+        if isinstance(v, Children):
+            return v
+        return Children(v)
+
     def __init__(self, **data):
         super().__init__(**data)
         self._populate_gid()
@@ -38,20 +187,16 @@ class GFeature(BaseModel):
         self.gid.paid = self._infer(self.pak)
 
     def _infer(self, ak):
-        for k, v in self.attributes.items():
-            if ak.lower() == k.lower():
-                return v
-        return None
+        return infer_attribute(self.attributes, ak)
 
     def _assign_uid(self):
-        """
-        hashes the entire gtf/gff line to obtain a uid
-        """
-        s = f'{self.chr}\t{self.src}\t{self.feature_type}\t{self.start}\t{self.end}\t'
-        s += f'{'.' if not self.score else self.score}\t{self.strand}\t{self.frame}\t'
-        s += ';'.join([f'{k}={v}' for k, v in self.attributes.items()])
-        uid = hashlib.sha256(s.encode()).hexdigest()
-        return uid
+        if self.uid_mode == 'seq':
+            # sequential handles are assigned (and kept) by GAn
+            return self.gid.uid
+        return make_uid(
+            self.chr, self.src, self.feature_type, self.start, self.end,
+            self.score, self.strand, self.frame, self.attributes, self.uid_mode
+        )
     
     def add_a_child(self, child):
         self.children.append(child)
@@ -66,25 +211,33 @@ class GFeature(BaseModel):
         end_offset : int = 0,
         include_children : bool = False
     ) -> str:
-        attributes_str =";".join(f"{key}={value}" for key, value in self.attributes.items())
-        score = self.score if self.score and self.score >= 0.0 else '.'
-        start = self.start + start_offset
-        end = self.end + end_offset
-        entry = "\t".join([
-            str(x) if x is not None else '.' for x in [
-                self.chr, self.src, self.feature_type, start, end, score, self.strand, self.frame, attributes_str
-            ]
-        ])
+        entry = format_entry(
+            self.chr, self.src, self.feature_type, self.start + start_offset, self.end + end_offset,
+            self.score, self.strand, self.frame, self.attributes
+        )
         if include_children:
             children_entry = [
                 child.to_gff_entry(
                     start_offset = start_offset,
-                    end_offset = end_offset,
-                    include_children = True
-                ) for child in self.children
+                    end_offset = end_offset
+                ) for child in self.iter_desc()
             ]
-            return entry + '\n' + ''.join(children_entry)
-        return entry + '\n'
+            return entry + ''.join(children_entry)
+        return entry
+
+    def iter_desc(self):
+        """
+        lazily yields the descendants in preorder (children in order), without recursion
+        """
+        stack = [iter(self.children)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                continue
+            yield child
+            if child.children:
+                stack.append(iter(child.children))
     
     def calc_sim(self, other):
         score = 0
@@ -0,0 +1,218 @@
+"""
+BGZF (blocked gzip, as written by bgzip) reader / writer with virtual offsets:
+voffset = (compressed offset of the block << 16) | offset within the uncompressed block
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import struct
+import zlib
+
+BLOCK_SIZE = 0xff00 # max uncompressed bytes per block
+BATCH = 16 # blocks per (de)compression task
+HEADER = struct.Struct('<4BI2BH2BHH')
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+def is_bgzf(file_path : str) -> bool:
+    with open(file_path, 'rb') as fh:
+        head = fh.read(HEADER.size)
+    if len(head) < HEADER.size:
+        return False
+    id1, id2, _, flg, _, _, _, _, si1, si2, _, _ = HEADER.unpack(head)
+    return (id1, id2) == (31, 139) and flg & 4 and (si1, si2) == (66, 67)
+
+def compress_block(data : bytes, level : int = 6) -> bytes:
+    c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = c.compress(data) + c.flush()
+    # BSIZE = total block size - 1 (18-byte header, 8-byte footer)
+    header = HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25)
+    return header + cdata + struct.pack('<II', zlib.crc32(data), len(data))
+
+def _raw_block(fh) -> tuple[bytes, int]:
+    """
+    (deflate payload, size of the compressed block) of the block at the current position;
+    (b'', 0) at end of file
+    """
+    head = fh.read(HEADER.size)
+    if not head:
+        return b'', 0
+    id1, id2, _, flg, _, _, _, xlen, si1, si2, _, bsize = HEADER.unpack(head)
+    if (id1, id2) != (31, 139) or not flg & 4 or (si1, si2) != (66, 67):
+        raise ValueError('not a BGZF block (compress with mjol.bgzf.bgzip or htslib bgzip)')
+    rest = fh.read(bsize + 1 - HEADER.size)
+    return rest[xlen - 6:-8], bsize + 1
+
+def _inflate(payloads : list) -> list:
+    return [zlib.decompress(p, -15) for p in payloads]
+
+def read_block(fh, coffset : int = None) -> tuple[bytes, int]:
+    """
+    (uncompressed data, size of the compressed block) of the block at coffset (default: current position);
+    (b'', 0) at end of file
+    """
+    if coffset is not None:
+        fh.seek(coffset)
+    payload, size = _raw_block(fh)
+    return (zlib.decompress(payload, -15) if size else b''), size
+
+def read_blocks(file_path : str, n_threads : int = 1):
+    """
+    uncompressed blocks in file order; n_threads > 1 inflates batches of blocks
+    in a thread pool (zlib releases the GIL) while earlier blocks are consumed
+    """
+    with open(file_path, 'rb') as fh:
+        if n_threads <= 1:
+            while True:
+                data, size = read_block(fh)
+                if not size:
+                    return
+                yield data
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            pending = deque()
+            while True:
+                batch = []
+                for _ in range(BATCH):
+                    payload, size = _raw_block(fh)
+                    if not size:
+                        break
+                    batch.append(payload)
+                if not batch:
+                    while pending:
+                        yield from pending.popleft().result()
+                    return
+                pending.append(executor.submit(_inflate, batch))
+                if len(pending) > 2 * n_threads:
+                    yield from pending.popleft().result()
+
+def read_lines(file_path : str, n_threads : int = 1):
+    """
+    text lines (without the trailing newline) of a BGZF file (see read_blocks)
+    """
+    carry = b''
+    for data in read_blocks(file_path, n_threads):
+        i = data.rfind(b'\n')
+        if i == -1:
+            carry += data
+            continue
+        yield from (carry + data[:i]).decode().split('\n')
+        carry = data[i + 1:]
+    if carry:
+        yield carry.decode()
+
+class BgzfWriter:
+    """
+    n_threads > 1 deflates batches of blocks in a thread pool; tell() is only
+    available with n_threads = 1 (block offsets are not known ahead of compression)
+    """
+    def __init__(self, file_path : str, level : int = 6, n_threads : int = 1):
+        self.fh = open(file_path, 'wb')
+        self.level = level
+        self.buf = bytearray()
+        self.n_threads = n_threads
+        self.executor = ThreadPoolExecutor(max_workers=n_threads) if n_threads > 1 else None
+        self.todo = [] # full blocks waiting for a batch
+        self.pending = deque()
+
+    def tell(self) -> int:
+        if self.executor is not None:
+            raise RuntimeError('tell() is not available with n_threads > 1')
+        return (self.fh.tell() << 16) | len(self.buf)
+
+    def _deflate(self, blocks : list) -> bytes:
+        return b''.join([compress_block(b, self.level) for b in blocks])
+
+    def _put(self, block : bytes, final : bool = False):
+        if self.executor is None:
+            self.fh.write(compress_block(block, self.level))
+            return
+        if block:
+            self.todo.append(block)
+        if len(self.todo) >= BATCH or (final and self.todo):
+            self.pending.append(self.executor.submit(self._deflate, self.todo))
+            self.todo = []
+        while self.pending and (final or len(self.pending) > 2 * self.n_threads):
+            self.fh.write(self.pending.popleft().result())
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.buf += data
+        while len(self.buf) >= BLOCK_SIZE:
+            self._put(bytes(self.buf[:BLOCK_SIZE]))
+            del self.buf[:BLOCK_SIZE]
+
+    def close(self):
+        if self.buf:
+            self._put(bytes(self.buf))
+            self.buf.clear()
+        if self.executor is not None:
+            self._put(b'', final=True)
+            self.executor.shutdown()
+        self.fh.write(EOF_BLOCK)
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BgzfReader:
+    def __init__(self, file_path : str):
+        self.fh = open(file_path, 'rb')
+        self._load(0)
+
+    def _load(self, coffset : int):
+        self.coffset = coffset # offset of the current block
+        self.data, size = read_block(self.fh, coffset)
+        self.next_coffset = coffset + size
+        self.eof = size == 0
+        self.pos = 0
+
+    def _advance(self) -> bool:
+        # moves past exhausted (or empty) blocks; False at end of file
+        while self.pos == len(self.data):
+            if self.eof:
+                return False
+            self._load(self.next_coffset)
+        return True
+
+    def seek(self, voffset : int):
+        self._load(voffset >> 16)
+        self.pos = voffset & 0xffff
+
+    def tell(self) -> int:
+        self._advance()
+        return (self.coffset << 16) | self.pos
+
+    def readline(self) -> bytes:
+        parts = []
+        while True:
+            if not self._advance():
+                break
+            i = self.data.find(b'\n', self.pos)
+            if i != -1:
+                parts.append(self.data[self.pos:i + 1])
+                self.pos = i + 1
+                break
+            parts.append(self.data[self.pos:])
+            self.pos = len(self.data)
+        return b''.join(parts)
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def bgzip(src : str, dst : str = None, level : int = 6, n_threads : int = 1) -> str:
+    """
+    compresses src into BGZF (default: src + '.gz')
+    """
+    dst = dst or src + '.gz'
+    with open(src, 'rb') as fh, BgzfWriter(dst, level, n_threads) as out:
+        for chunk in iter(lambda : fh.read(1 << 20), b''):
+            out.write(chunk)
+    return dst
@@ -0,0 +1,136 @@
+"""
+on-disk cache of built annotations (GAn(cache_dir=...).build_db) as .gix files.
+an entry is named <settings key>-<input key>.gix: the settings key covers the input path and the build
+settings (file_fmt, iak, pak, coord_system, uid_mode), the input key covers the input (size and mtime, or
+its content hash) and the mjol code (version and a hash of its sources) / .gix version. storing an entry removes the stale ones of the same settings;
+the least recently used entries are evicted once the directory grows past max_bytes
+"""
+from mjol.gix import VERSION as GIX_VERSION, save_gix
+from importlib.metadata import version, PackageNotFoundError
+import functools
+import hashlib
+import json
+import os
+import xxhash
+
+CACHE_MAX_BYTES = 4 << 30
+CACHE_KEYS = ['stat', 'content']
+EXT = '.gix'
+CHUNK = 1 << 20
+
+def mjol_version() -> str:
+    try:
+        return version('mjol')
+    except PackageNotFoundError:
+        return 'dev'
+
+@functools.cache
+def code_key() -> str:
+    """
+    mjol version and xxh128 of its sources: an edited checkout (version 'dev') gets new entries too
+    """
+    h = xxhash.xxh128()
+    pkg = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(pkg)):
+        if name.endswith('.py'):
+            h.update(name.encode())
+            with open(os.path.join(pkg, name), 'rb') as fh:
+                h.update(fh.read())
+    return f'{mjol_version()}+{h.hexdigest()}'
+
+def input_key(file_name : str, by : str = 'stat') -> str:
+    """
+    'stat': size and mtime of file_name; 'content': xxh128 of its bytes
+    """
+    if by not in CACHE_KEYS:
+        raise ValueError(f'unknown cache key {by} (expected: {CACHE_KEYS})')
+    if by == 'stat':
+        st = os.stat(file_name)
+        return f'{st.st_size}:{st.st_mtime_ns}'
+    h = xxhash.xxh128()
+    with open(file_name, 'rb') as fh:
+        while chunk := fh.read(CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _digest(obj : dict) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:16]
+
+def entry_path(cache_dir : str, file_name : str, settings : dict, by : str = 'stat') -> str:
+    prefix = _digest({'path' : os.path.abspath(file_name), **settings})
+    key = _digest({'input' : input_key(file_name, by), 'mjol' : code_key(), 'gix' : GIX_VERSION})
+    return os.path.join(cache_dir, f'{prefix}-{key}{EXT}')
+
+def _entries(cache_dir : str) -> list[tuple]:
+    """
+    (last use, size, path) of every entry
+    """
+    res = []
+    if not os.path.isdir(cache_dir):
+        return res
+    for name in os.listdir(cache_dir):
+        if not name.endswith(EXT):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError: # evicted concurrently
+            continue
+        res.append((st.st_mtime_ns, st.st_size, path))
+    return res
+
+def hit(path : str) -> bool:
+    """
+    whether the entry exists; marks it as used (its mtime is the LRU clock)
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def discard(path : str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def store(gan, path : str, max_bytes : int = CACHE_MAX_BYTES):
+    """
+    writes gan to path (atomically), drops the stale entries of the same settings, then evicts
+    least recently used entries (never path) until the cache fits in max_bytes
+    """
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        save_gix(gan, tmp)
+        os.replace(tmp, path)
+    finally:
+        discard(tmp)
+    prefix = os.path.basename(path).split('-')[0] + '-'
+    for _, _, p in _entries(cache_dir):
+        if p != path and os.path.basename(p).startswith(prefix):
+            discard(p)
+    evict(cache_dir, max_bytes, keep=path)
+
+def evict(cache_dir : str, max_bytes : int = CACHE_MAX_BYTES, keep : str = None) -> list[str]:
+    """
+    removes least recently used entries until the cache holds at most max_bytes; returns the removed paths
+    """
+    entries = sorted(_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        discard(path)
+        removed.append(path)
+        total -= size
+    return removed
+
+def clear_cache(cache_dir : str):
+    for _, _, path in _entries(cache_dir):
+        discard(path)
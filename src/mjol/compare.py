@@ -0,0 +1,202 @@
+"""
+gffcompare-like comparison of a query annotation against a reference:
+transcripts (parents of exons) are matched per (chr, strand) by a sorted sweep
+and classified as one of CLASSES; sensitivity / precision are reported at the
+base, exon, intron, intron chain, transcript and gene levels
+"""
+from mjol.gan import GAn
+from mjol.index import intron_chain
+from pydantic import BaseModel, Field
+import heapq
+
+# best first
+CLASSES = ['exact', 'intron_chain', 'contained', 'overlapping', 'novel']
+MATCHES = ['exact', 'intron_chain'] # counted as found at the transcript / gene level
+SINGLE_EXON_OVERLAP = 0.8 # single-exon transcripts "share the chain" when overlapping by >= 80% of the longer one
+
+class Comparison(BaseModel):
+    transcripts : dict = Field(default_factory=dict) # query transcript uid -> (class, reference transcript uid)
+    genes : dict = Field(default_factory=dict) # query gene uid -> (class, reference gene uid)
+    ref_transcripts : dict = Field(default_factory=dict) # reference transcript uid -> (best class, query transcript uid)
+    stats : dict = Field(default_factory=dict) # level -> {'sensitivity', 'precision'}
+
+    def class_counts(self, level : str = 'transcripts') -> dict:
+        counts = dict.fromkeys(CLASSES, 0)
+        for c, _ in getattr(self, level).values():
+            counts[c] += 1
+        return counts
+
+def _exonic_overlap(q, r) -> int:
+    # total overlap of two sorted, internally disjoint interval lists
+    i = j = total = 0
+    while i < len(q) and j < len(r):
+        lo, hi = max(q[i][0], r[j][0]), min(q[i][1], r[j][1])
+        if lo <= hi:
+            total += hi - lo + 1
+        if q[i][1] < r[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+def _contained(q : tuple, qi : tuple, r : tuple, ri : tuple) -> bool:
+    if not qi:
+        return any(s <= q[0][0] and q[0][1] <= e for s, e in r)
+    if qi[0] not in ri:
+        return False
+    k = ri.index(qi[0])
+    m = len(qi)
+    return ri[k:k + m] == qi and q[0][0] >= r[k][0] and q[-1][1] <= r[k + m][1]
+
+def classify(q : tuple, r : tuple, qi : tuple = None, ri : tuple = None):
+    """
+    class of exon chain q against exon chain r (same chr and strand); None without exonic overlap.
+    qi / ri: intron chains of q / r, if already known
+    """
+    if q == r:
+        return 'exact'
+    ov = _exonic_overlap(q, r)
+    if not ov:
+        return None
+    qi = intron_chain(q) if qi is None else qi
+    ri = intron_chain(r) if ri is None else ri
+    if qi and qi == ri:
+        return 'intron_chain'
+    if not qi and not ri:
+        if ov >= SINGLE_EXON_OVERLAP * max(q[0][1] - q[0][0] + 1, r[0][1] - r[0][0] + 1):
+            return 'intron_chain'
+    if _contained(q, qi, r, ri):
+        return 'contained'
+    return 'overlapping'
+
+def _by_strand(chains : dict) -> dict:
+    """
+    (chr, strand) -> [(start, end, uid, chain)] sorted by start
+    """
+    groups = {}
+    for uid, (chr, strand, chain) in chains.items():
+        groups.setdefault((chr, strand), []).append((chain[0][0], chain[-1][1], uid, chain))
+    for v in groups.values():
+        v.sort(key=lambda t: (t[0], t[1]))
+    return groups
+
+def _sweep(refs : list, queries : list):
+    """
+    (query, reference) pairs of overlapping spans; both lists sorted by start
+    """
+    active = {} # reference index -> entry
+    ends = [] # heap of (end, reference index)
+    j = 0
+    for q in queries:
+        while j < len(refs) and refs[j][0] <= q[1]:
+            active[j] = refs[j]
+            heapq.heappush(ends, (refs[j][1], j))
+            j += 1
+        while ends and ends[0][0] < q[0]:
+            del active[heapq.heappop(ends)[1]]
+        for r in active.values():
+            if r[0] <= q[1]:
+                yield q, r
+
+def _chains(gan : GAn, exon_type : str) -> dict:
+    # 1-based whatever the coordinate system of gan
+    chains = gan.exon_chains(exon_type)
+    if gan.is_0b:
+        chains = {
+            uid : (chr, strand, tuple((s + 1, e) for s, e in chain))
+            for uid, (chr, strand, chain) in chains.items()
+        }
+    return chains
+
+def _ratio(a : int, b : int) -> float:
+    return a / b if b else 0.0
+
+def _level(found_ref : int, n_ref : int, found_query : int, n_query : int) -> dict:
+    return {'sensitivity' : _ratio(found_ref, n_ref), 'precision' : _ratio(found_query, n_query)}
+
+def _covered(chains : dict) -> dict:
+    """
+    (chr, strand) -> merged exonic intervals
+    """
+    groups = {}
+    for chr, strand, chain in chains.values():
+        groups.setdefault((chr, strand), []).extend(chain)
+    merged = {}
+    for key, ivs in groups.items():
+        ivs.sort()
+        out = [list(ivs[0])]
+        for s, e in ivs[1:]:
+            if s <= out[-1][1] + 1:
+                out[-1][1] = max(out[-1][1], e)
+            else:
+                out.append([s, e])
+        merged[key] = out
+    return merged
+
+def _stats(ref : dict, query : dict, ref_introns : dict, query_introns : dict, res : Comparison, ref_genes : dict, query_genes : dict) -> dict:
+    stats = {}
+    rc, qc = _covered(ref), _covered(query)
+    shared = sum(_exonic_overlap(ivs, qc[key]) for key, ivs in rc.items() if key in qc)
+    stats['base'] = _level(
+        shared, sum(e - s + 1 for ivs in rc.values() for s, e in ivs),
+        shared, sum(e - s + 1 for ivs in qc.values() for s, e in ivs)
+    )
+    r = {(chr, strand, x) for chr, strand, chain in ref.values() for x in chain}
+    q = {(chr, strand, x) for chr, strand, chain in query.values() for x in chain}
+    stats['exon'] = _level(len(r & q), len(r), len(r & q), len(q))
+    r = {(ref[uid][0], ref[uid][1], x) for uid, ints in ref_introns.items() for x in ints}
+    q = {(query[uid][0], query[uid][1], x) for uid, ints in query_introns.items() for x in ints}
+    stats['intron'] = _level(len(r & q), len(r), len(r & q), len(q))
+    r = {(ref[uid][0], ref[uid][1], ints) for uid, ints in ref_introns.items() if ints}
+    q = {(query[uid][0], query[uid][1], ints) for uid, ints in query_introns.items() if ints}
+    stats['intron_chain'] = _level(len(r & q), len(r), len(r & q), len(q))
+    stats['transcript'] = _level(
+        sum(c in MATCHES for c, _ in res.ref_transcripts.values()), len(ref),
+        sum(c in MATCHES for c, _ in res.transcripts.values()), len(query)
+    )
+    found_ref = {ref_genes[uid] for uid, (c, _) in res.ref_transcripts.items() if c in MATCHES}
+    found_query = {g for g, (c, _) in res.genes.items() if c in MATCHES}
+    stats['gene'] = _level(
+        len(found_ref), len(set(ref_genes.values())),
+        len(found_query), len(set(query_genes.values()))
+    )
+    return stats
+
+def _genes(gan : GAn, chains : dict) -> dict:
+    """
+    transcript uid -> gene uid (the transcript itself when it has no parent)
+    """
+    cols = gan._columns()
+    parents = dict(zip(cols['uid'].tolist(), cols['puid'].tolist()))
+    return {uid : parents.get(uid) if parents.get(uid) is not None else uid for uid in chains}
+
+def compare(ref : GAn, query : GAn, exon_type : str = 'exon') -> Comparison:
+    """
+    classifies every query transcript (and gene) against ref: the best class over
+    the reference transcripts it overlaps on the same chr / strand, 'novel' when none
+    """
+    ref_chains, query_chains = _chains(ref, exon_type), _chains(query, exon_type)
+    ref_introns = {uid : intron_chain(chain) for uid, (_, _, chain) in ref_chains.items()}
+    query_introns = {uid : intron_chain(chain) for uid, (_, _, chain) in query_chains.items()}
+    rank = {c : i for i, c in enumerate(CLASSES)}
+    res = Comparison()
+    res.transcripts = {uid : ('novel', None) for uid in query_chains}
+    res.ref_transcripts = {uid : ('novel', None) for uid in ref_chains}
+    ref_groups = _by_strand(ref_chains)
+    for key, queries in _by_strand(query_chains).items():
+        for q, r in _sweep(ref_groups.get(key, []), queries):
+            c = classify(q[3], r[3], query_introns[q[2]], ref_introns[r[2]])
+            if c is None:
+                continue
+            if rank[c] < rank[res.transcripts[q[2]][0]]:
+                res.transcripts[q[2]] = (c, r[2])
+            if rank[c] < rank[res.ref_transcripts[r[2]][0]]:
+                res.ref_transcripts[r[2]] = (c, q[2])
+
+    ref_genes, query_genes = _genes(ref, ref_chains), _genes(query, query_chains)
+    for uid, (c, ruid) in res.transcripts.items():
+        g = query_genes[uid]
+        if g not in res.genes or rank[c] < rank[res.genes[g][0]]:
+            res.genes[g] = (c, ref_genes[ruid] if ruid is not None else None)
+    res.stats = _stats(ref_chains, query_chains, ref_introns, query_introns, res, ref_genes, query_genes)
+    return res
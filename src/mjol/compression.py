@@ -0,0 +1,73 @@
+"""
+compression sniffing for annotation input and compressed output streams
+(gzip / bgzip via the standard library, zstd when the zstandard package is installed)
+"""
+from mjol.bgzf import is_bgzf, read_lines, BgzfWriter
+from contextlib import closing
+import gzip
+import io
+
+COMPRESSION = [None, 'gzip', 'bgzf', 'zstd']
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+SUFFIXES = {'.gz' : 'bgzf', '.bgz' : 'bgzf', '.zst' : 'zstd', '.zstd' : 'zstd'}
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError('zstd support requires the zstandard package (pip install mjol[zstd])')
+    return zstandard
+
+def sniff(file_name : str):
+    """
+    compression of file_name from its magic bytes: None, 'gzip', 'bgzf' or 'zstd'
+    """
+    with open(file_name, 'rb') as fh:
+        head = fh.read(4)
+    if head == ZSTD_MAGIC:
+        return 'zstd'
+    if head[:2] == b'\x1f\x8b':
+        return 'bgzf' if is_bgzf(file_name) else 'gzip'
+    return None
+
+def open_text(file_name : str, n_threads : int = 1):
+    """
+    iterable of text lines (as a context manager) of a plain or compressed file;
+    bgzip-compressed files are inflated by n_threads threads
+    """
+    compression = sniff(file_name)
+    if compression == 'bgzf':
+        return closing(read_lines(file_name, n_threads))
+    if compression == 'gzip':
+        return gzip.open(file_name, 'rt')
+    if compression == 'zstd':
+        reader = _zstandard().ZstdDecompressor().stream_reader(
+            open(file_name, 'rb'), read_across_frames=True, closefd=True
+        )
+        return io.TextIOWrapper(reader)
+    return open(file_name)
+
+def output_compression(fp : str, compress : str = 'auto'):
+    """
+    compress, with 'auto' resolved from the suffix of fp (.gz / .bgz -> bgzf, .zst -> zstd)
+    """
+    if compress == 'auto':
+        compress = next((c for s, c in SUFFIXES.items() if fp.endswith(s)), None)
+    if compress not in COMPRESSION:
+        raise ValueError(f'unknown compression {compress} (expected: {COMPRESSION})')
+    return compress
+
+def open_output(fp : str, compress : str = 'auto', n_threads : int = 1):
+    """
+    text stream writing to fp (bgzf / zstd compress with n_threads threads)
+    """
+    compress = output_compression(fp, compress)
+    if compress == 'bgzf':
+        return BgzfWriter(fp, n_threads=n_threads)
+    if compress == 'gzip':
+        return gzip.open(fp, 'wt', compresslevel=6)
+    if compress == 'zstd':
+        threads = n_threads if n_threads > 1 else 0
+        writer = _zstandard().ZstdCompressor(level=3, threads=threads).stream_writer(open(fp, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer)
+    return open(fp, 'w', buffering=1 << 20)
@@ -0,0 +1,113 @@
+"""
+introns, UTRs and tightened spans of every transcript at once (GAn.derive), computed with NumPy
+over the coordinate columns sorted by (parent, start)
+"""
+from mjol.frames import _uid_column
+import numpy as np
+import pandas as pd
+
+DERIVED = ['intron', 'five_prime_UTR', 'three_prime_UTR', 'span']
+COLUMNS = ['uid', 'feature_type', 'chr', 'start', 'end', 'strand', 'puid', 'kind']
+
+def _extrema(parent : np.ndarray, start : np.ndarray, end : np.ndarray, n : int) -> tuple:
+    """
+    per parent position (0..n-1), min start and max end of its children (lo > hi where it has none)
+    """
+    lo = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    hi = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(lo, parent, start)
+    np.maximum.at(hi, parent, end)
+    return lo, hi
+
+def _introns(parent : np.ndarray, start : np.ndarray, end : np.ndarray, gap : int) -> tuple:
+    """
+    (parent, start, end) of the gaps between consecutive exons of each parent
+    """
+    order = np.lexsort((end, start, parent))
+    p, s, e = parent[order], start[order], end[order]
+    same = p[1:] == p[:-1]
+    istart, iend = e[:-1][same] + gap, s[1:][same] - gap
+    keep = iend - istart + gap > 0 # adjacent / overlapping exons leave no intron
+    return p[:-1][same][keep], istart[keep], iend[keep]
+
+def _utrs(parent : np.ndarray, start : np.ndarray, end : np.ndarray, lo : np.ndarray, hi : np.ndarray, gap : int) -> tuple:
+    """
+    (parent, start, end) of the exon parts left of the CDS (lo) and right of it (hi), per parent
+    """
+    coding = lo[parent] <= hi[parent]
+    p, s, e = parent[coding], start[coding], end[coding]
+    cl, ch = lo[p], hi[p]
+    le = np.minimum(e, cl - gap)
+    left = le - s + gap > 0
+    rs = np.maximum(s, ch + gap)
+    right = e - rs + gap > 0
+    return (p[left], s[left], le[left]), (p[right], rs[right], e[right])
+
+def derive(gan, kinds : list = None, exon_type : str = 'exon', cds_type : str = 'CDS') -> pd.DataFrame:
+    """
+    one row per derived interval (columns: COLUMNS, coordinates in the coordinate system of gan,
+    uids in string form), ordered by transcript then start; kind is one of DERIVED:
+    intron : gaps between consecutive exon_type children of a transcript (puid: the transcript)
+    five_prime_UTR / three_prime_UTR : exon parts upstream / downstream of the transcript's cds_type children
+    span : (start, end) of every transcript tightened to its exons, and of their parents tightened
+           to those transcripts (uid, feature_type: the feature itself, puid: its parent)
+    """
+    kinds = DERIVED if kinds is None else kinds
+    unknown = [k for k in kinds if k not in DERIVED]
+    if unknown:
+        raise ValueError(f'unknown kinds {unknown} (expected: {DERIVED})')
+    cols = gan._columns()
+    n = len(cols['uid'])
+    gap = 0 if gan.is_0b else 1 # half-open 0-based or closed 1-based
+    rows = {uid : i for i, uid in enumerate(cols['uid'].tolist())}
+    parent = np.array([rows.get(puid, -1) for puid in cols['puid'].tolist()], dtype=np.int64)
+    types = cols['feature_type']
+    exons = np.flatnonzero((types == exon_type) & (parent >= 0))
+    ep, es, ee = parent[exons], cols['start'][exons], cols['end'][exons]
+
+    parts = [] # (kind, anchor position, start, end, derived feature's own position or -1)
+    if 'intron' in kinds:
+        p, s, e = _introns(ep, es, ee, gap)
+        parts.append(('intron', p, s, e, np.full(len(p), -1)))
+    if 'five_prime_UTR' in kinds or 'three_prime_UTR' in kinds:
+        cds = np.flatnonzero((types == cds_type) & (parent >= 0))
+        lo, hi = _extrema(parent[cds], cols['start'][cds], cols['end'][cds], n)
+        left, right = _utrs(ep, es, ee, lo, hi, gap)
+        for kind, (p, s, e), minus in [('five_prime_UTR', left, False), ('three_prime_UTR', right, False),
+                                       ('five_prime_UTR', right, True), ('three_prime_UTR', left, True)]:
+            if kind in kinds:
+                sel = (cols['strand'][p] == '-') == minus
+                parts.append((kind, p[sel], s[sel], e[sel], np.full(int(sel.sum()), -1)))
+    if 'span' in kinds:
+        lo, hi = _extrema(ep, es, ee, n)
+        tx = np.flatnonzero(lo <= hi)
+        parts.append(('span', tx, lo[tx], hi[tx], tx))
+        # parents of the transcripts, tightened to them
+        has = tx[parent[tx] >= 0]
+        glo, ghi = _extrema(parent[has], lo[has], hi[has], n)
+        genes = np.flatnonzero(glo <= ghi)
+        parts.append(('span', genes, glo[genes], ghi[genes], genes))
+
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS)
+    kind = np.concatenate([np.full(len(p), k, dtype=object) for k, p, _, _, _ in parts])
+    anchor = np.concatenate([p for _, p, _, _, _ in parts]).astype(np.int64)
+    start = np.concatenate([s for _, _, s, _, _ in parts]).astype(np.int64)
+    end = np.concatenate([e for _, _, _, e, _ in parts]).astype(np.int64)
+    own = np.concatenate([o for _, _, _, _, o in parts]).astype(np.int64)
+    order = np.lexsort((end, start, anchor))
+    kind, anchor, start, end, own = kind[order], anchor[order], start[order], end[order], own[order]
+    uids = np.array([*cols['uid'].tolist(), None], dtype=object) # position -1 -> None
+    span = own >= 0
+    # span rows describe the feature itself (puid: its parent); the others belong to their anchor
+    puids = np.where(span, uids[np.where(span, parent[own], -1)], uids[anchor])
+    return pd.DataFrame({
+        'uid' : _uid_column(uids[own].tolist(), gan.uid_mode),
+        'feature_type' : np.where(span, types[np.where(span, own, 0)], kind),
+        'chr' : cols['chr'][anchor],
+        'start' : start,
+        'end' : end,
+        'strand' : cols['strand'][anchor],
+        'puid' : pd.Series(_uid_column(puids.tolist(), gan.uid_mode), dtype=object),
+        'kind' : kind
+    }, columns=COLUMNS)
@@ -0,0 +1,220 @@
+"""
+spliced transcript / CDS / protein sequences of a GAn from a memory-mapped FASTA.
+the FASTA is located through a samtools-compatible .fai index (built by index_fasta when missing or stale);
+transcripts are visited in coordinate order (chromosomes in FASTA order) so the page cache is read sequentially
+"""
+from mjol.compression import open_output, sniff
+import mmap
+import os
+
+FAI_EXT = '.fai'
+LINE_WIDTH = 60 # output FASTA line width
+KINDS = ['transcript', 'cds', 'protein']
+
+COMPLEMENT = bytes.maketrans(b'ACGTUMRWSYKVHDBNacgtumrwsykvhdbn', b'TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn')
+# standard genetic code, codons in TCAG order
+CODONS = {
+    a + b + c : aa for (a, b, c), aa in zip(
+        ((a, b, c) for a in 'TCAG' for b in 'TCAG' for c in 'TCAG'),
+        'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG'
+    )
+}
+
+def fai_path(fasta : str) -> str:
+    return fasta + FAI_EXT
+
+def index_fasta(fasta : str) -> dict:
+    """
+    name -> (length, offset, line_bases, line_width) of every sequence of a plain-text FASTA;
+    written to fasta + '.fai' (when the directory is writable)
+    """
+    if sniff(fasta) is not None:
+        raise RuntimeError(f'{fasta} is compressed (mmap access requires a plain-text FASTA)')
+    index = {}
+    name = None
+    with open(fasta, 'rb') as fh:
+        offset = 0
+        for ln, line in enumerate(fh, 1):
+            if line[:1] == b'>':
+                name = line[1:].split(None, 1)[0].decode()
+                if name in index:
+                    raise RuntimeError(f'line {ln}: duplicate sequence name {name}')
+                index[name] = [0, offset + len(line), 0, 0]
+                last = None # length of the last (possibly shorter) line seen
+            elif name is not None and line.strip():
+                entry = index[name]
+                bases = len(line.rstrip(b'\r\n'))
+                if last is not None and last != entry[2]:
+                    raise RuntimeError(f'line {ln}: {name} has lines of different lengths')
+                if not entry[2]:
+                    entry[2], entry[3] = bases, len(line)
+                entry[0] += bases
+                last = bases
+            offset += len(line)
+    index = {k : tuple(v) for k, v in index.items()}
+    try:
+        with open(fai_path(fasta), 'w') as out:
+            out.writelines(f'{k}\t{n}\t{o}\t{b}\t{w}\n' for k, (n, o, b, w) in index.items())
+    except OSError:
+        pass
+    return index
+
+def read_fai(fasta : str) -> dict:
+    """
+    the .fai index of fasta, (re)built if missing or older than fasta
+    """
+    fai = fai_path(fasta)
+    if not os.path.exists(fai) or os.path.getmtime(fai) < os.path.getmtime(fasta):
+        return index_fasta(fasta)
+    index = {}
+    with open(fai) as fh:
+        for line in fh:
+            cols = line.rstrip('\n').split('\t')
+            index[cols[0]] = tuple(map(int, cols[1:5]))
+    return index
+
+class Fasta:
+    """
+    random access to the sequences of a plain-text FASTA via mmap (1-based, closed coordinates)
+    """
+    def __init__(self, fasta : str):
+        self.file_name = fasta
+        self.index = read_fai(fasta)
+        self._fh = open(fasta, 'rb')
+        size = os.fstat(self._fh.fileno()).st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+    def __contains__(self, name : str) -> bool:
+        return name in self.index
+
+    def names(self) -> list[str]:
+        return list(self.index)
+
+    def _pos(self, entry : tuple, i : int) -> int:
+        # byte offset of the 0-based position i
+        _, offset, line_bases, line_width = entry
+        return offset + i // line_bases * line_width + i % line_bases
+
+    def fetch_bytes(self, name : str, start : int, end : int) -> bytes:
+        if name not in self.index:
+            raise KeyError(f'{name} not found in {self.file_name}')
+        entry = self.index[name]
+        start, end = max(start, 1), min(end, entry[0])
+        if start > end:
+            return b''
+        s = self._mm[self._pos(entry, start - 1):self._pos(entry, end - 1) + 1]
+        if entry[3] > entry[2]:
+            s = s.replace(b'\n', b'').replace(b'\r', b'')
+        return s
+
+    def fetch(self, name : str, start : int, end : int) -> str:
+        """
+        bases start..end of sequence name (clipped to its length)
+        """
+        return self.fetch_bytes(name, start, end).decode('ascii')
+
+    def spliced(self, name : str, strand : str, chain) -> str:
+        """
+        concatenated bases of chain ((start, end) pairs, sorted), reverse-complemented on the - strand
+        """
+        s = b''.join(self.fetch_bytes(name, start, end) for start, end in chain)
+        if strand == '-':
+            s = s.translate(COMPLEMENT)[::-1]
+        return s.decode('ascii')
+
+def reverse_complement(seq : str) -> str:
+    return seq.encode('ascii').translate(COMPLEMENT)[::-1].decode('ascii')
+
+def translate(seq : str, phase : int = 0) -> str:
+    """
+    protein of a coding sequence, skipping phase bases first; trailing partial codons are dropped,
+    codons with ambiguous bases become X, stops *
+    """
+    seq = seq.upper().replace('U', 'T')
+    return ''.join(CODONS.get(seq[i:i + 3], 'X') for i in range(phase, len(seq) - 2, 3))
+
+def _phase(frame : str) -> int:
+    return int(frame) if frame in ['0', '1', '2'] else 0
+
+def _phases(gan, tuids, cds_type : str) -> dict:
+    """
+    transcript uid -> phase of its 5'-most cds_type child
+    """
+    res = {}
+    for tuid in tuids:
+        t = gan.features[tuid]
+        segs = sorted((c.start, c.frame) for c in t.children if c.feature_type == cds_type)
+        if segs:
+            res[tuid] = _phase(segs[-1][1] if t.strand == '-' else segs[0][1])
+    return res
+
+def extract(gan, fasta : Fasta, kind : str = 'transcript', uids : list = None, exon_type : str = 'exon', cds_type : str = 'CDS'):
+    """
+    (transcript uid, chr, strand, chain, sequence) of every transcript (parent of exon_type features, or of
+    cds_type features for kind='cds' / 'protein'; only uids, if given), in coordinate order.
+    kind: 'transcript' (spliced exons), 'cds' (spliced CDS, from its phase) or 'protein' (translated CDS).
+    transcripts on sequences missing from fasta are skipped with a warning
+    """
+    if kind not in KINDS:
+        raise ValueError(f'unknown kind {kind} (expected: {KINDS})')
+    chains = gan.exon_chains(exon_type if kind == 'transcript' else cds_type)
+    if uids is not None:
+        chains = {uid : chains[uid] for uid in map(gan.norm_uid, uids) if uid in chains}
+    ranks = {name : i for i, name in enumerate(fasta.names())}
+    missing = {}
+    for chr, _, _ in chains.values():
+        if chr not in ranks:
+            missing[chr] = missing.get(chr, 0) + 1
+    for chr, n in missing.items():
+        print(f"WARNING: {chr} not found in {fasta.file_name}; {n} transcript(s) skipped")
+    order = sorted(
+        (uid for uid, (chr, _, _) in chains.items() if chr in ranks),
+        key=lambda uid: (ranks[chains[uid][0]], chains[uid][2][0])
+    )
+    phases = _phases(gan, order, cds_type) if kind != 'transcript' else {}
+    offset = int(gan.is_0b)
+    for uid in order:
+        chr, strand, chain = chains[uid]
+        seq = fasta.spliced(chr, strand, [(s + offset, e) for s, e in chain])
+        if kind == 'cds':
+            seq = seq[phases.get(uid, 0):]
+        elif kind == 'protein':
+            seq = translate(seq, phases.get(uid, 0))
+        yield uid, chr, strand, chain, seq
+
+def write_fasta(
+    gan,
+    fp : str,
+    fasta : str,
+    kind : str = 'transcript',
+    uids : list = None,
+    exon_type : str = 'exon',
+    cds_type : str = 'CDS',
+    width : int = LINE_WIDTH,
+    compress : str = 'auto'
+) -> int:
+    """
+    streams the sequences of extract to fp, one record per transcript:
+    '>' attribute ID (uid string if it has none), then chr:start-end(strand) in 1-based coordinates.
+    returns the number of records written
+    """
+    n = 0
+    offset = int(gan.is_0b)
+    with Fasta(fasta) as fa, open_output(fp, compress) as out:
+        for uid, chr, strand, chain, seq in extract(gan, fa, kind, uids, exon_type, cds_type):
+            name = gan.features[uid].aid or gan.uid_str(uid)
+            lines = [seq[i:i + width] for i in range(0, len(seq), width)] if width else [seq]
+            out.write(f'>{name} {chr}:{chain[0][0] + offset}-{chain[-1][1]}({strand})\n' + ''.join(x + '\n' for x in lines))
+            n += 1
+    return n
@@ -0,0 +1,131 @@
+"""
+pandas / arrow export (GAn.to_dataframe, GAn.to_arrow) and import (GAn.from_dataframe)
+"""
+from mjol.base import uid_to_str
+from mjol.utils import Attributes, attributes_str, gtf_attributes_str
+from mjol.store import FeatureStore, CATEGORICAL
+from mjol.parser import HDR
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError('arrow support requires the pyarrow package (pip install mjol[arrow])')
+    return pyarrow
+
+def _uid_column(uids : list, uid_mode : str) -> list:
+    # string form of every uid (see GAn.uid_str), accepted back by GAn.norm_uid
+    if uid_mode == 'sha256':
+        return uids
+    return [None if uid is None else uid_to_str(uid, uid_mode) for uid in uids]
+
+def _store_frame(store : FeatureStore) -> tuple:
+    """
+    columns straight from the store arrays (categoricals keep their codes), attributes, parent uids
+    """
+    store.sync()
+    alive = store.column('alive')
+    # all rows alive: plain slices are views over the store arrays
+    rows = slice(None) if alive.all() else np.flatnonzero(alive)
+    data = {}
+    for k in CATEGORICAL:
+        data[k] = pd.Categorical.from_codes(store.column(k)[rows], categories=pd.Index(store.pools[k].values, dtype=object))
+    data['start'] = store.column('start')[rows]
+    data['end'] = store.column('end')[rows]
+    data['score'] = store.column('score')[rows]
+    idx = range(store.n)[rows] if isinstance(rows, slice) else rows.tolist()
+    uids = [store.uids[r] for r in idx]
+    attrs = [store.attrs[r] for r in idx]
+    parent = store.column('parent')[rows]
+    puids = np.array([*store.uids, None], dtype=object)[parent].tolist() # row -1 -> None
+    return data, uids, attrs, puids
+
+def _dict_frame(features : dict) -> tuple:
+    fs = list(features.values())
+    keys = ['chr', 'src', 'feature_type', 'start', 'end', 'score', 'strand', 'frame', 'attributes']
+    # read field values straight from the instance dicts (pydantic attribute access is slower)
+    cols = list(zip(*map(itemgetter(*keys), [f.__dict__ for f in fs]))) or [()] * len(keys)
+    t = dict(zip(keys, map(list, cols)))
+    data = {k : pd.Categorical(t[k]) for k in CATEGORICAL}
+    data['start'] = np.array(t['start'], dtype=np.int64)
+    data['end'] = np.array(t['end'], dtype=np.int64)
+    data['score'] = np.array([np.nan if s is None else s for s in t['score']], dtype=np.float64)
+    gids = [f.__dict__['gid'] for f in fs]
+    return data, [g.uid for g in gids], t['attributes'], [g.puid for g in gids]
+
+def to_dataframe(gan, explode : bool = False, parents : bool = True) -> pd.DataFrame:
+    """
+    one row per feature (features order): uid, the nine gff columns (chr / src / feature_type / strand / frame
+    as categoricals, coordinates in the coordinate system of gan) and, with parents, the parent uid.
+    uids are in string form (see GAn.uid_str); explode adds one column per attribute key (None where absent).
+    with storage='columnar' the columns come straight from the store arrays
+    """
+    if isinstance(gan.features, FeatureStore):
+        data, uids, attrs, puids = _store_frame(gan.features)
+    else:
+        data, uids, attrs, puids = _dict_frame(gan.features)
+    to_str = gtf_attributes_str if gan.file_fmt.lower() == 'gtf' else attributes_str
+    df = pd.DataFrame({'uid' : _uid_column(uids, gan.uid_mode), **data})
+    df = df[['uid'] + HDR[:-1]]
+    df['attributes'] = [to_str(a) for a in attrs]
+    if parents:
+        df['puid'] = pd.Series(_uid_column(puids, gan.uid_mode), index=df.index, dtype=object)
+    if explode:
+        keys = pd.DataFrame.from_records([dict(a.items()) for a in attrs], index=df.index)
+        df = df.join(keys, rsuffix='_attr')
+    df.attrs['coord_system'] = '0b' if gan.is_0b else '1b'
+    df.attrs['file_fmt'] = gan.file_fmt
+    return df
+
+def to_arrow(gan, explode : bool = False, parents : bool = True):
+    """
+    to_dataframe as a pyarrow Table (categoricals become dictionary arrays)
+    """
+    return _pyarrow().Table.from_pandas(to_dataframe(gan, explode, parents), preserve_index=False)
+
+def _attributes(a, kv_sep : str) -> Attributes:
+    if isinstance(a, Attributes):
+        return Attributes(a.raw, a.kv_sep) if not a.parsed else Attributes(kv_sep=a.kv_sep, data=a._d)
+    if isinstance(a, dict):
+        return Attributes(kv_sep=kv_sep, data=a)
+    if a is None or a != a: # missing / nan
+        return Attributes(kv_sep=kv_sep, data={})
+    return Attributes(a, kv_sep=kv_sep)
+
+def as_dataframe(df) -> pd.DataFrame:
+    """
+    df, or a pyarrow Table converted to pandas (attrs written by to_dataframe are kept)
+    """
+    return df if isinstance(df, pd.DataFrame) else df.to_pandas()
+
+def frame_rows(df : pd.DataFrame, file_fmt : str = 'gff', coord_system : str = '1b'):
+    """
+    row dicts (keys: HDR, 1-based coordinates, as yielded by mjol.parser.parse_lines) of a DataFrame
+    holding the nine gff columns; attributes may be strings or dicts
+    """
+    missing = [k for k in HDR if k not in df.columns]
+    if missing:
+        raise ValueError(f'missing columns {missing} (expected: {HDR})')
+    kv_sep = ' ' if file_fmt.lower() == 'gtf' else '='
+    starts = df['start'].to_numpy(dtype=np.int64) + (coord_system == '0b')
+    scores = df['score'].to_numpy(dtype=np.float64, na_value=np.nan)
+    cols = zip(
+        df['chr'].tolist(), df['src'].tolist(), df['feature_type'].tolist(), starts.tolist(),
+        df['end'].to_numpy(dtype=np.int64).tolist(), scores.tolist(), df['strand'].tolist(),
+        df['frame'].tolist(), df['attributes'].tolist()
+    )
+    for chr, src, feature_type, start, end, score, strand, frame, attributes in cols:
+        yield {
+            'chr' : chr,
+            'src' : src,
+            'feature_type' : feature_type,
+            'start' : start,
+            'end' : end,
+            'score' : None if score != score else score,
+            'strand' : strand,
+            'frame' : frame,
+            'attributes' : _attributes(attributes, kv_sep)
+        }
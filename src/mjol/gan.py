@@ -1,12 +1,28 @@
 from mjol.base import *
 from mjol.utils import *
-import pandas as pd
+from mjol.parser import FLUSH, ParseError, parse_lines, read_gff
+from mjol.compression import sniff
+from mjol.store import FeatureStore
+from mjol.sqlite import SqliteStore, SqliteLookup, CACHE_SIZE, db_path
+from mjol.index import IntervalIndex, ChainIndex, CollisionIndex, TreeIndex, check_mode, select_hits
+from mjol.gix import is_gix, save_gix, load_gix
+from mjol.writer import write_gff
+from mjol.stats import summarize, group_positions
+from mjol.frames import to_dataframe, to_arrow, as_dataframe, frame_rows
+from mjol.instrument import Profiler, PROGRESS_EVERY, build_counters, profiled
+from mjol.fasta import Fasta, LINE_WIDTH, extract, write_fasta
+from mjol.derive import derive
+from mjol import cache
+from mjol.cache import CACHE_MAX_BYTES
+from functools import partial
+from pydantic import PrivateAttr
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pickle
-
-HDR = [
-    'chr', 'src', 'feature_type', 'start', 
-    'end', 'score', 'strand', 'frame', 'attributes'
-]
+import mmap
+import re
+import time
+import os
 
 class GAn(BaseModel):
     file_name : str
@@ -17,127 +33,911 @@ class GAn(BaseModel):
     features : dict = Field(default_factory=dict)
     lookup : dict = Field(default_factory=dict)
     is_0b : bool = False
+    directives : list = Field(default_factory=list)
+    storage : str = 'dict' # ['dict', 'columnar', 'sqlite']
+    db_path : str = None # storage='sqlite': database file (default: file_name + '.db')
+    cache_size : int = CACHE_SIZE # storage='sqlite': features kept materialised
+    uid_mode : str = 'sha256' # see UID_MODES
+    check_collisions : bool = True # tell hash collisions apart from duplicate lines
+    cache_dir : str = None # build_db: cache of built annotations (see mjol.cache)
+    cache_by : str = 'stat' # cache key of the input: ['stat' (size, mtime), 'content']
+    cache_max_bytes : int = CACHE_MAX_BYTES
+    _next_seq : int = PrivateAttr(default=0)
+    _indexes : dict = PrivateAttr(default_factory=dict) # lazily built, kept in sync by add/pop_feature
+    _profiler : Profiler = PrivateAttr(default=None) # see enable_profiling
     
     # NOTE: child feature must come after parent feature in GFF file
-    def build_db(self, coord_system:str='1b'):
+    def build_db(self, coord_system:str='1b', n_workers:int=1, regions:list=None):
+        """
+        n_workers > 1 parses and hashes line-aligned shards of the file in a process pool;
+        shards are merged in file order, so features/lookup match a serial build.
+        n_workers is capped at the number of CPUs available to the process (one CPU: serial build).
+        gzip / bgzip / zstd-compressed input is detected from its magic bytes
+        (for bgzip, n_workers threads inflate blocks ahead of the parser).
+        regions (e.g. ['chr1:10000-20000', 'chr2']; 1-based, closed) loads only the features overlapping them
+        from a bgzip-compressed, coordinate-sorted file indexed by mjol.regions.index_gff;
+        parents are resolved among the loaded features.
+        with cache_dir, a previous build of the same input and settings is loaded from the cache
+        instead (storage='columnar': mmapped, as with load_from_gix; 'dict': materialised into
+        GFeatures); other builds are added to it (storage='sqlite' and regions are never cached)
+        """
+
+        self._setup(coord_system)
+        n_workers = min(n_workers, os.process_cpu_count() or 1)
+
+        entry = None
+        if self.cache_dir is not None and regions is None and self.storage != 'sqlite':
+            entry = cache.entry_path(self.cache_dir, self.file_name, {
+                'file_fmt' : self.file_fmt, 'iak' : self.iak, 'pak' : self.pak,
+                'coord_system' : coord_system, 'uid_mode' : self.uid_mode
+            }, self.cache_by)
+            if cache.hit(entry) and self._load_cached(entry):
+                if self._profiler is not None:
+                    self._profiler.count('cache_hits')
+                return
+
+        n_threads = 1
+        if n_workers > 1 and (regions is not None or sniff(self.file_name) is not None):
+            # shards are byte ranges of a plain-text file: compressed input is
+            # parsed serially while n_workers threads inflate bgzip blocks
+            n_threads, n_workers = n_workers, 1
+
+        # None: shards parsed in a process pool
+        rows = read_gff(self.file_name, self.file_fmt, self.directives, regions, n_threads) if n_workers <= 1 else None
+        prof = self._profiler
+        if prof is None:
+            self._build(rows, n_workers)
+            if entry is not None:
+                cache.store(self, entry, self.cache_max_bytes)
+            return
+
+        t0 = time.perf_counter()
+        with prof.phase('build_db'):
+            if rows is not None:
+                rows = prof.timed_iter('parse', rows, 'build_db')
+            self._build(rows, n_workers)
+        prof.remainder('link', 'build_db', ['parse', 'workers', 'attributes', 'uid', 'validate'])
+        counters = build_counters(self)
+        for k, v in counters.items():
+            prof.count(k, v)
+        prof.snapshot('build_db')
+        prof.emit('build_db', seconds=time.perf_counter() - t0, **counters)
+        if entry is not None:
+            cache.store(self, entry, self.cache_max_bytes)
+
+    def _load_cached(self, path : str) -> bool:
+        """
+        takes features / lookup from a cache entry; an unreadable entry is dropped (False: build instead)
+        """
+        try:
+            settings, store, lookup = load_gix(path)
+        except Exception as e:
+            print(f'WARNING: dropping unreadable cache entry {path} : {e}')
+            cache.discard(path)
+            return False
+        if self.storage == 'dict':
+            # same features / lookup as a dict build (uids in file order)
+            store = {store.uids[r] : store._view(r) for r in store.live_rows()}
+            lookup = {}
+            for uid, f in store.items():
+                if f.aid:
+                    lookup.setdefault(f.aid, OrderedSet()).add(uid)
+        self.ftypes = set(settings['ftypes'])
+        self.directives = settings['directives']
+        self._next_seq = settings['next_seq']
+        self.features = store
+        self.lookup = lookup
+        return True
 
+    def _setup(self, coord_system : str):
         if coord_system not in ['0b', '1b']:
             raise ValueError(f'unknown coordinate system {coord_system} (expected: [0b, 1b])')
     
+        if self.storage not in ['dict', 'columnar', 'sqlite']:
+            raise ValueError(f'unknown storage {self.storage} (expected: [dict, columnar, sqlite])')
+
+        if self.storage == 'sqlite' and not (self.db_path or self.file_name):
+            raise ValueError('storage=sqlite requires db_path (or file_name)')
+
+        if self.uid_mode not in UID_MODES:
+            raise ValueError(f'unknown uid mode {self.uid_mode} (expected: {UID_MODES})')
+
         self.is_0b = coord_system == '0b'
+        self._indexes.clear()
 
-        in_df = pd.read_csv(self.file_name, sep='\t', comment='#', header=None)
-        in_df.columns = HDR
-        in_df['attributes'] = in_df['attributes'].apply(
-            lambda s : load_attributes(
-                s, kv_sep=' ' if self.file_fmt.lower() == 'gtf' else '='
-            )
-        )
-        
-        rows = in_df.to_dict('records')
-        for row in rows:
-            f = self._create_gfeature(row)
+    def _build(self, rows, n_workers : int = 1):
+        """
+        builds features / lookup from parsed row dicts (see mjol.parser.parse_lines), or from
+        shards of the file parsed by n_workers processes when rows is None
+        """
+        if self.storage == 'columnar':
+            self._build_columnar(rows, n_workers)
+            return
+
+        if self.storage == 'sqlite':
+            self._build_sqlite(rows, n_workers)
+            return
 
+        prof = self._profiler
+        if rows is None:
+            gfeatures = (self._gfeature_from_record(rec) for rec in self._records(rows, n_workers))
+        elif prof is None:
+            # single streaming pass: file -> GFeature (no intermediate frames)
+            gfeatures = (self._create_gfeature(row) if row is not FLUSH else FLUSH for row in rows)
+        else:
+            # same features, with attribute lookups, hashing and validation timed apart
+            record, validate = self._profiled_record(prof), prof.timed('validate', self._validate_record)
+            gfeatures = (validate(record(row)) if row is not FLUSH else FLUSH for row in rows)
+        features, lookup = self.features, self.lookup
+        collisions = self._collision_index()
+        pending = {} # paid -> children seen before any feature with that ID (forward references)
+        linked = set() # aids children were linked to
+        late = set() # aids that gained candidates after children were linked to them
+        touched = set() # uids of parents whose children were not linked in file order
+        seq = self._next_seq
+        for f in gfeatures:
+            if f is FLUSH:
+                # '###': forward references seen so far can be resolved
+                self._link_pending(pending, linked, touched)
+                continue
             self.ftypes.add(f.feature_type)
 
-            if f.uid in self.features:
-                raise RuntimeError(f'non-unique uid detected : {f.uid}')
+            if self.uid_mode == 'seq':
+                f.uid, seq = seq, seq + 1
+            if f.uid in features:
+                self._raise_non_unique(features[f.uid], f)
             
-            self.features[f.uid] = f
+            features[f.uid] = f
 
-            if f.aid:
+            aid = f.aid
+            if aid:
                 # attribute ID collision detected
-                if f.aid in self.lookup:
-                    self.lookup[f.aid].append(f.uid)
+                if aid in lookup:
+                    lookup[aid].add(f.uid)
+                    collisions.add(aid, f.uid, f.chr, f.strand, f.start, f.end)
+                    if aid in linked:
+                        late.add(aid)
                 else:
-                    self.lookup[f.aid] = [f.uid]
-        
-        for f in self.features.values():
-            if f.paid in self.lookup:
-                puid = self.get_uid(f.paid, f)
+                    lookup[aid] = OrderedSet([f.uid])
+
+            # link to an already seen parent right away
+            paid = f.paid
+            if paid:
+                if paid in lookup:
+                    puid = self.get_uid(paid, f)
+                    f.set_parent_uid(puid)
+                    features[puid].add_a_child(f)
+                    linked.add(paid)
+                else:
+                    pending.setdefault(paid, []).append(f)
+        self._next_seq = seq
+        self._link_pending(pending, linked, touched)
+
+        # candidates seen after a child was linked may be closer to it
+        for aid in late:
+            kids = [c for uid in lookup[aid] for c in features[uid].children if c.paid == aid]
+            for c in kids:
+                puid = self.get_uid(aid, c)
+                if puid != c.puid:
+                    features[c.puid].children.discard(c)
+                    c.set_parent_uid(puid)
+                    features[puid].add_a_child(c)
+                    touched.add(puid)
+        if touched:
+            # children in features order, as if linked in a second pass
+            order = {uid : i for i, uid in enumerate(features)}
+            for uid in touched:
+                parent = features[uid]
+                parent.children = Children(sorted(parent.children, key=lambda c: order[c.uid]))
+
+    def _link_pending(self, pending : dict, linked : set, touched : set):
+        """
+        links forward references whose parent ID has been seen since
+        """
+        for paid in [paid for paid in pending if paid in self.lookup]:
+            for f in pending.pop(paid):
+                puid = self.get_uid(paid, f)
                 f.set_parent_uid(puid)
-                parent = self.get_feature(puid)
-                parent.add_a_child(f)
-
-            # OLD version for constructing parent-child relationship
-            # if f.parent in self.lookup:
-            #     puid = self.get_uid(f.parent, f)
-            #     f.set_parent_uid(puid)
-            #     parent = self.get_feature(puid)
-            #     parent.add_a_child(f)
+                self.features[puid].add_a_child(f)
+                touched.add(puid)
+            linked.add(paid)
     
+    def _build_columnar(self, rows, n_workers : int = 1):
+        """
+        _build for storage='columnar': rows go straight into a FeatureStore (no GFeature is built)
+        """
+        store = FeatureStore(self.iak, self.pak, self.uid_mode)
+        seq = self._next_seq
+        for rec in self._records(rows, n_workers):
+            if self.uid_mode == 'seq':
+                rec, seq = rec[:9] + (seq,) + rec[10:], seq + 1
+            uid, aid = rec[9], rec[10]
+            if uid in store:
+                self._raise_non_unique(store[uid], self._gfeature_from_record(rec))
+            store.append(*rec)
+            if aid:
+                if aid in self.lookup:
+                    self.lookup[aid].add(uid)
+                else:
+                    self.lookup[aid] = OrderedSet([uid])
+        self._next_seq = seq
+        store.link(self.lookup)
+        self.ftypes.update(store.pools['feature_type'].values)
+        self.features = store
+
+    def _build_sqlite(self, rows, n_workers : int = 1):
+        """
+        _build for storage='sqlite': records are inserted in batches and linked in SQL,
+        so memory does not grow with the input (see mjol.sqlite)
+        """
+        store = SqliteStore(
+            self.db_path or db_path(self.file_name), self.iak, self.pak, self.uid_mode, self.cache_size, create=True
+        )
+        records = self._records(rows, n_workers)
+        if self.uid_mode == 'seq':
+            records = self._number(records)
+        store.insert_records(records)
+        store.link()
+        self.ftypes.update(store.ftypes())
+        store.set_meta({
+            'file_name' : self.file_name,
+            'file_fmt' : self.file_fmt,
+            'iak' : self.iak,
+            'pak' : self.pak,
+            'is_0b' : self.is_0b,
+            'uid_mode' : self.uid_mode,
+            'check_collisions' : self.check_collisions,
+            'directives' : self.directives
+        })
+        self.features = store
+        self.lookup = SqliteLookup(store)
+
+    def _number(self, records):
+        # uid_mode='seq': handles in input order
+        for rec in records:
+            yield rec[:9] + (self._next_seq,) + rec[10:]
+            self._next_seq += 1
+
+    def _records(self, rows, n_workers : int = 1):
+        """
+        records (see _record) of parsed rows, or of shards of the file parsed by n_workers processes when rows is None
+        """
+        prof = self._profiler
+        if rows is None:
+            records = self._parallel_records(n_workers)
+            return records if prof is None else prof.timed_iter('workers', records)
+        record = self._record if prof is None else self._profiled_record(prof)
+        return (record(row) for row in rows if row is not FLUSH)
+
+    def _record(self, row, hash_fn = make_uid, infer_fn = infer_attribute) -> tuple:
+        """
+        (chr, src, feature_type, start, end, score, strand, frame, attributes, uid, aid, paid)
+        of a parsed row, i.e., a GFeature without the pydantic model
+        """
+        start, end = row['start'], row['end']
+        if self.is_0b:
+            start, end = start - 1, end
+        attributes = row['attributes']
+        uid = None if self.uid_mode == 'seq' else hash_fn(
+            row['chr'], row['src'], row['feature_type'], start, end,
+            row['score'], row['strand'], row['frame'], attributes, self.uid_mode
+        )
+        return (
+            row['chr'], row['src'], row['feature_type'], start, end,
+            row['score'], row['strand'], row['frame'], attributes,
+            uid, infer_fn(attributes, self.iak), infer_fn(attributes, self.pak)
+        )
+
+    def _profiled_record(self, prof : Profiler):
+        # _record with uid hashing and attribute ID lookups (which parse attributes if needed) timed
+        return partial(self._record, hash_fn=prof.timed('uid', make_uid), infer_fn=prof.timed('attributes', infer_attribute))
+
+    def _validate_record(self, rec : tuple) -> GFeature:
+        """
+        the validated GFeature of a record, as built by _create_gfeature
+        """
+        chr, src, feature_type, start, end, score, strand, frame, attributes, uid, aid, paid = rec
+        return GFeature.model_validate({
+            'chr' : chr, 'src' : src, 'feature_type' : feature_type, 'start' : start, 'end' : end,
+            'score' : score, 'strand' : strand, 'frame' : frame, 'attributes' : attributes,
+            'iak' : self.iak, 'pak' : self.pak, 'uid_mode' : self.uid_mode,
+            'gid' : GId(uid=uid, aid=aid, paid=paid)
+        })
+
+    def _gfeature_from_record(self, rec : tuple) -> GFeature:
+        chr, src, feature_type, start, end, score, strand, frame, attributes, uid, aid, paid = rec
+        return bare_model(GFeature, {
+            'chr' : chr, 'src' : src, 'feature_type' : feature_type, 'start' : start, 'end' : end,
+            'score' : score, 'strand' : strand, 'frame' : frame, 'attributes' : attributes,
+            'children' : Children(), 'iak' : self.iak, 'pak' : self.pak, 'uid_mode' : self.uid_mode,
+            'gid' : bare_model(GId, {'uid' : uid, 'aid' : aid, 'paid' : paid, 'puid' : None})
+        })
+
+    def _parallel_records(self, n_workers : int):
+        size = _body_size(self.file_name)
+        n_shards = min(4 * n_workers, max(1, size // SHARD_BYTES)) # ~4 shards per worker
+        bounds = [size * i // n_shards for i in range(n_shards + 1)]
+        shard = self.model_copy(update={'features' : {}, 'lookup' : {}, 'directives' : []})
+        shard._profiler = None # hooks need not be picklable
+        kv_sep = ' ' if self.file_fmt.lower() == 'gtf' else '='
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = executor.map(
+                _build_shard,
+                [shard] * n_shards,
+                bounds[:-1], bounds[1:]
+            )
+            ln = 0 # lines of the shards before
+            for directives, n_lines, columns, error in results:
+                if error is not None:
+                    raise ParseError(ln + error[0], error[1])
+                self.directives.extend(directives)
+                for rec in zip(*columns):
+                    yield rec[:8] + (Attributes(rec[8], kv_sep=kv_sep),) + rec[9:]
+                ln += n_lines
+
+    def _new_seq(self) -> int:
+        uid = self._next_seq
+        self._next_seq += 1
+        return uid
+
+    def _raise_non_unique(self, f1 : GFeature, f2 : GFeature):
+        if self.check_collisions and self.uid_mode != 'sha256' and self._line(f1) != self._line(f2):
+            raise RuntimeError(f'{self.uid_mode} uid collision detected : {self.uid_str(f1.uid)} (use uid_mode=sha256)')
+        raise RuntimeError(f'non-unique uid detected : {self.uid_str(f1.uid)}')
+
+    @staticmethod
+    def _line(f : GFeature) -> str:
+        return uid_line(f.chr, f.src, f.feature_type, f.start, f.end, f.score, f.strand, f.frame, f.attributes)
+
+    def norm_uid(self, uid):
+        """
+        maps the string form of a uid (hex for xxh64/xxh128, decimal for seq) to the key used in features
+        """
+        if isinstance(uid, str) and self.uid_mode != 'sha256':
+            return str_to_uid(uid, self.uid_mode)
+        return uid
+
+    def uid_str(self, uid) -> str:
+        return uid_to_str(uid, self.uid_mode)
+
     # collision-safe
     def get_uid(self, aid : str, f : GFeature = None):
+        """
+        uid of the feature with attribute ID aid; when several features share it,
+        the candidate closest to f (see CollisionIndex.closest)
+        """
         uids = self.lookup[aid]
         if len(uids) == 1:
             return uids[0]
         if not f:
             raise RuntimeError(f'provide a feature to resolve lookup collision')
-        return max(uids, key=lambda uid: f.calc_sim(self.features[uid]))
+        return self._collision_index().closest(aid, uids, self._coords, f.chr, f.strand, f.start, f.end)
+
+    def _collision_index(self) -> CollisionIndex:
+        if 'collisions' not in self._indexes:
+            self._indexes['collisions'] = CollisionIndex()
+        return self._indexes['collisions']
+
+    def _coords(self, uid) -> tuple:
+        if isinstance(self.features, (FeatureStore, SqliteStore)):
+            return self.features.coords(uid)
+        f = self.features[uid]
+        return f.chr, f.strand, f.start, f.end
         
     def get_feature(self, uid : str):
+        uid = self.norm_uid(uid)
         if uid not in self.features:
             raise KeyError(f'{uid} not found in features')
         return self.features[uid]
     
-    def get_desc(self, uid : str):
-        res = []
-        for child in self.features[uid].children:
-            res.append(child)
-            res.extend(self.get_desc(child))
-        return res
-    
+    def get_desc(self, uid : str) -> list[GFeature]:
+        """
+        descendants of uid in preorder, read off the nested-set index (see _tree_index)
+        """
+        uid = self.get_feature(uid).uid
+        return [self.features[d] for d in self._tree_index().descendants(uid)]
+
+    def iter_desc(self, uid : str):
+        """
+        lazily yields the descendants of uid in preorder by walking children (no index, no recursion)
+        """
+        return self.get_feature(uid).iter_desc()
+
+    def subtree_size(self, uid : str) -> int:
+        """
+        number of features in the subtree of uid, uid included
+        """
+        return self._tree_index().subtree_size(self.get_feature(uid).uid)
+
+    def is_ancestor(self, uid : str, other : str) -> bool:
+        """
+        whether uid is a (possibly indirect) parent of other
+        """
+        return self._tree_index().is_ancestor(self.get_feature(uid).uid, self.get_feature(other).uid)
+
+    def get_ancestor(self, uid : str, ftype : str = None):
+        """
+        closest ancestor of uid of type ftype (e.g. 'gene'; any type: the root of its tree), None if there is none
+        """
+        res = self._tree_index().ancestor(self.get_feature(uid).uid, ftype)
+        return None if res is None else self.features[res]
+
+    def _tree_index(self) -> TreeIndex:
+        """
+        nested-set index of the parent / child forest, built on first use; add/pop_feature(s) mark the
+        trees they change and only those are re-numbered (from children) by the next query
+        """
+        if 'tree' not in self._indexes:
+            cols = self._columns()
+            uids = cols['uid'].tolist()
+            rows = {uid : i for i, uid in enumerate(uids)}
+            parent = np.array([rows.get(puid, -1) for puid in cols['puid'].tolist()], dtype=np.int64)
+            self._indexes['tree'] = TreeIndex(uids, parent, cols['feature_type'])
+        tree = self._indexes['tree']
+        for root in tree.dirty:
+            if root not in self.features:
+                tree.drop(root)
+                continue
+            nodes, todo = [], [(self.features[root], None)]
+            while todo:
+                f, puid = todo.pop()
+                nodes.append((f.uid, puid, f.feature_type))
+                if len(nodes) > len(self.features):
+                    raise RuntimeError('cycle in parent-child relationships')
+                todo.extend((c, f.uid) for c in list(f.children)[::-1])
+            tree.set_tree(nodes)
+        tree.dirty.clear()
+        return tree
+
+    def _root_uid(self, f : GFeature):
+        """
+        uid of the root of the tree f belongs to (following parent uids)
+        """
+        seen = 0
+        while f.puid is not None and f.puid in self.features:
+            f = self.features[f.puid]
+            seen += 1
+            if seen > len(self.features):
+                raise RuntimeError('cycle in parent-child relationships')
+        return f.uid
+
     def pop_feature(self, uid: str, include_children = True) -> str:
-        if uid not in self.features:
-            raise KeyError(f'{uid} not found in features')
-        delete_feature = self.features[uid]
-        entries_to_delete = delete_feature.to_gff_entry(include_children)
-        # delete children
-        if include_children and delete_feature.children:
-                for child in delete_feature.children[:]:
-                    self.pop_feature(child.uid)
-        # delete feature from parent
-        if delete_feature.puid and delete_feature.puid in self.features:
-            self.features[delete_feature.puid].children.remove(delete_feature)
-        # delete feature from features
-        del self.features[delete_feature.uid]
-        # delete feature from lookup
-        if delete_feature.aid:
-            self.lookup[delete_feature.aid] = [feature for feature in self.lookup[delete_feature.aid] if feature != delete_feature.uid]
-            if not self.lookup[delete_feature.aid]:
-                del self.lookup[delete_feature.aid]
-        return entries_to_delete
+        return self.pop_features([uid], include_children)[0]
+
+    @profiled('pop_features', 'popped')
+    def pop_features(self, uids : list, include_children : bool = True) -> list[str]:
+        """
+        removes the features (and, with include_children, their descendants) in one pass;
+        returns the gff entries of each requested feature, taken before removal
+        """
+        targets = []
+        for uid in uids:
+            uid = self.norm_uid(uid)
+            if uid not in self.features:
+                raise KeyError(f'{uid} not found in features')
+            targets.append(self.features[uid])
+        entries = [f.to_gff_entry(include_children=include_children) for f in targets]
+        doomed = {}
+        todo = targets[::-1]
+        while todo:
+            f = todo.pop()
+            uid = f.gid.uid
+            if uid in doomed or uid not in self.features:
+                continue
+            doomed[uid] = f
+            if include_children:
+                todo.extend(list(f.children)[::-1])
+        features, lookup = self.features, self.lookup
+        index = self._indexes.get('interval')
+        chain_indexes = self._chain_indexes()
+        collisions = self._collision_index()
+        ftype_index = self._indexes.get('ftype')
+        tree = self._indexes.get('tree')
+        if tree is not None:
+            tree.dirty.update(self._root_uid(f) for f in targets)
+        for uid, f in doomed.items():
+            gid = f.gid
+            if ftype_index is not None:
+                ftype_index.get(f.feature_type, {}).pop(uid, None)
+            for ci in chain_indexes:
+                ci.discard(uid)
+                # a removed exon changes the chain of its surviving transcript
+                if gid.puid is not None and gid.puid not in doomed and f.feature_type == ci.exon_type:
+                    ci.dirty.add(gid.puid)
+            # delete feature from parent (removed subtrees are left intact)
+            if gid.puid is not None and gid.puid not in doomed:
+                parent = features.get(gid.puid)
+                if parent is not None:
+                    parent.children.discard(f)
+            # delete feature from features
+            del features[uid]
+            if index is not None:
+                index.discard(f.chr, f.strand, uid)
+            # delete feature from lookup
+            if gid.aid:
+                bucket = lookup.get(gid.aid)
+                if bucket is not None:
+                    bucket.discard(uid)
+                    collisions.discard(gid.aid, uid, f.chr, f.strand, f.start, f.end)
+                    if not bucket:
+                        del lookup[gid.aid]
+        if tree is not None and not include_children:
+            # children of removed features become roots
+            tree.dirty.update(c.uid for f in doomed.values() for c in f.children if c.uid in features)
+        return entries
 
     def add_feature(
         self, 
         feature : GFeature, 
         include_children : bool = True
     ) -> str:
-        if feature.uid in self.features:
-            print("WARNING : duplicate feature already exists and will be overwritten")
-        
-        self.features[feature.uid] = feature
-        if feature.aid:
-            if feature.aid in self.lookup:
-                self.lookup[feature.aid].append(feature.uid)
+        return self.add_features([feature], include_children)[0]
+
+    @profiled('add_features', 'added')
+    def add_features(self, features : list, include_children : bool = True, relink : bool = True) -> list[str]:
+        """
+        inserts the features (and, with include_children, their descendants) in one pass,
+        then links each to its parent (which may be part of the same batch);
+        relink=False keeps the parent of features whose puid is already in the annotation
+        instead of resolving paid again. features that need another uid here (built under another
+        uid_mode, or holding a seq handle taken by another feature) are inserted as re-keyed copies of
+        the batch, so the GAn they come from is left untouched; returns the gff entry of each given feature
+        """
+        batch = self._batch(features, include_children)
+        if any(self._foreign(f) for f in batch):
+            copies = self._copy_batch(batch)
+            batch = [copies[id(f)] for f in batch]
+            features = [copies[id(f)] for f in features]
+        index = self._indexes.get('interval')
+        chain_indexes = self._chain_indexes()
+        collisions = self._collision_index()
+        ftype_index = self._indexes.get('ftype')
+        renamed = {} # old uid -> new uid of features whose uid changed
+        for feature in batch:
+            old = feature.uid
+            if feature.uid_mode != self.uid_mode:
+                # built under another uid mode: key it the way this GAn does
+                feature.uid_mode = self.uid_mode
+                feature.uid = None if self.uid_mode == 'seq' else make_uid(
+                    feature.chr, feature.src, feature.feature_type, feature.start, feature.end,
+                    feature.score, feature.strand, feature.frame, feature.attributes, self.uid_mode
+                )
+            if self.uid_mode == 'seq':
+                # handles are only unique within a GAn: re-assign foreign / missing ones
+                if feature.uid is None or self.features.get(feature.uid, feature) is not feature:
+                    feature.uid = self._new_seq()
+                self._next_seq = max(self._next_seq, feature.uid + 1)
+            if old is not None and feature.uid != old:
+                renamed[old] = feature.uid
+            duplicate = feature.uid in self.features
+            if duplicate:
+                other = self.features[feature.uid]
+                if self.check_collisions and self.uid_mode != 'sha256' and self._line(other) != self._line(feature):
+                    raise RuntimeError(f'{self.uid_mode} uid collision detected : {self.uid_str(feature.uid)}')
+                print("WARNING : duplicate feature already exists and will be overwritten")
+                if self._profiler is not None:
+                    self._profiler.count('duplicates')
+
+            self.features[feature.uid] = feature
+            self.ftypes.add(feature.feature_type)
+            if ftype_index is not None:
+                ftype_index.setdefault(feature.feature_type, {})[feature.uid] = None
+            for ci in chain_indexes:
+                if feature.uid in ci.chains: # overwritten transcript
+                    ci.dirty.add(feature.uid)
+            if index is not None:
+                index.add(feature.chr, feature.strand, feature.start + self.is_0b, feature.end, feature.uid, feature.feature_type)
+            if feature.aid and not duplicate:
+                if feature.aid in self.lookup:
+                    self.lookup[feature.aid].add(feature.uid)
+                    collisions.add(feature.aid, feature.uid, feature.chr, feature.strand, feature.start, feature.end)
+                else:
+                    self.lookup[feature.aid] = OrderedSet([feature.uid])
+        if renamed or self.uid_mode == 'seq':
+            for feature in batch:
+                feature.children.rekey()
+                if feature.puid in renamed:
+                    feature.puid = renamed[feature.puid]
+        for feature in batch:
+            if not relink and feature.puid is not None and feature.puid in self.features:
+                parent = self.features[feature.puid]
+                if feature not in parent.children:
+                    parent.add_a_child(feature)
+                continue
+            if feature.paid:
+                if feature.paid in self.lookup:
+                    puid = self.get_uid(feature.paid, feature)
+                    feature.puid = puid
+                    parent = self.features[puid]
+                    if feature not in parent.children:
+                        parent.add_a_child(feature)
+                else:
+                    print("WARNING: feature has parent attribute, but the parent could not be found in the annotation")
+                    if self._profiler is not None:
+                        self._profiler.count('orphans')
+        for ci in chain_indexes:
+            ci.dirty.update(f.puid for f in batch if f.feature_type == ci.exon_type and f.puid is not None)
+        tree = self._indexes.get('tree')
+        if tree is not None:
+            tree.dirty.update(self._root_uid(f) for f in batch)
+        if isinstance(self.features, SqliteStore):
+            # parent links were set after the rows were written
+            self.features.write_back(batch)
+        return [f.to_gff_entry(include_children=include_children) for f in features]
+
+    @staticmethod
+    def _batch(features : list, include_children : bool) -> list[GFeature]:
+        """
+        the features (and, with include_children, their descendants) in preorder, each once
+        """
+        batch = []
+        seen = set()
+        todo = list(features)[::-1]
+        while todo:
+            f = todo.pop()
+            if id(f) in seen:
+                continue
+            seen.add(id(f))
+            batch.append(f)
+            if include_children:
+                todo.extend(list(f.children)[::-1])
+        return batch
+
+    def _foreign(self, f : GFeature) -> bool:
+        """
+        whether add_features would change the uid of f
+        """
+        if f.uid_mode != self.uid_mode:
+            return True
+        return self.uid_mode == 'seq' and f.uid is not None and self.features.get(f.uid, f) is not f
+
+    @staticmethod
+    def _copy_batch(batch : list) -> dict:
+        """
+        id of each feature -> copy with its own attributes / ids; children are linked among the copies
+        """
+        copies = {
+            id(f) : f.model_copy(update={
+                'attributes' : f.attributes.copy(), 'gid' : f.gid.model_copy(), 'children' : Children()
+            }) for f in batch
+        }
+        for f in batch:
+            copies[id(f)].children.extend(copies[id(c)] for c in f.children if id(c) in copies)
+        return copies
+
+    def _columns(self) -> dict:
+        """
+        per-feature columns (uid, puid, chr, strand, feature_type, start, end) in features order
+        """
+        if isinstance(self.features, FeatureStore):
+            store = self.features
+            store.sync()
+            rows = np.nonzero(store.column('alive'))[0]
+            uids = np.array([*store.uids, None], dtype=object) # parent row -1 -> None
+            cols = {'uid' : uids[rows], 'puid' : uids[store.column('parent')[rows]]}
+            for k in ['chr', 'strand', 'feature_type']:
+                values = np.array(store.pools[k].values, dtype=object)
+                cols[k] = values[store.column(k)[rows]]
+            cols['start'] = store.column('start')[rows]
+            cols['end'] = store.column('end')[rows]
+            return cols
+        if isinstance(self.features, SqliteStore):
+            cols = self.features.columns()
+            return {
+                k : np.array(v, dtype=np.int64 if k in ['start', 'end'] else object)
+                for k, v in cols.items()
+            }
+        fs = list(self.features.values())
+        return {
+            'uid' : np.array([f.uid for f in fs], dtype=object),
+            'puid' : np.array([f.puid for f in fs], dtype=object),
+            'chr' : np.array([f.chr for f in fs], dtype=object),
+            'strand' : np.array([f.strand for f in fs], dtype=object),
+            'feature_type' : np.array([f.feature_type for f in fs], dtype=object),
+            'start' : np.array([f.start for f in fs], dtype=np.int64),
+            'end' : np.array([f.end for f in fs], dtype=np.int64)
+        }
+
+    def exon_chains(self, exon_type : str = 'exon') -> dict:
+        """
+        transcript uid -> (chr, strand, exon chain), where transcripts are the parents of exon_type
+        features and the chain is the sorted tuple of their (start, end)
+        """
+        cols = self._columns()
+        sel = np.flatnonzero((cols['feature_type'] == exon_type) & (cols['puid'] != None))
+        chains = {}
+        for puid, chr, strand, start, end in zip(
+            cols['puid'][sel].tolist(), cols['chr'][sel].tolist(), cols['strand'][sel].tolist(),
+            cols['start'][sel].tolist(), cols['end'][sel].tolist()
+        ):
+            if puid in chains:
+                chains[puid][2].append((start, end))
             else:
-                self.lookup[feature.aid] = [feature.uid]
-                
-        if feature.paid:
-            if feature.paid in self.lookup:
-                puid = self.get_uid(feature.paid, feature)
-                # feature.set_parent_uid(puid)
-                feature.puid = puid
-
-                # TODO: how does this behave?
-                if feature not in self.features[puid].children:
-                    self.features[puid].add_a_child(feature)
+                chains[puid] = (chr, strand, [(start, end)])
+        return {uid : (chr, strand, tuple(sorted(chain))) for uid, (chr, strand, chain) in chains.items()}
+
+    def _interval_index(self) -> IntervalIndex:
+        if 'interval' not in self._indexes:
+            cols = self._columns()
+            # indexed as closed intervals in 1-based coordinates
+            self._indexes['interval'] = IntervalIndex.from_arrays(
+                cols['chr'], cols['strand'], cols['start'] + self.is_0b, cols['end'],
+                cols['uid'], cols['feature_type']
+            )
+        return self._indexes['interval']
+
+    def _ftype_index(self) -> dict:
+        """
+        feature type -> {uid : None} (an insertion-ordered set, in features order)
+        """
+        if 'ftype' not in self._indexes:
+            if isinstance(self.features, FeatureStore):
+                cols = self._columns()
+                index = {t : dict.fromkeys(cols['uid'][pos].tolist()) for t, pos in group_positions(cols['feature_type'])}
             else:
-                print("WARNING: feature has parent attribute, but the parent could not be found in the annotation")
-        if include_children:
-            for child in feature.children:
-                self.add_feature(child)
-        return feature.to_gff_entry(include_children)
+                index = {}
+                for uid, f in self.features.items():
+                    t = f.__dict__['feature_type']
+                    if t in index:
+                        index[t][uid] = None
+                    else:
+                        index[t] = {uid : None}
+            self._indexes['ftype'] = index
+        return self._indexes['ftype']
+
+    def get_features_by_ftype(self, ftype : str) -> list[GFeature]:
+        """
+        features of type ftype in features order (index built on first use, kept in sync by add/pop_feature(s))
+        """
+        if isinstance(self.features, SqliteStore):
+            return [self.features[uid] for uid in self.features.uids_by_ftype(ftype)]
+        return [self.features[uid] for uid in self._ftype_index().get(ftype, ())]
+
+    def count_ftype(self, ftype : str) -> int:
+        if isinstance(self.features, SqliteStore):
+            return self.features.count_ftype(ftype)
+        return len(self._ftype_index().get(ftype, ()))
+
+    def stats(self) -> dict:
+        """
+        summary statistics computed over the coordinate columns (see mjol.stats.summarize)
+        """
+        return summarize(self)
+
+    def derive(self, kinds : list = None, exon_type : str = 'exon', cds_type : str = 'CDS', insert : bool = False):
+        """
+        introns, 5' / 3' UTRs and tightened transcript / gene spans of the whole annotation
+        as a DataFrame (see mjol.derive.derive). with insert, introns and UTRs (not spans, which
+        describe existing features) are added as children of their transcript (same source,
+        parent attribute set); their uids are filled in
+        """
+        df = derive(self, kinds, exon_type, cds_type)
+        if not insert:
+            return df
+        new = np.flatnonzero(df['kind'].to_numpy() != 'span') if len(df) else np.array([], dtype=np.int64)
+        features = self._derived_features(df.iloc[new])
+        self.add_features(features, include_children=False, relink=False)
+        uids = df['uid'].to_numpy(dtype=object).copy()
+        uids[new] = [self.uid_str(f.uid) for f in features]
+        df['uid'] = uids
+        return df
+
+    def _derived_features(self, df) -> list[GFeature]:
+        kv_sep = ' ' if self.file_fmt.lower() == 'gtf' else '='
+        key = 'Parent' if self.pak.lower() == 'parent' else self.pak
+        parents = {}
+        res = []
+        for ftype, chr, start, end, strand, puid in zip(
+            df['feature_type'].tolist(), df['chr'].tolist(), df['start'].tolist(),
+            df['end'].tolist(), df['strand'].tolist(), df['puid'].tolist()
+        ):
+            puid = self.norm_uid(puid)
+            if puid not in parents:
+                parent = self.features[puid]
+                parents[puid] = (parent.src, parent.aid)
+            src, paid = parents[puid]
+            attributes = Attributes(kv_sep=kv_sep, data={key : paid} if paid else {})
+            uid = None if self.uid_mode == 'seq' else make_uid(
+                chr, src, ftype, start, end, None, strand, '.', attributes, self.uid_mode
+            )
+            f = self._gfeature_from_record((chr, src, ftype, start, end, None, strand, '.', attributes, uid, None, paid))
+            f.gid.puid = puid
+            res.append(f)
+        return res
+
+    def _chain_indexes(self) -> list[ChainIndex]:
+        return [v for v in self._indexes.values() if isinstance(v, ChainIndex)]
+
+    def _chain_index(self, exon_type : str = 'exon') -> ChainIndex:
+        key = ('chain', exon_type)
+        if key not in self._indexes:
+            self._indexes[key] = ChainIndex.from_chains(self.exon_chains(exon_type), exon_type)
+        ci = self._indexes[key]
+        # re-index transcripts whose exons were added / removed since the last lookup
+        for uid in ci.dirty:
+            ci.discard(uid)
+            if uid not in self.features:
+                continue
+            exons = [c for c in self.features[uid].children if c.feature_type == exon_type]
+            if exons:
+                ci.add(uid, exons[0].chr, exons[0].strand, tuple(sorted((c.start, c.end) for c in exons)))
+        ci.dirty.clear()
+        return ci
+
+    def match_chain(
+        self,
+        chr : str,
+        strand : str,
+        chain,
+        mode : str = 'exact',
+        k : int = 0,
+        exon_type : str = 'exon'
+    ) -> list[GFeature]:
+        """
+        transcripts (parents of exon_type features) on chr / strand whose structure matches the exon chain
+        [(start, end), ...]: identical exons (mode='exact'), identical introns ('intron_chain'; multi-exon only)
+        or identical introns with both terminal ends within k bp ('fuzzy'; single-exon: both ends within k bp).
+        coordinates follow the coordinate system used by build_db.
+        the index is built on first use and kept in sync by add/pop_feature(s)
+        """
+        chain = tuple(sorted((s, e) for s, e in chain))
+        uids = self._chain_index(exon_type).match(chr, strand, chain, mode=mode, k=k)
+        return [self.features[uid] for uid in uids]
+
+    def match_transcript(
+        self,
+        transcript : GFeature,
+        mode : str = 'exact',
+        k : int = 0,
+        exon_type : str = 'exon'
+    ) -> list[GFeature]:
+        """
+        transcripts matching the exon chain of transcript (see match_chain), transcript itself excluded;
+        transcript may come from another annotation in the same coordinate system
+        """
+        exons = [c for c in transcript.children if c.feature_type == exon_type]
+        if not exons:
+            return []
+        hits = self.match_chain(exons[0].chr, exons[0].strand, transcript.get_chain(exon_type), mode, k, exon_type)
+        return [f for f in hits if f is not transcript]
+
+    def iter_features(self, chr : str = None):
+        """
+        features (optionally only those on chr) in features order;
+        with storage='columnar' only the rows on chr are touched
+        """
+        if isinstance(self.features, FeatureStore):
+            rows = self.features.chr_rows(chr) if chr is not None else self.features.live_rows()
+            for r in rows:
+                yield self.features._view(int(r))
+            return
+        for f in self.features.values():
+            if chr is None or f.chr == chr:
+                yield f
+
+    def query(
+        self,
+        chr : str,
+        start : int,
+        end : int,
+        strand : str = None,
+        ftype : str = None,
+        mode : str = 'overlap'
+    ) -> list[GFeature]:
+        """
+        features on chr overlapping (mode='overlap'), contained in ('contained')
+        or containing ('containing') start-end, sorted by coordinate;
+        start/end follow the coordinate system used by build_db
+        """
+        if isinstance(self.features, SqliteStore):
+            # through the (chr, start, end) index of the database; stored starts are 0-based with is_0b
+            check_mode(mode)
+            o = int(self.is_0b)
+            hits = [(s + o, e, uid, t) for s, e, uid, t in self.features.overlap(chr, start + o, end - o, strand)]
+            hits = select_hits(hits, start + o, end, mode)
+        else:
+            hits = self._interval_index().query(chr, start + self.is_0b, end, strand=strand, mode=mode)
+        return [self.features[uid] for _, _, uid, t in hits if ftype is None or t == ftype]
 
     def _create_gfeature(self, row):
         start, end = row['start'], row['end']
@@ -149,26 +949,128 @@ class GAn(BaseModel):
                     feature_type = row['feature_type'],
                     start = start,
                     end = end,
-                    score = None if row['score'] == '.' else row['score'],
+                    score = row['score'],
                     strand = row['strand'],
                     frame = row['frame'],
                     attributes = row['attributes'],
                     iak = self.iak,
-                    pak = self.pak
+                    pak = self.pak,
+                    uid_mode = self.uid_mode
                 )
         return gfeat
 
-    # TODO : add option to sort
-    # TODO : generalize to handle both gff AND gtf formats
-    def to_gff(self, fp):
-        start_offset = 1 if self.is_0b else 0
-        with open(fp, "w") as f:
-            for feature in self.features.values():
-                f.write(feature.to_gff_entry(start_offset=start_offset, include_children=False))
-            
+    def to_dataframe(self, explode : bool = False, parents : bool = True):
+        """
+        pandas DataFrame with one row per feature (see mjol.frames.to_dataframe);
+        explode adds one column per attribute key, parents a parent uid column
+        """
+        return to_dataframe(self, explode, parents)
+
+    def to_arrow(self, explode : bool = False, parents : bool = True):
+        """
+        to_dataframe as a pyarrow Table (requires pyarrow)
+        """
+        return to_arrow(self, explode, parents)
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df,
+        file_fmt : str = 'gff',
+        coord_system : str = None,
+        file_name : str = '',
+        **kwargs
+    ):
+        """
+        builds a GAn from a DataFrame / pyarrow Table with the nine gff columns
+        (e.g. written by to_dataframe) without any text parsing; parents are linked as in build_db.
+        coord_system defaults to the one recorded by to_dataframe, else '1b';
+        other keyword arguments (iak, pak, storage, uid_mode, ...) are passed to GAn
+        """
+        df = as_dataframe(df)
+        coord_system = coord_system or df.attrs.get('coord_system', '1b')
+        gan = cls(file_name=file_name, file_fmt=file_fmt, **kwargs)
+        gan._setup(coord_system)
+        gan._build(frame_rows(df, file_fmt, coord_system))
+        return gan
+
+    def to_gff(
+        self,
+        fp,
+        sort : bool = False,
+        chr_order : list = None,
+        file_fmt : str = None,
+        headers : bool = False,
+        separators : bool = False,
+        compress : str = 'auto',
+        n_threads : int = 1
+    ):
+        """
+        buffered bulk writer (see mjol.writer.write_gff); sort=True writes coordinate-sorted,
+        parents-before-children output, file_fmt='gtf' writes gtf-style attributes,
+        compress (default: from the suffix of fp) writes gzip / bgzf / zstd output
+        """
+        write_gff(
+            self, fp, sort=sort, chr_order=chr_order, file_fmt=file_fmt,
+            headers=headers, separators=separators, compress=compress, n_threads=n_threads
+        )
+
+    def sequences(self, fasta : str, kind : str = 'transcript', uids : list = None, exon_type : str = 'exon', cds_type : str = 'CDS'):
+        """
+        (transcript uid, sequence) pairs read from a memory-mapped FASTA, in coordinate order;
+        kind: 'transcript', 'cds' or 'protein' (see mjol.fasta.extract)
+        """
+        with Fasta(fasta) as fa:
+            for uid, _, _, _, seq in extract(self, fa, kind, uids, exon_type, cds_type):
+                yield uid, seq
+
+    def to_fasta(
+        self,
+        fp,
+        fasta : str,
+        kind : str = 'transcript',
+        uids : list = None,
+        exon_type : str = 'exon',
+        cds_type : str = 'CDS',
+        width : int = LINE_WIDTH,
+        compress : str = 'auto'
+    ) -> int:
+        """
+        streams spliced transcript / CDS / protein sequences to fp (see mjol.fasta.write_fasta);
+        returns the number of records written
+        """
+        return write_fasta(self, fp, fasta, kind, uids, exon_type, cds_type, width, compress)
+
+    def enable_profiling(self, hook = None, trace_alloc : bool = False, every : int = PROGRESS_EVERY) -> Profiler:
+        """
+        instruments build_db, add_features, pop_features and solve_synonyms (see mjol.instrument):
+        per-phase timers (build_db: parse, attributes, uid, validate, link; workers with n_workers > 1),
+        counters (rows, collisions, orphans, duplicates, added, popped) and, with trace_alloc, tracemalloc
+        snapshots after every operation. hook(event, info) receives 'progress' every `every` rows
+        while building and the operation name when one finishes
+        """
+        self.disable_profiling()
+        self._profiler = Profiler(hook, trace_alloc, every)
+        return self._profiler
+
+    def disable_profiling(self):
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+
+    def profile_report(self) -> dict:
+        """
+        phases (seconds, calls), counters and allocation snapshots recorded since enable_profiling
+        """
+        if self._profiler is None:
+            raise RuntimeError('profiling is not enabled (see GAn.enable_profiling)')
+        return self._profiler.report()
+
     def save_as_gix(self, file_path : str):
-        with open(file_path, 'wb') as fh:
-            pickle.dump(self, fh)
+        """
+        writes the versioned binary .gix format (see mjol.gix)
+        """
+        save_gix(self, file_path)
     
     # TODO: fix this
     def clear(self):
@@ -188,13 +1090,135 @@ class GAn(BaseModel):
         return list(self.lookup.keys())
 
 def load_from_gix(file_path : str):
+    """
+    opens a .gix file via mmap; features are decoded on access (storage='columnar').
+    legacy pickled .gix files are still accepted: their features are rebuilt into a current GAn
+    """
     try:
-        with open(file_path, 'rb') as fh:
-            res = pickle.load(fh)
+        if not is_gix(file_path):
+            with open(file_path, 'rb') as fh:
+                return _from_legacy(pickle.load(fh))
+        settings, store, lookup = load_gix(file_path)
     except Exception as e:
         raise RuntimeError(f"error while loading {file_path} : {e}")
+    res = GAn(
+        file_name = settings['file_name'],
+        file_fmt = settings['file_fmt'],
+        iak = settings['iak'],
+        pak = settings['pak'],
+        is_0b = settings['is_0b'],
+        uid_mode = settings['uid_mode'],
+        check_collisions = settings['check_collisions'],
+        ftypes = set(settings['ftypes']),
+        directives = settings['directives'],
+        storage = 'columnar'
+    )
+    res._next_seq = settings['next_seq']
+    res.features = store
+    res.lookup = lookup
     return res
 
+def _from_legacy(legacy) -> GAn:
+    """
+    GAn (storage='dict', uid_mode='sha256') rebuilt from the fields and features of a GAn pickled
+    by save_as_gix before the binary format: uids, lookup and parent links are computed afresh
+    """
+    d = legacy.__dict__
+    res = GAn(file_name=d['file_name'], file_fmt=d['file_fmt'], iak=d.get('iak', 'id'), pak=d.get('pak', 'parent'))
+    res._setup('0b' if d.get('is_0b') else '1b')
+    kv_sep = ' ' if res.file_fmt.lower() == 'gtf' else '='
+    o = int(res.is_0b) # rows are 1-based
+    res._build({
+        'chr' : f.chr, 'src' : f.src, 'feature_type' : f.feature_type, 'start' : f.start + o, 'end' : f.end,
+        'score' : f.score, 'strand' : f.strand, 'frame' : f.frame,
+        'attributes' : Attributes(kv_sep=kv_sep, data=f.attributes)
+    } for f in d['features'].values())
+    return res
+
+def load_from_sqlite(file_path : str, cache_size : int = CACHE_SIZE):
+    """
+    reopens a database written by build_db(storage='sqlite') without parsing;
+    changes are committed by features.sync() (also run by to_gff)
+    """
+    if not os.path.exists(file_path):
+        raise RuntimeError(f'{file_path} not found')
+    store = SqliteStore(file_path, 'id', 'parent', cache_size=cache_size)
+    meta = store.meta()
+    if 'file_name' not in meta:
+        raise RuntimeError(f'{file_path} was not written by build_db')
+    res = GAn(
+        file_name = meta['file_name'],
+        file_fmt = meta['file_fmt'],
+        iak = meta['iak'],
+        pak = meta['pak'],
+        is_0b = meta['is_0b'],
+        uid_mode = meta['uid_mode'],
+        check_collisions = meta['check_collisions'],
+        directives = meta['directives'],
+        storage = 'sqlite',
+        db_path = file_path,
+        cache_size = cache_size
+    )
+    store.iak, store.pak, store.uid_mode = res.iak, res.pak, res.uid_mode
+    res.ftypes = set(store.ftypes())
+    if res.uid_mode == 'seq':
+        res._next_seq = store.con.execute('SELECT coalesce(max(CAST(uid AS INTEGER)) + 1, 0) FROM features').fetchone()[0]
+    res.features = store
+    res.lookup = SqliteLookup(store)
+    return res
+
+SHARD_BYTES = 1 << 20 # minimum shard size of parallel builds
+FASTA_SECTION = re.compile(rb'^##fasta[^\n]*\n?', re.MULTILINE | re.IGNORECASE)
+
+def _body_size(file_name : str) -> int:
+    """
+    bytes up to the end of the '##FASTA' line (the whole file when there is none)
+    """
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return 0
+    with open(file_name, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        m = FASTA_SECTION.search(mm)
+        return m.end() if m else size
+
+def _read_shard(file_name : str, lo : int, hi : int):
+    """
+    lines starting within byte range [lo, hi)
+    """
+    with open(file_name, 'rb') as fh:
+        if lo > 0:
+            fh.seek(lo - 1)
+            fh.readline()
+        while fh.tell() < hi:
+            line = fh.readline()
+            if not line:
+                break
+            yield line.decode()
+
+def _build_shard(gan : GAn, lo : int, hi : int) -> tuple:
+    """
+    (directives, number of lines, records as columns, error) of a shard; records hold the raw attribute
+    column (a list of strings pickles much faster than Attributes objects). error: (shard line, reason)
+    """
+    directives = []
+    n_lines = 0
+    def lines():
+        nonlocal n_lines
+        for line in _read_shard(gan.file_name, lo, hi):
+            n_lines += 1
+            yield line
+    records = []
+    try:
+        for row in parse_lines(lines(), gan.file_fmt, directives):
+            if row is FLUSH:
+                continue
+            raw = row['attributes'].raw # taken before hashing may parse it
+            rec = gan._record(row)
+            records.append(rec[:8] + (raw or '',) + rec[9:])
+    except ParseError as e:
+        return directives, n_lines, None, (e.ln, e.reason)
+    return directives, n_lines, list(zip(*records)), None
+
 # helper functions
 def get_uids(l : list[GFeature]) -> list[str]:
     return [x.uid for x in l]
\ No newline at end of file
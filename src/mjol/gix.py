@@ -0,0 +1,356 @@
+"""
+.gix: versioned binary annotation index, opened via mmap
+
+layout: [MAGIC | u32 version | u64 meta offset | u64 meta length] [sections ...] [meta (json)]
+every section is a flat array aligned to ALIGN bytes; meta records each section's offset, dtype and length
+plus the GAn settings, the categorical string tables and the directives
+"""
+from mjol.base import *
+from mjol.store import FeatureStore, CATEGORICAL
+from mjol.utils import OrderedSet
+from collections.abc import MutableMapping
+import numpy as np
+import mmap
+import json
+import struct
+
+MAGIC = b'GIX\x00'
+VERSION = 1
+ALIGN = 64
+PREFIX = struct.Struct('<4sIQQ')
+
+NULL = b'\x00' # encodes a missing aid / paid
+
+def is_gix(file_path : str) -> bool:
+    with open(file_path, 'rb') as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+# uid <-> fixed-width sort key
+
+def _uid_width(uid_mode : str) -> int:
+    return {'xxh64' : 8, 'seq' : 8, 'xxh128' : 16}.get(uid_mode, 0)
+
+def _encode_uids(uids : list, uid_mode : str) -> np.ndarray:
+    w = _uid_width(uid_mode)
+    if w:
+        return np.array([uid.to_bytes(w, 'big') for uid in uids], dtype=f'S{w}')
+    return np.array([uid.encode() for uid in uids], dtype=bytes)
+
+def _decode_uid(key : bytes, uid_mode : str, width : int):
+    if _uid_width(uid_mode):
+        # numpy strips trailing NULs from fixed-width bytes
+        return int.from_bytes(key.ljust(width, b'\x00'), 'big')
+    return key.decode()
+
+def _pack_strs(values : list) -> tuple[np.ndarray, np.ndarray]:
+    enc = [NULL if v is None else v.encode() for v in values]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in enc])
+    return np.frombuffer(b''.join(enc), dtype=np.uint8), offsets
+
+def _as_store(gan) -> FeatureStore:
+    if isinstance(gan.features, FeatureStore):
+        gan.features.sync()
+        return gan.features
+    store = FeatureStore(gan.iak, gan.pak, gan.uid_mode)
+    for uid, f in gan.features.items():
+        store[uid] = f
+    store.sync() # parent rows of children that precede their parent
+    return store
+
+def save_gix(gan, file_path : str):
+    store = _as_store(gan)
+    rows = np.flatnonzero(store.column('alive'))
+    n = len(rows)
+    remap = np.full(store.n + 1, -1, dtype=np.int64) # remap[-1] == -1
+    remap[rows] = np.arange(n)
+
+    sec = {}
+    for k in CATEGORICAL + ['start', 'end', 'score']:
+        sec[k] = store.column(k)[rows]
+    sec['parent'] = remap[store.column('parent')[rows]]
+
+    # children in their current order: the store's child table, except for materialised
+    # views (they may have been re-linked since build), whose children lists are spliced in
+    if store.n:
+        store.children_rows(0)
+    offsets, kids = store._kids if store.n else (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    src_start = offsets[rows]
+    src_len = offsets[rows + 1] - src_start
+    extra = []
+    for i in np.flatnonzero(np.isin(rows, list(store._views))).tolist():
+        view_kids = [store.rows[c.uid] for c in store._views[int(rows[i])].children if c.uid in store.rows]
+        src_start[i] = len(kids) + len(extra)
+        src_len[i] = len(view_kids)
+        extra.extend(view_kids)
+    source = np.concatenate([kids, np.array(extra, dtype=np.int64)])
+    sec['child_offsets'] = np.zeros(n + 1, dtype=np.int64)
+    sec['child_offsets'][1:] = np.cumsum(src_len)
+    gather = np.repeat(src_start - sec['child_offsets'][:-1], src_len) + np.arange(sec['child_offsets'][-1])
+    sec['child_rows'] = remap[source[gather]]
+
+    uids = [store.uids[r] for r in rows.tolist()]
+    aids = [store.aids[r] for r in rows.tolist()]
+    sec['uid_keys'] = _encode_uids(uids, gan.uid_mode)
+    sec['aid_blob'], sec['aid_offsets'] = _pack_strs(aids)
+    sec['paid_blob'], sec['paid_offsets'] = _pack_strs([store.paids[r] for r in rows.tolist()])
+    sec['attr_blob'], sec['attr_offsets'] = _pack_strs([attributes_str(store.attrs[r]) for r in rows.tolist()])
+
+    # uid -> row: binary search over sorted keys
+    order = np.argsort(sec['uid_keys'], kind='stable')
+    sec['uid_sorted'] = sec['uid_keys'][order]
+    sec['uid_order'] = order.astype(np.int64)
+
+    # aid -> rows (row order within an aid)
+    with_aid = np.array([i for i, a in enumerate(aids) if a is not None], dtype=np.int64)
+    aid_keys = np.array([aids[i].encode() for i in with_aid.tolist()], dtype=bytes)
+    order = np.argsort(aid_keys, kind='stable')
+    aid_keys = aid_keys[order]
+    sec['aid_group_rows'] = with_aid[order]
+    starts = np.flatnonzero(np.r_[True, aid_keys[1:] != aid_keys[:-1]]) if len(aid_keys) else np.zeros(0, dtype=np.int64)
+    sec['aid_keys'] = aid_keys[starts]
+    sec['aid_group_offsets'] = np.r_[starts, len(aid_keys)].astype(np.int64)
+
+    # per-chromosome directory
+    order = np.argsort(sec['chr'], kind='stable')
+    sec['chr_rows'] = order.astype(np.int64)
+    sec['chr_offsets'] = np.searchsorted(sec['chr'][order], np.arange(len(store.pools['chr'].values) + 1)).astype(np.int64)
+
+    meta = {
+        'version' : VERSION,
+        'n' : n,
+        'gan' : {
+            'file_name' : gan.file_name,
+            'file_fmt' : gan.file_fmt,
+            'iak' : gan.iak,
+            'pak' : gan.pak,
+            'is_0b' : gan.is_0b,
+            'uid_mode' : gan.uid_mode,
+            'check_collisions' : gan.check_collisions,
+            'ftypes' : sorted(gan.ftypes),
+            'directives' : gan.directives,
+            'next_seq' : gan._next_seq
+        },
+        'pools' : {k : store.pools[k].values for k in CATEGORICAL},
+        'sections' : {}
+    }
+    with open(file_path, 'wb') as fh:
+        fh.write(PREFIX.pack(MAGIC, VERSION, 0, 0))
+        for name, arr in sec.items():
+            arr = np.ascontiguousarray(arr)
+            fh.write(b'\x00' * (-fh.tell() % ALIGN))
+            meta['sections'][name] = {'offset' : fh.tell(), 'dtype' : arr.dtype.str, 'count' : len(arr)}
+            fh.write(arr.tobytes())
+        meta_offset = fh.tell()
+        blob = json.dumps(meta).encode()
+        fh.write(blob)
+        fh.seek(0)
+        fh.write(PREFIX.pack(MAGIC, VERSION, meta_offset, len(blob)))
+
+class _Column:
+    """
+    row -> value decoded on access from mmapped sections; writes and appends go to an overlay
+    """
+    def __init__(self, n : int, get):
+        self.n = n
+        self.get = get
+        self.over = {}
+        self.tail = []
+
+    def __getitem__(self, r):
+        if r >= self.n:
+            return self.tail[r - self.n]
+        if r in self.over:
+            return self.over[r]
+        return self.get(r)
+
+    def __setitem__(self, r, v):
+        if r >= self.n:
+            self.tail[r - self.n] = v
+        else:
+            self.over[r] = v
+
+    def append(self, v):
+        self.tail.append(v)
+
+    def __len__(self) -> int:
+        return self.n + len(self.tail)
+
+    def __iter__(self):
+        for r in range(len(self)):
+            yield self[r]
+
+    def tolist(self) -> list:
+        return list(self)
+
+class _Rows(MutableMapping):
+    """
+    uid -> row through binary search over the sorted uid keys, with an overlay for mutations
+    """
+    def __init__(self, sorted_keys, order, uids : _Column, encode):
+        self.sorted_keys = sorted_keys
+        self.order = order
+        self.uids = uids
+        self.encode = encode
+        self.over = {}
+        self.removed = set()
+        self._len = len(order)
+
+    def _base(self, uid):
+        if uid in self.removed:
+            return None
+        try:
+            key = self.encode(uid).rstrip(b'\x00') # as stored by numpy
+        except (AttributeError, OverflowError, TypeError):
+            return None
+        i = int(np.searchsorted(self.sorted_keys, key))
+        if i < len(self.sorted_keys) and self.sorted_keys[i] == key:
+            return int(self.order[i])
+        return None
+
+    def __getitem__(self, uid) -> int:
+        if uid in self.over:
+            return self.over[uid]
+        r = self._base(uid)
+        if r is None:
+            raise KeyError(uid)
+        return r
+
+    def __contains__(self, uid) -> bool:
+        return uid in self.over or self._base(uid) is not None
+
+    def __setitem__(self, uid, r : int):
+        if uid not in self:
+            self._len += 1
+        self.over[uid] = r
+
+    def __delitem__(self, uid):
+        if uid not in self:
+            raise KeyError(uid)
+        self.over.pop(uid, None)
+        self.removed.add(uid)
+        self._len -= 1
+
+    def __iter__(self):
+        over = dict.fromkeys(self.over)
+        for r in self.order.tolist():
+            uid = self.uids.get(r)
+            if uid not in self.removed and uid not in over:
+                yield uid
+        yield from over
+
+    def __len__(self) -> int:
+        return self._len
+
+class _Lookup(MutableMapping):
+    """
+    aid -> OrderedSet of uids through binary search over the sorted aid table; buckets are materialised
+    (and kept in the overlay, so in-place updates persist) on first access
+    """
+    def __init__(self, aid_keys, offsets, rows, uids : _Column):
+        self.aid_keys = aid_keys
+        self.offsets = offsets
+        self.rows = rows
+        self.uids = uids
+        self.over = {}
+        self.removed = set()
+        self._len = len(aid_keys)
+
+    def _base(self, aid):
+        if aid in self.removed or not isinstance(aid, str):
+            return None
+        key = aid.encode()
+        i = int(np.searchsorted(self.aid_keys, key))
+        if i < len(self.aid_keys) and self.aid_keys[i] == key:
+            return i
+        return None
+
+    def __getitem__(self, aid) -> OrderedSet:
+        if aid in self.over:
+            return self.over[aid]
+        i = self._base(aid)
+        if i is None:
+            raise KeyError(aid)
+        res = self.over[aid] = OrderedSet(self.uids[r] for r in self.rows[self.offsets[i]:self.offsets[i + 1]].tolist())
+        return res
+
+    def __contains__(self, aid) -> bool:
+        return aid in self.over or self._base(aid) is not None
+
+    def __setitem__(self, aid, uids : OrderedSet):
+        if aid not in self:
+            self._len += 1
+        self.over[aid] = uids
+
+    def __delitem__(self, aid):
+        if aid not in self:
+            raise KeyError(aid)
+        self.over.pop(aid, None)
+        self.removed.add(aid)
+        self._len -= 1
+
+    def __iter__(self):
+        # aids in order of their first row (as in a dict / columnar build), then the ones added since;
+        # snapshot: __getitem__ moves base entries into the overlay while iterating
+        over = list(self.over)
+        aid_keys = self.aid_keys.tolist()
+        for i in np.argsort(self.rows[self.offsets[:-1]], kind='stable').tolist():
+            aid = aid_keys[i].decode()
+            if aid not in self.removed:
+                yield aid
+        for aid in over:
+            if self._base(aid) is None:
+                yield aid
+
+    def __len__(self) -> int:
+        return self._len
+
+def load_gix(file_path : str) -> tuple[dict, FeatureStore, _Lookup]:
+    """
+    maps file_path (copy-on-write) and returns (GAn settings, FeatureStore, lookup);
+    nothing is decoded until it is accessed
+    """
+    with open(file_path, 'rb') as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, meta_offset, meta_len = PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise RuntimeError(f'{file_path} is not a .gix file')
+    if version != VERSION:
+        raise RuntimeError(f'unsupported .gix version {version} (expected: {VERSION})')
+    meta = json.loads(mm[meta_offset:meta_offset + meta_len])
+    sec = {
+        name : np.frombuffer(mm, dtype=np.dtype(s['dtype']), count=s['count'], offset=s['offset'])
+        for name, s in meta['sections'].items()
+    }
+    settings = meta['gan']
+    uid_mode = settings['uid_mode']
+    n = meta['n']
+
+    store = FeatureStore(settings['iak'], settings['pak'], settings['uid_mode'], capacity=0)
+    for k, values in meta['pools'].items():
+        store.pools[k].values = values
+        store.pools[k].codes = {v : i for i, v in enumerate(values)}
+    for k in CATEGORICAL + ['start', 'end', 'score', 'parent']:
+        store.cols[k] = sec[k]
+    store.cols['alive'] = np.ones(n, dtype=np.bool_)
+    store.n = n
+
+    def strs(blob, offsets, decode=lambda s : s):
+        def get(r):
+            b = blob[offsets[r]:offsets[r + 1]].tobytes()
+            return None if b == NULL else decode(b.decode())
+        return _Column(n, get)
+
+    width = sec['uid_keys'].dtype.itemsize
+    keys = sec['uid_keys']
+    store.uids = _Column(n, lambda r : _decode_uid(keys[r], uid_mode, width))
+    store.aids = strs(sec['aid_blob'], sec['aid_offsets'])
+    store.paids = strs(sec['paid_blob'], sec['paid_offsets'])
+    store.attrs = strs(sec['attr_blob'], sec['attr_offsets'], lambda s : Attributes(s))
+    w = _uid_width(uid_mode)
+    encode = (lambda uid : uid.to_bytes(w, 'big')) if w else (lambda uid : uid.encode())
+    store.rows = _Rows(sec['uid_sorted'], sec['uid_order'], store.uids, encode)
+    store._kids = (sec['child_offsets'], sec['child_rows'])
+    store._chr_dir = (n, sec['chr_offsets'], sec['chr_rows'])
+    lookup = _Lookup(sec['aid_keys'], sec['aid_group_offsets'], sec['aid_group_rows'], store.uids)
+    return settings, store, lookup
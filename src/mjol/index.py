@@ -0,0 +1,424 @@
+import numpy as np
+import bisect
+
+class NCList:
+    """
+    nested containment list over closed intervals (sorted arrays, no tree objects).
+    each sublist holds intervals not contained in one another, so their ends are sorted too
+    """
+    def __init__(self, starts, ends, uids, ftypes):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.lexsort((-ends, starts)) # start asc, end desc: containers come first
+        s, e = starts[order], ends[order]
+        n = len(s)
+        parent = np.full(n, -1, dtype=np.int64)
+        stack = []
+        for i, end in enumerate(e.tolist()):
+            while stack and e[stack[-1]] < end:
+                stack.pop()
+            if stack:
+                parent[i] = stack[-1]
+            stack.append(i)
+        # lay sublists out contiguously: root sublist first, then one per container
+        layout = np.argsort(parent, kind='stable')
+        pos = np.empty(n, dtype=np.int64)
+        pos[layout] = np.arange(n)
+        bounds = np.searchsorted(parent[layout], np.arange(-1, n + 1))
+        self.starts = s[layout]
+        self.ends = e[layout]
+        uids = np.asarray(uids, dtype=object)[order]
+        ftypes = np.asarray(ftypes, dtype=object)[order]
+        self.uids = uids[layout].tolist()
+        self.ftypes = ftypes[layout].tolist()
+        # sublist [lo, hi) of the node at layout position p: sub_lo[p], sub_hi[p]
+        self.sub_lo = np.zeros(n, dtype=np.int64)
+        self.sub_hi = np.zeros(n, dtype=np.int64)
+        self.sub_lo[pos] = bounds[1:-1]
+        self.sub_hi[pos] = bounds[2:]
+        self.root = (int(bounds[0]), int(bounds[1]))
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def overlap(self, start : int, end : int) -> list[int]:
+        """
+        layout positions of intervals overlapping [start, end]
+        """
+        res = []
+        todo = [self.root]
+        while todo:
+            lo, hi = todo.pop()
+            i = lo + int(np.searchsorted(self.ends[lo:hi], start))
+            while i < hi and self.starts[i] <= end:
+                res.append(i)
+                if self.sub_lo[i] < self.sub_hi[i]:
+                    todo.append((int(self.sub_lo[i]), int(self.sub_hi[i])))
+                i += 1
+        return res
+
+def check_mode(mode : str):
+    if mode not in ['overlap', 'contained', 'containing']:
+        raise ValueError(f'unknown query mode {mode} (expected: [overlap, contained, containing])')
+
+def select_hits(hits : list, start : int, end : int, mode : str = 'overlap') -> list:
+    """
+    (start, end, ...) overlap hits restricted to mode, sorted by coordinate
+    """
+    if mode == 'contained':
+        hits = [h for h in hits if h[0] >= start and h[1] <= end]
+    elif mode == 'containing':
+        hits = [h for h in hits if h[0] <= start and h[1] >= end]
+    hits.sort(key=lambda h: (h[0], h[1]))
+    return hits
+
+class IntervalIndex:
+    """
+    per (chr, strand) interval index; mutations are buffered (pending / removed)
+    and folded into a fresh NCList once the buffer grows past a fraction of the bin
+    """
+    def __init__(self):
+        self.bins = {} # (chr, strand) -> [NCList, pending {uid: (start, end, ftype)}, removed {uid}]
+
+    @classmethod
+    def from_arrays(cls, chrs, strands, starts, ends, uids, ftypes):
+        index = cls()
+        keys = list(zip(chrs, strands))
+        groups = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(key, []).append(i)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        uids = np.asarray(uids, dtype=object)
+        ftypes = np.asarray(ftypes, dtype=object)
+        for key, idx in groups.items():
+            index.bins[key] = [NCList(starts[idx], ends[idx], uids[idx], ftypes[idx]), {}, set()]
+        return index
+
+    def add(self, chr : str, strand : str, start : int, end : int, uid, ftype : str):
+        b = self.bins.setdefault((chr, strand), [NCList([], [], [], []), {}, set()])
+        b[2].add(uid) # masks a stale copy in the NCList, if any
+        b[1][uid] = (start, end, ftype)
+
+    def discard(self, chr : str, strand : str, uid):
+        b = self.bins.get((chr, strand))
+        if b is None:
+            return
+        if b[1].pop(uid, None) is None:
+            b[2].add(uid)
+
+    def _compact(self, key):
+        nc, pending, removed = self.bins[key]
+        keep = [i for i, uid in enumerate(nc.uids) if uid not in removed]
+        starts = nc.starts[keep].tolist() + [v[0] for v in pending.values()]
+        ends = nc.ends[keep].tolist() + [v[1] for v in pending.values()]
+        uids = [nc.uids[i] for i in keep] + list(pending)
+        ftypes = [nc.ftypes[i] for i in keep] + [v[2] for v in pending.values()]
+        self.bins[key] = [NCList(starts, ends, uids, ftypes), {}, set()]
+
+    def query(self, chr : str, start : int, end : int, strand : str = None, mode : str = 'overlap') -> list:
+        """
+        (start, end, uid, ftype) of intervals on chr (and strand) that
+        overlap [start, end], are contained in it, or contain it (mode)
+        """
+        check_mode(mode)
+        keys = [k for k in self.bins if k[0] == chr and (strand is None or k[1] == strand)]
+        hits = []
+        for key in keys:
+            nc, pending, removed = self.bins[key]
+            if len(pending) + len(removed) > max(64, len(nc) >> 4):
+                self._compact(key)
+                nc, pending, removed = self.bins[key]
+            for i in nc.overlap(start, end):
+                uid = nc.uids[i]
+                if uid not in removed:
+                    hits.append((int(nc.starts[i]), int(nc.ends[i]), uid, nc.ftypes[i]))
+            for uid, (s, e, ftype) in pending.items():
+                if s <= end and e >= start:
+                    hits.append((s, e, uid, ftype))
+        return select_hits(hits, start, end, mode)
+
+MONO_SHIFT = 10 # 1 kb start bins for single-exon transcripts
+
+def intron_chain(chain : tuple) -> tuple:
+    """
+    introns (start, end) between consecutive exons of a sorted, closed exon chain
+    """
+    return tuple(zip([e + 1 for _, e in chain[:-1]], [s - 1 for s, _ in chain[1:]]))
+
+class ChainIndex:
+    """
+    transcript structure index: hash buckets keyed by (chr, strand, exon chain) for exact lookup,
+    by (chr, strand, intron chain) for multi-exon fuzzy lookup and by (chr, strand, start bin)
+    for single-exon fuzzy lookup. transcripts whose exons changed are marked dirty and re-indexed by the owner
+    """
+    def __init__(self, exon_type : str = 'exon'):
+        self.exon_type = exon_type
+        self.chains = {} # uid -> (chr, strand, chain)
+        # buckets are dicts used as insertion-ordered sets
+        self.exact = {} # (chr, strand, chain) -> {uid : None}
+        self.introns = {} # (chr, strand, intron chain) -> {uid : None}
+        self.mono = {} # (chr, strand, start >> MONO_SHIFT) -> {uid : None}
+        self.dirty = set() # uids to re-index
+
+    @classmethod
+    def from_chains(cls, chains : dict, exon_type : str = 'exon'):
+        index = cls(exon_type)
+        for uid, (chr, strand, chain) in chains.items():
+            index.add(uid, chr, strand, chain)
+        return index
+
+    def _buckets(self, chr : str, strand : str, chain : tuple) -> list:
+        if len(chain) > 1:
+            return [(self.introns, (chr, strand, intron_chain(chain)))]
+        return [(self.mono, (chr, strand, chain[0][0] >> MONO_SHIFT))]
+
+    def add(self, uid, chr : str, strand : str, chain : tuple):
+        self.discard(uid)
+        if not chain:
+            return
+        self.chains[uid] = (chr, strand, chain)
+        self.exact.setdefault((chr, strand, chain), {})[uid] = None
+        for buckets, key in self._buckets(chr, strand, chain):
+            buckets.setdefault(key, {})[uid] = None
+
+    def discard(self, uid):
+        entry = self.chains.pop(uid, None)
+        if entry is None:
+            return
+        chr, strand, chain = entry
+        for buckets, key in [(self.exact, entry)] + self._buckets(chr, strand, chain):
+            bucket = buckets[key]
+            del bucket[uid]
+            if not bucket:
+                del buckets[key]
+
+    def match(self, chr : str, strand : str, chain : tuple, mode : str = 'exact', k : int = 0) -> list:
+        """
+        uids of transcripts on chr / strand with the same exon chain (mode='exact'),
+        the same intron chain ('intron_chain'; multi-exon only) or the same intron chain
+        with both terminal ends within k bp ('fuzzy'; single-exon: both ends within k bp)
+        """
+        if mode not in ['exact', 'intron_chain', 'fuzzy']:
+            raise ValueError(f'unknown match mode {mode} (expected: [exact, intron_chain, fuzzy])')
+        if not chain:
+            return []
+        if mode == 'exact' or (mode == 'fuzzy' and k <= 0):
+            return list(self.exact.get((chr, strand, chain), ()))
+        start, end = chain[0][0], chain[-1][1]
+        if len(chain) > 1:
+            hits = self.introns.get((chr, strand, intron_chain(chain)), ())
+            if mode == 'intron_chain':
+                return list(hits)
+        elif mode == 'intron_chain':
+            return []
+        else:
+            hits = [
+                uid for b in range((start - k) >> MONO_SHIFT, ((start + k) >> MONO_SHIFT) + 1)
+                for uid in self.mono.get((chr, strand, b), ())
+            ]
+        res = []
+        for uid in hits:
+            c = self.chains[uid][2]
+            if abs(c[0][0] - start) <= k and abs(c[-1][1] - end) <= k:
+                res.append(uid)
+        return res
+
+class CollisionIndex:
+    """
+    candidates of attribute IDs shared by several features, per (chr, strand) sorted by start,
+    so the candidate closest to a feature is found in O(log k) instead of scanning all k.
+    a group is built from the lookup bucket on first use (rank: position in the bucket) and then kept
+    in sync through add / discard; coords maps a uid to (chr, strand, start, end)
+    """
+    def __init__(self):
+        self.groups = {} # aid -> {(chr, strand) : [(start, end, rank, uid)]}
+        self.ranks = {} # aid -> rank of the next candidate
+
+    def group(self, aid, uids, coords) -> dict:
+        g = self.groups.get(aid)
+        if g is None:
+            g = self.groups[aid] = {}
+            for rank, uid in enumerate(uids):
+                chr, strand, start, end = coords(uid)
+                g.setdefault((chr, strand), []).append((start, end, rank, uid))
+            for entries in g.values():
+                entries.sort()
+            self.ranks[aid] = len(uids)
+        return g
+
+    def add(self, aid, uid, chr : str, strand : str, start : int, end : int):
+        # groups not built yet pick uid up from the lookup bucket
+        g = self.groups.get(aid)
+        if g is None:
+            return
+        bisect.insort(g.setdefault((chr, strand), []), (start, end, self.ranks[aid], uid))
+        self.ranks[aid] += 1
+
+    def discard(self, aid, uid, chr : str, strand : str, start : int, end : int):
+        g = self.groups.get(aid)
+        if g is None:
+            return
+        entries = g.get((chr, strand), [])
+        i = bisect.bisect_left(entries, (start,))
+        while i < len(entries) and entries[i][0] == start:
+            if entries[i][3] == uid:
+                del entries[i]
+                if not entries:
+                    del g[(chr, strand)]
+                return
+            i += 1
+        # coordinates changed since uid was added
+        for key, entries in list(g.items()):
+            for i, entry in enumerate(entries):
+                if entry[3] == uid:
+                    del entries[i]
+                    if not entries:
+                        del g[key]
+                    return
+
+    @staticmethod
+    def _nearest(entries : list, start : int, end : int, best : tuple) -> tuple:
+        # (distance, rank, uid) of the closest entry (|delta start| + |delta end|, ties: lowest rank), or best
+        i = bisect.bisect_left(entries, (start,))
+        for step, j in [(1, i), (-1, i - 1)]:
+            while 0 <= j < len(entries):
+                s, e, rank, uid = entries[j]
+                if best is not None and abs(s - start) > best[0]:
+                    break
+                d = abs(s - start) + abs(e - end)
+                if best is None or (d, rank) < best[:2]:
+                    best = (d, rank, uid)
+                j += step
+        return best
+
+    def closest(self, aid, uids, coords, chr : str, strand : str, start : int, end : int):
+        """
+        uid of the candidate closest to (chr, strand, start, end): same chr and strand first,
+        then same chr, then any; within a tier the smallest |delta start| + |delta end|, ties in lookup order
+        """
+        g = self.group(aid, uids, coords)
+        tiers = [
+            [(chr, strand)],
+            [k for k in g if k[0] == chr and k[1] != strand],
+            [k for k in g if k[0] != chr]
+        ]
+        for keys in tiers:
+            best = None
+            for key in keys:
+                if key in g:
+                    best = self._nearest(g[key], start, end, best)
+            if best is not None:
+                return best[2]
+        raise KeyError(f'{aid} has no candidates')
+
+class TreeIndex:
+    """
+    nested-set numbering of the parent / child forest: positions (features order) in preorder, with the
+    preorder rank and subtree size of each, so the descendants of a feature are the contiguous slice
+    order[pre + 1 : pre + size] and ancestry is a range check. children follow features order.
+    built without recursion; afterwards kept up to date tree by tree: the owner marks the roots of the
+    trees it changes as dirty and re-numbers each of them (set_tree), so an add / pop costs the size of
+    the trees it touches rather than a rebuild. a tree is numbered either in the base arrays or in local
+    """
+    def __init__(self, uids, parent : np.ndarray, ftypes):
+        n = len(parent)
+        self.uids = list(uids)
+        self.pos = {uid : i for i, uid in enumerate(self.uids)}
+        self.parent = parent
+        self.ftypes = list(ftypes)
+        kids = np.flatnonzero(parent >= 0)
+        kids = kids[np.argsort(parent[kids], kind='stable')]
+        offsets = np.searchsorted(parent[kids], np.arange(n + 1)).tolist()
+        kids = kids.tolist()
+        order = []
+        stack = np.flatnonzero(parent < 0)[::-1].tolist()
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(kids[offsets[i]:offsets[i + 1]][::-1])
+        if len(order) < n: # features on a cycle are never reached from a root
+            raise RuntimeError('cycle in parent-child relationships')
+        size = [1] * n
+        up = parent.tolist()
+        for i in reversed(order):
+            if up[i] >= 0:
+                size[up[i]] += size[i]
+        self.order = np.array(order, dtype=np.int64)
+        self.pre = np.empty(n, dtype=np.int64)
+        self.pre[self.order] = np.arange(n)
+        self.size = np.array(size, dtype=np.int64)
+        self.local = {} # uid -> (tree uids in preorder, rank, size, parent uid, ftype) of re-numbered trees
+        self.dirty = set() # roots of the trees to re-number
+
+    def set_tree(self, nodes : list):
+        """
+        re-numbers one tree from its (uid, parent uid, ftype) nodes in preorder, the root first
+        """
+        tree = [uid for uid, _, _ in nodes]
+        self.drop(tree[0])
+        rank = {uid : k for k, uid in enumerate(tree)}
+        size = [1] * len(tree)
+        for k in range(len(tree) - 1, 0, -1):
+            size[rank[nodes[k][1]]] += size[k]
+        for k, (uid, puid, ftype) in enumerate(nodes):
+            self.local[uid] = (tree, k, size[k], puid, ftype)
+
+    def drop(self, root):
+        """
+        forgets the local numbering of the tree rooted at root (the base arrays are left as they are)
+        """
+        entry = self.local.get(root)
+        if entry is None or entry[1] != 0:
+            return
+        tree = entry[0]
+        for uid in tree:
+            if self.local.get(uid, (None,))[0] is tree:
+                del self.local[uid]
+
+    def descendants(self, uid) -> list:
+        """
+        uids of the descendants of uid, in preorder
+        """
+        entry = self.local.get(uid)
+        if entry is not None:
+            tree, k, size = entry[:3]
+            return tree[k + 1:k + size]
+        i = self.pos[uid]
+        k = int(self.pre[i])
+        return [self.uids[j] for j in self.order[k + 1:k + int(self.size[i])].tolist()]
+
+    def subtree_size(self, uid) -> int:
+        entry = self.local.get(uid)
+        if entry is not None:
+            return entry[2]
+        return int(self.size[self.pos[uid]])
+
+    def is_ancestor(self, uid, other) -> bool:
+        a, b = self.local.get(uid), self.local.get(other)
+        if a is not None or b is not None:
+            # a tree is numbered in one place only
+            return a is not None and b is not None and a[0] is b[0] and a[1] < b[1] < a[1] + a[2]
+        i, j = self.pos[uid], self.pos[other]
+        return bool(self.pre[i] < self.pre[j] < self.pre[i] + self.size[i])
+
+    def ancestor(self, uid, ftype : str = None):
+        """
+        uid of the closest ancestor of type ftype (any type: the root of its tree), None if there is none
+        """
+        entry = self.local.get(uid)
+        if entry is not None:
+            tree, k = entry[:2]
+            p = entry[3]
+            while p is not None:
+                if ftype is not None and self.local[p][4] == ftype:
+                    return p
+                p = self.local[p][3]
+            return None if ftype is not None or k == 0 else tree[0]
+        i = self.pos[uid]
+        p = int(self.parent[i])
+        while p >= 0:
+            if ftype is not None and self.ftypes[p] == ftype:
+                return self.uids[p]
+            i, p = p, int(self.parent[p])
+        return None if ftype is not None or i == self.pos[uid] else self.uids[i]
@@ -0,0 +1,187 @@
+"""
+opt-in instrumentation (GAn.enable_profiling): per-phase timers, counters, tracemalloc
+snapshots and a progress hook. nothing here runs unless profiling is enabled
+"""
+from mjol.store import FeatureStore
+from mjol.sqlite import SqliteStore
+from contextlib import contextmanager
+from functools import wraps
+import tracemalloc
+import time
+
+PROGRESS_EVERY = 100_000 # rows between 'progress' events while building
+TOP_ALLOCS = 10 # allocation sites kept per snapshot
+
+class Profiler:
+    """
+    phases : name -> [seconds, calls]
+    counters : name -> count
+    allocs : label -> tracemalloc summary (trace_alloc only)
+    hook(event, info) is called every `every` rows while building ('progress') and once
+    at the end of every instrumented operation (event: the operation name)
+    """
+    def __init__(self, hook = None, trace_alloc : bool = False, every : int = PROGRESS_EVERY):
+        self.hook = hook
+        self.trace_alloc = trace_alloc
+        self.every = every
+        self.phases = {}
+        self.counters = {}
+        self.allocs = {}
+        self._snapshot = None # last tracemalloc snapshot
+        self._tracing = False # tracemalloc started by this profiler
+        if trace_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def _acc(self, name : str) -> list:
+        acc = self.phases.get(name)
+        if acc is None:
+            acc = self.phases[name] = [0.0, 0]
+        return acc
+
+    @contextmanager
+    def phase(self, name : str):
+        acc = self._acc(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            acc[0] += time.perf_counter() - t0
+            acc[1] += 1
+
+    def timed(self, name : str, fn):
+        """
+        fn, with the time spent in it added to phase name
+        """
+        acc = self._acc(name)
+        clock = time.perf_counter
+        def wrapper(*args):
+            t0 = clock()
+            res = fn(*args)
+            acc[0] += clock() - t0
+            acc[1] += 1
+            return res
+        return wrapper
+
+    def timed_iter(self, name : str, it, operation : str = None):
+        """
+        it, with the time spent producing items added to phase name;
+        emits 'progress' every `every` items when operation is given
+        """
+        acc = self._acc(name)
+        clock = time.perf_counter
+        it = iter(it)
+        n = 0
+        while True:
+            t0 = clock()
+            try:
+                x = next(it)
+            except StopIteration:
+                acc[0] += clock() - t0
+                return
+            acc[0] += clock() - t0
+            acc[1] += 1
+            n += 1
+            if operation is not None and n % self.every == 0:
+                self.emit('progress', operation=operation, rows=n)
+            yield x
+
+    def remainder(self, name : str, total : str, parts : list):
+        """
+        phase name: the time of phase total not spent in parts (interleaved with them)
+        """
+        acc = self._acc(name)
+        acc[0] = self.phases[total][0] - sum(self.phases[p][0] for p in parts if p in self.phases)
+        acc[1] = self.phases[total][1]
+
+    def count(self, name : str, n : int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def emit(self, event : str, **info):
+        if self.hook is not None:
+            self.hook(event, info)
+
+    def snapshot(self, label : str):
+        """
+        traced memory (current / peak since the last snapshot) and the allocation sites
+        that grew the most since then
+        """
+        if not self.trace_alloc:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        snap = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ])
+        if self._snapshot is None:
+            top = [(str(s.traceback), s.size, s.count) for s in snap.statistics('lineno')[:TOP_ALLOCS]]
+        else:
+            top = [(str(s.traceback), s.size_diff, s.count_diff) for s in snap.compare_to(self._snapshot, 'lineno')[:TOP_ALLOCS]]
+        self.allocs[label] = {'current_mb' : current / 2**20, 'peak_mb' : peak / 2**20, 'top' : top}
+        self._snapshot = snap
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def report(self) -> dict:
+        return {
+            'phases' : {k : {'seconds' : s, 'calls' : n} for k, (s, n) in self.phases.items()},
+            'counters' : dict(self.counters),
+            'allocs' : dict(self.allocs)
+        }
+
+def build_counters(gan) -> dict:
+    """
+    rows : features built
+    collisions : attribute IDs held by several features
+    orphans : features whose parent ID was not found
+    """
+    features = gan.features
+    if isinstance(features, SqliteStore):
+        con = features.con
+        return {
+            'rows' : len(features),
+            'collisions' : con.execute(
+                'SELECT count(*) FROM (SELECT aid FROM features WHERE aid IS NOT NULL GROUP BY aid HAVING count(*) > 1)'
+            ).fetchone()[0],
+            'orphans' : con.execute('SELECT count(*) FROM features WHERE paid IS NOT NULL AND puid IS NULL').fetchone()[0]
+        }
+    if isinstance(features, FeatureStore):
+        parent = features.column('parent')
+        orphans = sum(1 for r in features.live_rows() if features.paids[r] and parent[r] < 0)
+    else:
+        orphans = sum(1 for f in features.values() if f.__dict__['gid'].paid and f.__dict__['gid'].puid is None)
+    return {
+        'rows' : len(features),
+        'collisions' : sum(1 for uids in gan.lookup.values() if len(uids) > 1),
+        'orphans' : orphans
+    }
+
+def profiled(operation : str, counter : str = None):
+    """
+    times a GAn operation (first argument: the GAn) as phase operation when profiling is enabled;
+    counter: counts the change in the number of features
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(gan, *args, **kwargs):
+            prof = gan._profiler
+            if prof is None:
+                return fn(gan, *args, **kwargs)
+            n = len(gan.features) if counter else 0
+            t0 = time.perf_counter()
+            with prof.phase(operation):
+                res = fn(gan, *args, **kwargs)
+            info = {'seconds' : time.perf_counter() - t0}
+            if counter:
+                info[counter] = abs(len(gan.features) - n)
+                prof.count(counter, info[counter])
+            prof.snapshot(operation)
+            prof.emit(operation, **info)
+            return res
+        return wrapper
+    return decorate
@@ -0,0 +1,73 @@
+from mjol.utils import Attributes, check_attributes
+from mjol.regions import region_lines
+from mjol.compression import open_text
+
+HDR = [
+    'chr', 'src', 'feature_type', 'start',
+    'end', 'score', 'strand', 'frame', 'attributes'
+]
+
+# yielded by parse_lines at every '###' marker
+# (GFF3: all forward references seen so far are resolved)
+FLUSH = '###'
+
+class ParseError(ValueError):
+    """
+    malformed line ln (1-based) of the input
+    """
+    def __init__(self, ln : int, reason : str):
+        super().__init__(f'line {ln}: {reason}')
+        self.ln = ln
+        self.reason = reason
+
+def parse_lines(lines, file_fmt : str, directives : list = None, numbered : bool = False):
+    """
+    streams gtf/gff lines into row dicts (keys: HDR) one line at a time
+    (attributes stay unparsed until touched, see Attributes);
+    '##' directives are appended to directives (if provided); parsing stops after '##FASTA'.
+    numbered: lines are (ln, line) pairs (e.g. from region_lines), ln being reported in ParseErrors
+    """
+    kv_sep = ' ' if file_fmt.lower() == 'gtf' else '='
+    for ln, line in (lines if numbered else enumerate(lines, 1)):
+        if line[:1] == '#':
+            if line.startswith('###'):
+                yield FLUSH
+            elif line.startswith('##'):
+                line = line.rstrip('\r\n')
+                if directives is not None:
+                    directives.append(line)
+                if line.upper().startswith('##FASTA'):
+                    return
+            continue
+        cols = line.rstrip('\r\n').split('\t')
+        if len(cols) != 9:
+            if not line.strip():
+                continue
+            raise ParseError(ln, f'expected 9 tab-separated columns, found {len(cols)}')
+        try:
+            check_attributes(cols[8], kv_sep)
+            yield {
+                'chr' : cols[0],
+                'src' : cols[1],
+                'feature_type' : cols[2],
+                'start' : int(cols[3]),
+                'end' : int(cols[4]),
+                'score' : None if cols[5] == '.' else float(cols[5]),
+                'strand' : cols[6],
+                'frame' : cols[7],
+                'attributes' : Attributes(cols[8], kv_sep=kv_sep)
+            }
+        except ValueError as e:
+            raise ParseError(ln, str(e))
+
+def read_gff(file_name : str, file_fmt : str, directives : list = None, regions : list = None, n_threads : int = 1):
+    """
+    bounded-memory reader: yields one row dict per feature line of file_name
+    (plain, gzip, bgzip or zstd-compressed; see mjol.compression.open_text);
+    with regions, only features overlapping them (see mjol.regions)
+    """
+    if regions is not None:
+        yield from parse_lines(region_lines(file_name, regions, numbered=True), file_fmt, directives, numbered=True)
+        return
+    with open_text(file_name, n_threads) as fh:
+        yield from parse_lines(fh, file_fmt, directives)
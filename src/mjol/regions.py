@@ -0,0 +1,165 @@
+"""
+region-restricted reading of bgzip-compressed, coordinate-sorted gff/gtf files
+through a companion index (file_name + INDEX_EXT) built by index_gff.
+the index is linear (tabix-style): per chromosome, one [virtual offset, line number] per 2^SHIFT bp window,
+pointing at the first line whose feature overlaps that window
+"""
+from mjol.bgzf import BgzfReader, is_bgzf
+import json
+import os
+import re
+
+INDEX_EXT = '.mji'
+INDEX_VERSION = 2
+SHIFT = 14 # 16 kb windows
+
+def index_path(file_name : str) -> str:
+    return file_name + INDEX_EXT
+
+def index_gff(file_name : str) -> str:
+    """
+    builds the region index of a bgzip-compressed gff/gtf; lines must be grouped
+    by chromosome and sorted by start within each (e.g. written by GAn.to_gff('out.gff3.gz', sort=True))
+    """
+    if not is_bgzf(file_name):
+        raise ValueError(f'{file_name} is not bgzip-compressed (see mjol.bgzf.bgzip)')
+    chrs = {}
+    windows = None
+    prev_chr, prev_start = None, 0
+    with BgzfReader(file_name) as reader:
+        ln = 0
+        while True:
+            ln += 1
+            voffset = reader.tell()
+            line = reader.readline()
+            if not line:
+                break
+            if line[:1] == b'#' or not line.strip():
+                if line.upper().startswith(b'##FASTA'):
+                    break
+                continue
+            cols = line.split(b'\t', 5)
+            if len(cols) < 6:
+                raise ValueError(f'line {ln}: expected 9 tab-separated columns')
+            chr, start, end = cols[0].decode(), int(cols[3]), int(cols[4])
+            if chr != prev_chr:
+                if chr in chrs:
+                    raise ValueError(f'line {ln}: {chr} is not contiguous (file must be sorted by chromosome)')
+                windows = chrs[chr] = []
+                prev_chr = chr
+            elif start < prev_start:
+                raise ValueError(f'line {ln}: not sorted by start ({start} after {prev_start})')
+            prev_start = start
+            hi = end >> SHIFT
+            if hi >= len(windows):
+                windows.extend([-1] * (hi + 1 - len(windows)))
+            for w in range(start >> SHIFT, hi + 1):
+                if windows[w] == -1:
+                    windows[w] = [voffset, ln]
+    st = os.stat(file_name)
+    out = index_path(file_name)
+    with open(out, 'w') as fh:
+        json.dump({
+            'version' : INDEX_VERSION,
+            'shift' : SHIFT,
+            'size' : st.st_size,
+            'mtime' : st.st_mtime,
+            'chrs' : chrs
+        }, fh)
+    return out
+
+def load_index(file_name : str) -> dict:
+    """
+    chr -> window [offset, line number]s, from the index of file_name
+    """
+    path = index_path(file_name)
+    if not os.path.exists(path):
+        raise RuntimeError(f'{path} not found (build it with mjol.regions.index_gff)')
+    with open(path) as fh:
+        index = json.load(fh)
+    if index.get('version') != INDEX_VERSION or index.get('shift') != SHIFT:
+        raise RuntimeError(f'{path} was written by an incompatible version of mjol; rebuild it')
+    st = os.stat(file_name)
+    if index['size'] != st.st_size or index['mtime'] != st.st_mtime:
+        print(f'WARNING: {path} is older than {file_name}; rebuild it with mjol.regions.index_gff')
+    return index['chrs']
+
+def parse_region(region) -> tuple[str, int, int]:
+    """
+    'chr', 'chr:start-end' (1-based, closed; commas allowed) or (chr, start, end)
+    """
+    if not isinstance(region, str):
+        chr, start, end = region
+        return chr, int(start), int(end)
+    m = re.fullmatch(r'(.+):([\d,]+)-([\d,]+)', region)
+    if m is None:
+        return region, 1, (1 << 62)
+    start, end = int(m.group(2).replace(',', '')), int(m.group(3).replace(',', ''))
+    if start > end:
+        raise ValueError(f'invalid region {region}: start > end')
+    return m.group(1), start, end
+
+def merge_regions(regions) -> dict:
+    """
+    chr -> sorted, non-overlapping [start, end] intervals (chromosomes in request order)
+    """
+    by_chr = {}
+    for region in regions:
+        chr, start, end = parse_region(region)
+        by_chr.setdefault(chr, []).append((start, end))
+    merged = {}
+    for chr, ivs in by_chr.items():
+        ivs.sort()
+        out = [list(ivs[0])]
+        for start, end in ivs[1:]:
+            if start <= out[-1][1] + 1:
+                out[-1][1] = max(out[-1][1], end)
+            else:
+                out.append([start, end])
+        merged[chr] = out
+    return merged
+
+def region_lines(file_name : str, regions, numbered : bool = False):
+    """
+    header directives, then every line whose feature overlaps one of regions (each line at most once);
+    only the blocks covering those regions are decompressed.
+    numbered: yields (ln, line) pairs, ln being the (1-based) line number in file_name
+    """
+    index = load_index(file_name)
+    with BgzfReader(file_name) as reader:
+        ln = 0
+        while True:
+            ln += 1
+            line = reader.readline()
+            if line[:1] != b'#':
+                break
+            yield (ln, line.decode()) if numbered else line.decode()
+        seen = set()
+        for chr, ivs in merge_regions(regions).items():
+            windows = index.get(chr)
+            if windows is None:
+                print(f'WARNING: {chr} not found in {file_name}')
+                continue
+            for start, end in ivs:
+                w = start >> SHIFT
+                while w < len(windows) and windows[w] == -1:
+                    w += 1
+                if w == len(windows):
+                    continue
+                voffset, ln = windows[w]
+                reader.seek(voffset)
+                ln -= 1
+                while True:
+                    ln += 1
+                    voffset = reader.tell()
+                    line = reader.readline()
+                    if not line or line.upper().startswith(b'##FASTA'):
+                        break
+                    if line[:1] == b'#' or not line.strip():
+                        continue
+                    cols = line.split(b'\t', 5)
+                    if cols[0].decode() != chr or int(cols[3]) > end:
+                        break
+                    if int(cols[4]) >= start and voffset not in seen:
+                        seen.add(voffset)
+                        yield (ln, line.decode()) if numbered else line.decode()
@@ -0,0 +1,431 @@
+"""
+out-of-core feature storage (storage='sqlite'): features, attributes and parent links live in a
+local SQLite database; GFeature views are materialised on access (children are read from the rows when
+first touched) and the most recent ones are kept in a bounded LRU cache. there is one view per row while it
+is referenced anywhere (cache, parents, callers); a view is authoritative for its row and written back when
+it leaves the cache or on sync(); lookup (aid -> uids) is answered from the aid column
+"""
+from mjol.base import *
+from mjol.utils import Attributes, OrderedSet, attributes_str
+from mjol.index import CollisionIndex
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import sqlite3
+import json
+import os
+import weakref
+
+DB_EXT = '.db'
+SCHEMA_VERSION = 1
+BATCH = 1 << 15 # rows per executemany
+CACHE_SIZE = 1 << 16 # materialised features kept in memory
+
+FIELDS = [
+    'chr', 'src', 'feature_type', 'start', '"end"', 'score', 'strand', 'frame',
+    'attributes', 'kv_sep', 'uid', 'aid', 'paid', 'puid'
+]
+SELECT = f'SELECT row, {", ".join(FIELDS)} FROM features'
+INSERT = f'INSERT INTO features ({", ".join(FIELDS)}) VALUES ({", ".join("?" * len(FIELDS))})'
+UPDATE = f'UPDATE features SET {", ".join(f"{k} = ?" for k in FIELDS)} WHERE row = ?'
+
+SCHEMA = """
+CREATE TABLE features (
+    row INTEGER PRIMARY KEY,
+    chr TEXT, src TEXT, feature_type TEXT, start INTEGER, "end" INTEGER, score REAL,
+    strand TEXT, frame TEXT, attributes TEXT, kv_sep TEXT,
+    uid TEXT NOT NULL UNIQUE, aid TEXT, paid TEXT, puid TEXT
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+# built after the bulk load of build_db
+INDEXES = """
+CREATE INDEX IF NOT EXISTS features_aid ON features (aid);
+CREATE INDEX IF NOT EXISTS features_puid ON features (puid);
+CREATE INDEX IF NOT EXISTS features_coord ON features (chr, start, "end");
+CREATE INDEX IF NOT EXISTS features_type ON features (feature_type);
+"""
+
+def db_path(file_name : str) -> str:
+    return file_name + DB_EXT
+
+def _attributes_value(attributes) -> tuple[str, str]:
+    # (attribute string, kv_sep): unparsed gtf attributes are stored as read
+    if isinstance(attributes, Attributes) and not attributes.parsed:
+        return attributes.raw, attributes.kv_sep
+    return attributes_str(attributes), '='
+
+class _LazyChildren(Children):
+    """
+    children of a view, read from the database (load) on first use
+    """
+    __slots__ = ('_load',)
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getattr__(self, name):
+        # _d is only unset until the first access
+        if name != '_d':
+            raise AttributeError(name)
+        self._d = {}
+        self.extend(self._load())
+        self._load = None
+        return self._d
+
+class SqliteStore(MutableMapping):
+    """
+    uid -> GFeature mapping backed by a SQLite table (one row per feature, rows in features order);
+    uids are stored in their string form (see uid_to_str)
+    """
+    def __init__(self, file_path : str, iak : str, pak : str, uid_mode : str = 'sha256', cache_size : int = CACHE_SIZE, create : bool = False):
+        if create and os.path.exists(file_path):
+            os.remove(file_path)
+        exists = os.path.exists(file_path)
+        self.file_path = file_path
+        self.con = sqlite3.connect(file_path)
+        self.con.execute('PRAGMA journal_mode = WAL')
+        self.con.execute('PRAGMA synchronous = NORMAL')
+        if not exists:
+            self.con.executescript(SCHEMA)
+            self.set_meta({'version' : SCHEMA_VERSION})
+        elif self.meta().get('version') != SCHEMA_VERSION:
+            raise RuntimeError(f'{file_path} was written by an incompatible version of mjol; rebuild it')
+        self.iak = iak
+        self.pak = pak
+        self.uid_mode = uid_mode
+        self.cache_size = max(cache_size, 1)
+        self._cache = OrderedDict() # uid -> view, most recently used last
+        self._live = weakref.WeakValueDictionary() # uid -> view, while referenced anywhere
+        self._state = {} # id(view) -> [row, stored values] of live views
+        self._span = None # chr -> longest feature (end - start), bounds overlap queries
+
+    # settings
+
+    def set_meta(self, settings : dict):
+        self.con.executemany(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            [(k, json.dumps(v)) for k, v in settings.items()]
+        )
+        self.con.commit()
+
+    def meta(self) -> dict:
+        return {k : json.loads(v) for k, v in self.con.execute('SELECT key, value FROM meta')}
+
+    # bulk load
+
+    def _key(self, uid):
+        return None if uid is None else uid_to_str(uid, self.uid_mode)
+
+    def _uid(self, key):
+        return None if key is None else str_to_uid(key, self.uid_mode)
+
+    def insert_records(self, records):
+        """
+        appends (chr, src, feature_type, start, end, score, strand, frame, attributes, uid, aid, paid)
+        records in batches; raises RuntimeError on a repeated uid
+        """
+        batch = []
+        try:
+            for rec in records:
+                attributes, kv_sep = _attributes_value(rec[8])
+                batch.append(rec[:8] + (attributes, kv_sep, self._key(rec[9]), rec[10], rec[11], None))
+                if len(batch) >= BATCH:
+                    self.con.executemany(INSERT, batch)
+                    batch.clear()
+            self.con.executemany(INSERT, batch)
+        except sqlite3.IntegrityError as e:
+            self.con.rollback()
+            raise RuntimeError(f'non-unique uid detected ({e})')
+        self.con.executescript(INDEXES)
+        self._span = None
+
+    def link(self):
+        """
+        sets puid from paid: in SQL for attribute IDs held by one feature, through
+        CollisionIndex (closest candidate, as GAn.get_uid) for shared ones
+        """
+        con = self.con
+        con.execute('CREATE TEMP TABLE shared AS SELECT aid FROM features WHERE aid IS NOT NULL GROUP BY aid HAVING count(*) > 1')
+        con.execute("""
+            UPDATE features SET puid = (SELECT p.uid FROM features p WHERE p.aid = features.paid)
+            WHERE paid IS NOT NULL AND paid NOT IN (SELECT aid FROM shared)
+        """)
+        collisions = CollisionIndex()
+        cur = con.execute('SELECT row, paid, chr, strand, start, "end" FROM features WHERE paid IN (SELECT aid FROM shared)')
+        updates = []
+        for row, paid, chr, strand, start, end in cur.fetchall():
+            puid = collisions.closest(paid, self.uids_by_aid(paid), self.coords, chr, strand, start, end)
+            updates.append((self._key(puid), row))
+        con.executemany('UPDATE features SET puid = ? WHERE row = ?', updates)
+        con.execute('DROP TABLE shared')
+        con.commit()
+
+    # views
+
+    def _values(self, f : GFeature, uid) -> tuple:
+        attributes, kv_sep = _attributes_value(f.attributes)
+        return (
+            f.chr, f.src, f.feature_type, f.start, f.end, f.score, f.strand, f.frame,
+            attributes, kv_sep, self._key(uid), f.aid, f.paid, self._key(f.puid)
+        )
+
+    def _write_back(self, f : GFeature):
+        state = self._state[id(f)]
+        values = self._values(f, f.uid)
+        if values != state[1]:
+            self.con.execute(UPDATE, values + (state[0],))
+            state[1] = values
+            self._span = None
+
+    def _register(self, uid, f : GFeature, row : int, stored : tuple):
+        if id(f) not in self._state:
+            weakref.finalize(f, self._state.pop, id(f), None)
+        self._state[id(f)] = [row, stored]
+        self._live[uid] = f
+        self._touch(uid, f)
+
+    def _touch(self, uid, f : GFeature):
+        self._cache[uid] = f
+        self._cache.move_to_end(uid)
+        while len(self._cache) > self.cache_size:
+            # no longer kept alive by the store (it stays the view of its row while referenced elsewhere)
+            _, old = self._cache.popitem(last=False)
+            self._write_back(old)
+
+    def _live_view(self, uid):
+        f = self._live.get(uid)
+        if f is not None:
+            self._touch(uid, f)
+        return f
+
+    def _children(self, key):
+        return [self._view(c) for c in self.con.execute(SELECT + ' WHERE puid = ? ORDER BY row', (key,)).fetchall()]
+
+    def _view(self, rec : tuple) -> GFeature:
+        row, chr, src, feature_type, start, end, score, strand, frame, attributes, kv_sep, key, aid, paid, puid = rec
+        uid = self._uid(key)
+        f = self._live_view(uid)
+        if f is not None:
+            return f
+        f = bare_model(GFeature, {
+            'chr' : chr, 'src' : src, 'feature_type' : feature_type, 'start' : start, 'end' : end,
+            'score' : score, 'strand' : strand, 'frame' : frame,
+            'attributes' : Attributes(attributes, kv_sep=kv_sep),
+            'children' : _LazyChildren(lambda : self._children(key)),
+            'iak' : self.iak, 'pak' : self.pak, 'uid_mode' : self.uid_mode,
+            'gid' : bare_model(GId, {'uid' : uid, 'aid' : aid, 'paid' : paid, 'puid' : self._uid(puid)})
+        })
+        self._register(uid, f, row, rec[1:])
+        return f
+
+    def sync(self):
+        """
+        writes changed live views back and commits
+        """
+        for f in list(self._live.values()):
+            self._write_back(f)
+        self.con.commit()
+
+    def write_back(self, fs : list):
+        """
+        writes the given features back, e.g. after their parent links changed
+        """
+        for f in fs:
+            if id(f) in self._state and self._live.get(f.uid) is f:
+                self._write_back(f)
+            elif f.uid in self:
+                values = self._values(f, f.uid)
+                self.con.execute(UPDATE.replace('row = ?', 'uid = ?'), values + (values[10],))
+
+    def close(self):
+        self.sync()
+        self.con.close()
+
+    # queries
+
+    def uids_by_aid(self, aid) -> list:
+        return [self._uid(k) for k, in self.con.execute('SELECT uid FROM features WHERE aid = ? ORDER BY row', (aid,))]
+
+    def uids_by_ftype(self, ftype : str) -> list:
+        return [self._uid(k) for k, in self.con.execute('SELECT uid FROM features WHERE feature_type = ? ORDER BY row', (ftype,))]
+
+    def count_ftype(self, ftype : str) -> int:
+        return self.con.execute('SELECT count(*) FROM features WHERE feature_type = ?', (ftype,)).fetchone()[0]
+
+    def ftypes(self) -> list[str]:
+        return [t for t, in self.con.execute('SELECT DISTINCT feature_type FROM features')]
+
+    def coords(self, uid) -> tuple:
+        """
+        (chr, strand, start, end) of uid (from its view, if live)
+        """
+        f = self._live.get(uid)
+        if f is not None:
+            return f.chr, f.strand, f.start, f.end
+        rec = self.con.execute('SELECT chr, strand, start, "end" FROM features WHERE uid = ?', (self._key(uid),)).fetchone()
+        if rec is None:
+            raise KeyError(uid)
+        return rec
+
+    def overlap(self, chr : str, start : int, end : int, strand : str = None) -> list[tuple]:
+        """
+        (start, end, uid, feature_type) of features on chr (and strand) overlapping [start, end]
+        (store coordinates), through the (chr, start, end) index
+        """
+        self.sync()
+        if self._span is None:
+            self._span = dict(self.con.execute('SELECT chr, max("end" - start) FROM features GROUP BY chr'))
+        span = self._span.get(chr)
+        if span is None:
+            return []
+        sql = 'SELECT start, "end", uid, feature_type FROM features WHERE chr = ? AND start BETWEEN ? AND ? AND "end" >= ?'
+        params = [chr, start - span, end, start]
+        if strand is not None:
+            sql += ' AND strand = ?'
+            params.append(strand)
+        return [(s, e, self._uid(k), t) for s, e, k, t in self.con.execute(sql, params)]
+
+    def chrs(self) -> list[str]:
+        """
+        chromosomes in order of first appearance
+        """
+        return [c for c, _ in self.con.execute('SELECT chr, min(row) AS first FROM features GROUP BY chr ORDER BY first')]
+
+    def reach(self) -> dict:
+        """
+        chr -> furthest end
+        """
+        return dict(self.con.execute('SELECT chr, max("end") FROM features GROUP BY chr'))
+
+    def _depths(self) -> None:
+        """
+        temp table depth (key, depth): number of ancestors of every feature
+        """
+        con = self.con
+        con.execute('DROP TABLE IF EXISTS temp.depth')
+        # features in a cycle are never reached from a root
+        con.execute("""
+            CREATE TEMP TABLE depth AS WITH RECURSIVE d(key, depth) AS (
+                SELECT uid, 0 FROM features WHERE puid IS NULL OR puid NOT IN (SELECT uid FROM features)
+                UNION ALL SELECT f.uid, d.depth + 1 FROM features f JOIN d ON f.puid = d.key
+            ) SELECT key, depth FROM d
+        """)
+        if con.execute('SELECT count(*) FROM temp.depth').fetchone()[0] < len(self):
+            raise RuntimeError('cycle in parent-child relationships')
+        con.execute('CREATE INDEX temp.depth_key ON depth (key)')
+
+    def records(self, chrs : list = None):
+        """
+        (chr, src, feature_type, start, end, score, strand, frame, attributes) in features order,
+        or sorted by (start, depth, features order) within each of chrs, chromosome by chromosome
+        """
+        self.sync()
+        fields = 'chr, src, feature_type, start, "end", score, strand, frame, attributes, kv_sep'
+        if chrs is None:
+            cursors = [self.con.execute(f'SELECT {fields} FROM features ORDER BY row')]
+        else:
+            self._depths()
+            sql = f'SELECT {fields} FROM features JOIN temp.depth ON key = uid WHERE chr = ? ORDER BY start, depth, row'
+            cursors = (self.con.execute(sql, (chr,)) for chr in chrs)
+        for cur in cursors:
+            while True:
+                batch = cur.fetchmany(BATCH)
+                if not batch:
+                    break
+                for rec in batch:
+                    yield rec[:8] + (Attributes(rec[8], kv_sep=rec[9]),)
+
+    def columns(self) -> dict:
+        """
+        (uid, puid, chr, strand, feature_type, start, end) lists in features order
+        """
+        self.sync()
+        cols = {k : [] for k in ['uid', 'puid', 'chr', 'strand', 'feature_type', 'start', 'end']}
+        cur = self.con.execute('SELECT uid, puid, chr, strand, feature_type, start, "end" FROM features ORDER BY row')
+        for rec in cur:
+            cols['uid'].append(self._uid(rec[0]))
+            cols['puid'].append(self._uid(rec[1]))
+            for k, v in zip(['chr', 'strand', 'feature_type', 'start', 'end'], rec[2:]):
+                cols[k].append(v)
+        return cols
+
+    # MutableMapping interface (uid -> GFeature)
+
+    def __getitem__(self, uid) -> GFeature:
+        f = self._live_view(uid)
+        if f is not None:
+            return f
+        rec = self.con.execute(SELECT + ' WHERE uid = ?', (self._key(uid),)).fetchone()
+        if rec is None:
+            raise KeyError(uid)
+        return self._view(rec)
+
+    def __setitem__(self, uid, f : GFeature):
+        values = self._values(f, uid)
+        rec = self.con.execute('SELECT row FROM features WHERE uid = ?', (values[10],)).fetchone()
+        if rec is not None:
+            # dict semantics: overwriting keeps the original position
+            row = rec[0]
+            self.con.execute(UPDATE, values + (row,))
+        else:
+            row = self.con.execute(INSERT, values).lastrowid
+        self._cache.pop(uid, None)
+        self._register(uid, f, row, values)
+        self._span = None
+
+    def __delitem__(self, uid):
+        cur = self.con.execute('DELETE FROM features WHERE uid = ?', (self._key(uid),))
+        if not cur.rowcount:
+            raise KeyError(uid)
+        self._cache.pop(uid, None)
+        f = self._live.pop(uid, None)
+        if f is not None:
+            self._state.pop(id(f), None)
+
+    def __contains__(self, uid) -> bool:
+        if uid in self._live:
+            return True
+        return self.con.execute('SELECT 1 FROM features WHERE uid = ?', (self._key(uid),)).fetchone() is not None
+
+    def __iter__(self):
+        # keyset pagination: safe while features are added / removed
+        last = 0
+        while True:
+            batch = self.con.execute('SELECT row, uid FROM features WHERE row > ? ORDER BY row LIMIT ?', (last, BATCH)).fetchall()
+            if not batch:
+                return
+            for _, key in batch:
+                yield self._uid(key)
+            last = batch[-1][0]
+
+    def __len__(self) -> int:
+        return self.con.execute('SELECT count(*) FROM features').fetchone()[0]
+
+class SqliteLookup(MutableMapping):
+    """
+    aid -> uids (OrderedSet, features order) read from the aid column of a SqliteStore;
+    assignments and deletions are no-ops since inserting / deleting features keeps the column current
+    """
+    def __init__(self, store : SqliteStore):
+        self.store = store
+
+    def __getitem__(self, aid) -> OrderedSet:
+        uids = self.store.uids_by_aid(aid)
+        if not uids:
+            raise KeyError(aid)
+        return OrderedSet(uids)
+
+    def __setitem__(self, aid, uids):
+        pass
+
+    def __delitem__(self, aid):
+        pass
+
+    def __contains__(self, aid) -> bool:
+        return self.store.con.execute('SELECT 1 FROM features WHERE aid = ?', (aid,)).fetchone() is not None
+
+    def __iter__(self):
+        return (aid for aid, in self.store.con.execute('SELECT aid FROM features WHERE aid IS NOT NULL GROUP BY aid ORDER BY min(row)').fetchall())
+
+    def __len__(self) -> int:
+        return self.store.con.execute('SELECT count(DISTINCT aid) FROM features').fetchone()[0]
@@ -0,0 +1,76 @@
+"""
+annotation summary statistics (GAn.stats), computed with NumPy over the coordinate columns
+"""
+import numpy as np
+
+QUANTILES = {'min' : 0.0, 'q25' : 0.25, 'median' : 0.5, 'q75' : 0.75, 'max' : 1.0}
+
+def group_positions(values : np.ndarray) -> list[tuple]:
+    """
+    (value, positions) per distinct value, positions in features order
+    """
+    keys, codes = np.unique(values.astype(str), return_inverse=True)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+    return [(k, order[bounds[i]:bounds[i + 1]]) for i, k in enumerate(keys.tolist())]
+
+def _distribution(x : np.ndarray) -> dict:
+    res = {k : float(v) for k, v in zip(QUANTILES, np.quantile(x, list(QUANTILES.values())))}
+    res['mean'] = float(x.mean())
+    return res
+
+def _chr_lengths(directives : list) -> dict:
+    lengths = {}
+    for d in directives:
+        key = d.split()
+        if key[0] == '##sequence-region' and len(key) == 4:
+            lengths[key[1]] = int(key[3])
+    return lengths
+
+def summarize(gan) -> dict:
+    """
+    features : number of features
+    ftypes : per feature type, count, total length and length distribution (min, quartiles, max, mean)
+    children : per parent type and child type, number of parents with such children and
+               the distribution of children per parent (e.g. children['transcript']['exon'])
+    chrs : per chromosome, length (##sequence-region, else furthest end), feature count
+           and features per Mb, overall and per feature type
+    """
+    cols = gan._columns()
+    n = len(cols['uid'])
+    res = {'features' : n, 'ftypes' : {}, 'children' : {}, 'chrs' : {}}
+    if not n:
+        return res
+    # closed 1-based or half-open 0-based
+    lengths = cols['end'] - cols['start'] + (0 if gan.is_0b else 1)
+    types = cols['feature_type'].astype(str)
+    for t, pos in group_positions(types):
+        res['ftypes'][t] = {
+            'count' : len(pos),
+            'total_length' : int(lengths[pos].sum()),
+            'length' : _distribution(lengths[pos])
+        }
+
+    # children per parent: (parent position, child type) pairs
+    rows = {uid : i for i, uid in enumerate(cols['uid'].tolist())}
+    parent = np.array([rows.get(puid, -1) for puid in cols['puid'].tolist()], dtype=np.int64)
+    has = np.flatnonzero(parent >= 0)
+    if len(has):
+        for ct, pos in group_positions(types[has]):
+            kids = parent[has[pos]]
+            parents, counts = np.unique(kids, return_counts=True)
+            for pt, ppos in group_positions(types[parents]):
+                res['children'].setdefault(pt, {})[ct] = {'parents' : len(ppos), **_distribution(counts[ppos])}
+
+    known = _chr_lengths(gan.directives)
+    for chr, pos in group_positions(cols['chr']):
+        size = known.get(chr, int(cols['end'][pos].max()))
+        mb = max(size, 1) / 1e6
+        per_type = {t : len(tpos) for t, tpos in group_positions(types[pos])}
+        res['chrs'][chr] = {
+            'length' : size,
+            'features' : len(pos),
+            'density' : len(pos) / mb,
+            'ftypes' : {t : {'count' : c, 'density' : c / mb} for t, c in per_type.items()}
+        }
+    return res
@@ -0,0 +1,258 @@
+from mjol.base import *
+from mjol.index import CollisionIndex
+from collections.abc import MutableMapping
+import numpy as np
+
+CATEGORICAL = ['chr', 'src', 'feature_type', 'strand', 'frame']
+
+COLUMNS = {
+    'chr' : np.int32,
+    'src' : np.int32,
+    'feature_type' : np.int32,
+    'strand' : np.int32,
+    'frame' : np.int32,
+    'start' : np.int64,
+    'end' : np.int64,
+    'score' : np.float64, # nan -> None
+    'parent' : np.int64, # parent row, -1 -> none
+    'alive' : np.bool_
+}
+
+class Pool:
+    """
+    interns categorical strings (chr, src, ...) as integer codes
+    """
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value : str) -> int:
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+class FeatureStore(MutableMapping):
+    """
+    uid -> GFeature mapping backed by column arrays (one row per feature).
+    GFeature objects are lightweight views materialised (with their subtree) on first access;
+    once materialised, the view is authoritative for its row (see sync)
+    """
+    def __init__(self, iak : str, pak : str, uid_mode : str = 'sha256', capacity : int = 1024):
+        self.iak = iak
+        self.pak = pak
+        self.uid_mode = uid_mode
+        self.pools = {k : Pool() for k in CATEGORICAL}
+        self.cols = {k : np.zeros(capacity, dtype=t) for k, t in COLUMNS.items()}
+        self.n = 0
+        self.uids = [] # row -> uid (None once deleted)
+        self.aids = []
+        self.paids = []
+        self.attrs = []
+        self.rows = {} # uid -> row
+        self._views = {} # row -> GFeature
+        self._kids = None # (offsets, rows) built from the parent column
+        self._chr_dir = None # (n, offsets, rows) per-chromosome directory over the first n rows
+
+    def append(
+        self, chr, src, feature_type, start, end, score, strand, frame,
+        attributes, uid, aid = None, paid = None, parent : int = -1
+    ) -> int:
+        if self.n == len(self.cols['start']):
+            for k, col in self.cols.items():
+                self.cols[k] = np.resize(col, max(1024, 2 * len(col)))
+        r = self.n
+        cols = self.cols
+        cols['chr'][r] = self.pools['chr'].code(chr)
+        cols['src'][r] = self.pools['src'].code(src)
+        cols['feature_type'][r] = self.pools['feature_type'].code(feature_type)
+        cols['strand'][r] = self.pools['strand'].code(strand)
+        cols['frame'][r] = self.pools['frame'].code(frame)
+        cols['start'][r] = start
+        cols['end'][r] = end
+        cols['score'][r] = np.nan if score is None else score
+        cols['parent'][r] = parent
+        cols['alive'][r] = True
+        self.uids.append(uid)
+        self.aids.append(aid)
+        self.paids.append(paid)
+        self.attrs.append(attributes)
+        self.rows[uid] = r
+        self.n += 1
+        self._kids = None
+        return r
+
+    def column(self, name : str) -> np.ndarray:
+        """
+        view over the first n rows of a column (dead rows included; mask with column('alive'))
+        """
+        return self.cols[name][:self.n]
+
+    def decode(self, name : str, r : int) -> str:
+        return self.pools[name].values[self.cols[name][r]]
+
+    def children_rows(self, r : int) -> np.ndarray:
+        if self._kids is None:
+            parent = self.column('parent')
+            kids = np.nonzero((parent >= 0) & self.column('alive'))[0]
+            kids = kids[np.argsort(parent[kids], kind='stable')]
+            offsets = np.searchsorted(parent[kids], np.arange(self.n + 1))
+            self._kids = (offsets, kids)
+        offsets, kids = self._kids
+        return kids[offsets[r]:offsets[r + 1]]
+
+    def chr_rows(self, chr : str) -> np.ndarray:
+        """
+        live rows on chr, in row order
+        """
+        code = self.pools['chr'].codes.get(chr)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        if self._chr_dir is None:
+            rows = np.nonzero(self.column('chr') == code)[0]
+        else:
+            n0, offsets, dir_rows = self._chr_dir
+            head = dir_rows[offsets[code]:offsets[code + 1]] if code + 1 < len(offsets) else dir_rows[:0]
+            tail = n0 + np.nonzero(self.cols['chr'][n0:self.n] == code)[0]
+            rows = np.concatenate([head, tail])
+        return rows[self.cols['alive'][rows]]
+
+    def coords(self, uid) -> tuple:
+        """
+        (chr, strand, start, end) of uid (from its view, if materialised)
+        """
+        r = self.rows[uid]
+        f = self._views.get(r)
+        if f is not None:
+            return f.chr, f.strand, f.start, f.end
+        return self.decode('chr', r), self.decode('strand', r), int(self.cols['start'][r]), int(self.cols['end'][r])
+
+    def link(self, lookup : dict):
+        """
+        sets the parent column from paids (same collision rule as GAn.get_uid)
+        """
+        parent = self.cols['parent']
+        collisions = CollisionIndex()
+        for r in range(self.n):
+            paid = self.paids[r]
+            if paid not in lookup:
+                continue
+            uids = lookup[paid]
+            if len(uids) == 1:
+                puid = uids[0]
+            else:
+                puid = collisions.closest(paid, uids, self.coords, *self.coords(self.uids[r]))
+            parent[r] = self.rows[puid]
+        self._kids = None
+
+    def sync(self):
+        """
+        writes materialised views back into the columns
+        """
+        for r, f in self._views.items():
+            self._sync_row(r, f)
+        self._kids = None
+
+    def _sync_row(self, r : int, f : GFeature):
+        cols = self.cols
+        chr = self.pools['chr'].code(f.chr)
+        if chr != cols['chr'][r]:
+            self._chr_dir = None
+        cols['chr'][r] = chr
+        cols['src'][r] = self.pools['src'].code(f.src)
+        cols['feature_type'][r] = self.pools['feature_type'].code(f.feature_type)
+        cols['strand'][r] = self.pools['strand'].code(f.strand)
+        cols['frame'][r] = self.pools['frame'].code(f.frame)
+        cols['start'][r] = f.start
+        cols['end'][r] = f.end
+        cols['score'][r] = np.nan if f.score is None else f.score
+        cols['parent'][r] = self.rows.get(f.puid, -1)
+        self.aids[r] = f.aid
+        self.paids[r] = f.paid
+        self.attrs[r] = f.attributes
+
+    def _view(self, r : int) -> GFeature:
+        if r in self._views:
+            return self._views[r]
+        cols = self.cols
+        score = cols['score'][r]
+        parent = cols['parent'][r]
+        f = bare_model(GFeature, {
+            'chr' : self.decode('chr', r),
+            'src' : self.decode('src', r),
+            'feature_type' : self.decode('feature_type', r),
+            'start' : int(cols['start'][r]),
+            'end' : int(cols['end'][r]),
+            'score' : None if np.isnan(score) else float(score),
+            'strand' : self.decode('strand', r),
+            'frame' : self.decode('frame', r),
+            'attributes' : self.attrs[r],
+            'children' : Children(),
+            'iak' : self.iak,
+            'pak' : self.pak,
+            'uid_mode' : self.uid_mode,
+            'gid' : bare_model(GId, {
+                'uid' : self.uids[r],
+                'aid' : self.aids[r],
+                'paid' : self.paids[r],
+                'puid' : self.uids[parent] if parent >= 0 else None
+            })
+        })
+        self._views[r] = f
+        f.children.extend(self._view(c) for c in self.children_rows(r))
+        return f
+
+    def entry(self, r : int, start_offset : int = 0) -> str:
+        """
+        gff line of row r without materialising it
+        """
+        if r in self._views:
+            return self._views[r].to_gff_entry(start_offset=start_offset)
+        cols = self.cols
+        score = cols['score'][r]
+        return format_entry(
+            self.decode('chr', r), self.decode('src', r), self.decode('feature_type', r),
+            int(cols['start'][r]) + start_offset, int(cols['end'][r]),
+            None if np.isnan(score) else float(score),
+            self.decode('strand', r), self.decode('frame', r), self.attrs[r]
+        )
+
+    def live_rows(self):
+        return (int(r) for r in np.flatnonzero(self.column('alive')))
+
+    # MutableMapping interface (uid -> GFeature)
+
+    def __getitem__(self, uid) -> GFeature:
+        return self._view(self.rows[uid])
+
+    def __setitem__(self, uid, f : GFeature):
+        if uid in self.rows:
+            # dict semantics: overwriting keeps the original position
+            r = self.rows[uid]
+            self._views[r] = f
+            self._sync_row(r, f)
+            self._kids = None
+            return
+        r = self.append(
+            f.chr, f.src, f.feature_type, f.start, f.end, f.score, f.strand, f.frame,
+            f.attributes, uid, f.aid, f.paid, self.rows.get(f.puid, -1)
+        )
+        self._views[r] = f
+
+    def __delitem__(self, uid):
+        r = self.rows.pop(uid)
+        self.uids[r] = None
+        self.attrs[r] = None
+        self.cols['alive'][r] = False
+        self._views.pop(r, None)
+        self._kids = None
+
+    def __contains__(self, uid) -> bool:
+        return uid in self.rows
+
+    def __iter__(self):
+        return (self.uids[r] for r in self.live_rows())
+
+    def __len__(self) -> int:
+        return len(self.rows)
@@ -0,0 +1,163 @@
+"""
+filtered streaming over gff / gtf files (stream_features) without building a GAn: rows are rejected
+on the raw columns before their attributes are parsed or any GFeature is built, so memory stays
+constant (apart from the subtrees being reassembled, with subtrees=True)
+"""
+from mjol.base import infer_attribute
+from mjol.utils import Attributes, check_attributes
+from mjol.parser import ParseError
+from mjol.gan import GAn
+from mjol.bgzf import is_bgzf
+from mjol.regions import index_path, parse_region, region_lines
+from mjol.compression import open_text
+import os
+
+def _values(v) -> set:
+    # None: no filter; a string or a collection of accepted values
+    if v is None:
+        return None
+    return {v} if isinstance(v, str) else set(v)
+
+def _attr_tests(attr_filter : dict) -> tuple[list, list]:
+    """
+    (needles, tests): for each key with accepted values, the values one of which must occur in the raw
+    attribute column; for each key, the test of its value (gtf quotes stripped; None when absent)
+    """
+    needles, tests = [], []
+    for key, want in (attr_filter or {}).items():
+        if callable(want):
+            tests.append((key, lambda v, fn=want : v is not None and fn(v.strip('"'))))
+            continue
+        want = _values(want)
+        needles.append(tuple(want))
+        tests.append((key, lambda v, w=want : v is not None and v.strip('"') in w))
+    return needles, tests
+
+def _lines(file_name : str, region, n_threads : int):
+    # (ln, line) pairs; with a region, an indexed bgzip file is read through its index (see mjol.regions)
+    if region is not None and is_bgzf(file_name) and os.path.exists(index_path(file_name)):
+        yield from region_lines(file_name, [region], numbered=True)
+        return
+    with open_text(file_name, n_threads) as fh:
+        yield from enumerate(fh, 1)
+
+def _coords(cols : list, ln : int) -> tuple[int, int]:
+    try:
+        return int(cols[3]), int(cols[4])
+    except ValueError as e:
+        raise ParseError(ln, str(e))
+
+def _attributes(cols : list, kv_sep : str, ln : int) -> Attributes:
+    try:
+        check_attributes(cols[8], kv_sep)
+    except ValueError as e:
+        raise ParseError(ln, str(e))
+    return Attributes(cols[8], kv_sep=kv_sep)
+
+def _feature(gan : GAn, cols : list, attributes : Attributes, ln : int):
+    # same record / uid as build_db would produce
+    start, end = _coords(cols, ln)
+    try:
+        score = None if cols[5] == '.' else float(cols[5])
+    except ValueError as e:
+        raise ParseError(ln, str(e))
+    f = gan._gfeature_from_record(gan._record({
+        'chr' : cols[0], 'src' : cols[1], 'feature_type' : cols[2], 'start' : start, 'end' : end,
+        'score' : score, 'strand' : cols[6], 'frame' : cols[7], 'attributes' : attributes
+    }))
+    if gan.uid_mode == 'seq':
+        f.uid = gan._new_seq() # handles in output order
+    return f
+
+def stream_features(
+    file_name : str,
+    file_fmt : str,
+    chr = None,
+    ftype = None,
+    region = None,
+    attr_filter : dict = None,
+    subtrees : bool = False,
+    iak : str = 'id',
+    pak : str = 'parent',
+    coord_system : str = '1b',
+    uid_mode : str = 'sha256',
+    n_threads : int = 1
+):
+    """
+    yields the GFeatures of file_name (plain or compressed) that pass every given filter, in file order:
+    chr / ftype : a value or a collection of accepted values
+    region : 'chr:start-end' (1-based, closed; see mjol.regions.parse_region) the feature must overlap;
+             an indexed bgzip file (mjol.regions.index_gff) is read through its index
+    attr_filter : attribute key (case-insensitive) -> accepted value(s), or a callable on the value;
+                  rows whose raw attribute column contains none of the accepted values are never parsed
+    with subtrees, every match is yielded as a root with its descendants attached (children linked by
+    pak, whether or not they pass the filters; a match inside an open subtree is attached, not repeated).
+    children must come after their parent and before the first line on another chromosome or starting
+    past the end of their tree (as in a coordinate-sorted file); trees are yielded once complete.
+    coordinates and uids are those build_db would give with the same iak / pak / coord_system / uid_mode
+    """
+    gan = GAn(file_name=file_name, file_fmt=file_fmt, iak=iak, pak=pak, uid_mode=uid_mode)
+    gan._setup(coord_system)
+    kv_sep = ' ' if file_fmt.lower() == 'gtf' else '='
+    chrs, ftypes = _values(chr), _values(ftype)
+    lo = hi = None
+    if region is not None:
+        rchr, lo, hi = parse_region(region)
+        chrs = {rchr} if chrs is None else chrs & {rchr}
+    needles, tests = _attr_tests(attr_filter)
+
+    roots, nodes = [], {} # open trees: roots in file order, aid -> feature
+    tree_chr, tree_end = None, 0
+    for ln, line in _lines(file_name, region, n_threads):
+        if line[:1] == '#':
+            if line.startswith('###'):
+                yield from roots
+                roots, nodes = [], {}
+            elif line.upper().startswith('##FASTA'):
+                break
+            continue
+        cols = line.rstrip('\r\n').split('\t')
+        if len(cols) != 9:
+            if not line.strip():
+                continue
+            raise ParseError(ln, f'expected 9 tab-separated columns, found {len(cols)}')
+        if roots and (cols[0] != tree_chr or _coords(cols, ln)[0] > tree_end):
+            yield from roots
+            roots, nodes = [], {}
+        if nodes:
+            attributes = _attributes(cols, kv_sep, ln)
+            parent = nodes.get(infer_attribute(attributes, pak))
+            if parent is not None:
+                f = _feature(gan, cols, attributes, ln)
+                f.set_parent_uid(parent.uid)
+                parent.add_a_child(f)
+                if f.aid:
+                    nodes[f.aid] = f
+                continue
+
+        # raw-column filters
+        if chrs is not None and cols[0] not in chrs:
+            continue
+        if ftypes is not None and cols[2] not in ftypes:
+            continue
+        if lo is not None:
+            start, end = _coords(cols, ln)
+            if end < lo or start > hi:
+                continue
+        if needles and not all(any(v in cols[8] for v in values) for values in needles):
+            continue
+        attributes = _attributes(cols, kv_sep, ln)
+        if tests and not all(test(attributes.get_ci(key)) for key, test in tests):
+            continue
+
+        f = _feature(gan, cols, attributes, ln)
+        if not subtrees:
+            yield f
+            continue
+        end = _coords(cols, ln)[1]
+        tree_end = max(tree_end, end) if roots else end
+        tree_chr = cols[0]
+        roots.append(f)
+        if f.aid:
+            nodes[f.aid] = f
+    yield from roots
@@ -1,7 +1,11 @@
 from mjol.gan import *
-from typing import Tuple
+from mjol.instrument import profiled
+from typing import Dict, List, Tuple
 
 def set_case_insensitive(d, target_key, new_value):
+    if isinstance(d, Attributes):
+        d.set_ci(target_key, new_value)
+        return
     for k in d:
         if k.lower() == target_key.lower():
             d[k] = new_value
@@ -22,43 +26,90 @@ def solve_synonym(
     update_attributes_rule : Dict[str, List[Tuple[str, str]]] = {}, 
     exclude_attributes: List[str] = []
     ) -> tuple:
-    
-    old_feature = original.get_feature(uid)
-    new_feature = new.get_feature(new_uid)
-    old_entries = old_feature.to_gff_entry(include_children=True)
+    return next(solve_synonyms(original, new, [(uid, new_uid)], update_attributes_rule, exclude_attributes))
 
-    # delete from map
-    original.pop_feature(uid, include_children=False)
-    
-    if old_feature.feature_type in update_attributes_rule:
-        for old_attribute, new_attribute in update_attributes_rule[old_feature.feature_type]:
-            if (old_attribute in old_feature.attributes) and (new_attribute in new_feature.attributes):
-                old_feature.attributes[old_attribute] = new_feature.attributes[new_attribute]
-    elif 'default' in update_attributes_rule:
-        for old_attribute, new_attribute in update_attributes_rule['default']:
-            if (old_attribute in old_feature.attributes) and (new_attribute in new_feature.attributes):
-                old_feature.attributes[old_attribute] = new_feature.attributes[new_attribute]
-         
-    for key in exclude_attributes:
-        if key in old_feature.attributes:
-                del old_feature.attributes[key]
-    # update IDs
-    old_feature._populate_gid()
-    original.add_feature(old_feature, include_children=False)
+def _subtree(f : GFeature) -> list[tuple[GFeature, GFeature]]:
+    """
+    (feature, parent) pairs of the subtree rooted at f, in preorder (parent of f: None)
+    """
+    res = []
+    todo = [(f, None)]
+    while todo:
+        node, parent = todo.pop()
+        res.append((node, parent))
+        todo.extend((child, node) for child in list(node.children)[::-1])
+    return res
 
+def _rewrite(f : GFeature, new_feature : GFeature, update_attributes_rule : dict, exclude_attributes : list):
+    rule = update_attributes_rule.get(f.feature_type, update_attributes_rule.get('default', []))
+    for old_attribute, new_attribute in rule:
+        if (old_attribute in f.attributes) and (new_attribute in new_feature.attributes):
+            f.attributes[old_attribute] = new_feature.attributes[new_attribute]
+    for key in exclude_attributes:
+        if key in f.attributes:
+            del f.attributes[key]
 
-    # do the same for children
-    for child in old_feature.children[:]:
-        # assign parent uid
-        set_case_insensitive(child.attributes, child.pak, old_feature.aid)
-        child.gid.parent_uid = old_feature.uid
-        solve_synonym(original, child.uid, new, new_uid, 
-                                update_attributes_rule, exclude_attributes)
+@profiled('solve_synonyms')
+def solve_synonyms(
+    original : GAn,
+    new : GAn,
+    pairs : List[Tuple[str, str]],
+    update_attributes_rule : Dict[str, List[Tuple[str, str]]] = {},
+    exclude_attributes : List[str] = []
+    ):
+    """
+    solve_synonym over (uid, new_uid) pairs in one pass: every subtree is removed at once,
+    all attribute rewrites are applied, uids / parent links are recomputed once and the
+    subtrees are re-inserted together (children keep their parent, roots are linked again from their
+    possibly rewritten parent attribute). subtrees must be disjoint; on error they are put back unchanged
+    and the error is re-raised. returns a stream of (old entries, new entries), one per pair;
+    new entries are rendered as the stream is consumed
+    """
+    roots, donors, seen = [], [], set()
+    for uid, new_uid in pairs:
+        root = original.get_feature(uid)
+        for f, _ in _subtree(root):
+            if id(f) in seen:
+                raise ValueError(f'{uid} overlaps the subtree of another pair')
+            seen.add(id(f))
+        roots.append(root)
+        donors.append(new.get_feature(new_uid))
+    if original._profiler is not None:
+        original._profiler.count('synonyms', len(roots))
+    # state of every node, to put the subtrees back if anything below fails
+    saved = [(f, f.attributes.copy(), f.gid.model_copy()) for root in roots for f, _ in _subtree(root)]
+    old_entries = original.pop_features([root.uid for root in roots], include_children=True)
 
-    return (old_entries, old_feature.to_gff_entry(include_children=True))
+    clobbered = set()
+    try:
+        for root, new_feature in zip(roots, donors):
+            nodes = _subtree(root)
+            for f, parent in nodes:
+                _rewrite(f, new_feature, update_attributes_rule, exclude_attributes)
+                if parent is not None:
+                    # assign parent aid / uid (the parent was rewritten first)
+                    set_case_insensitive(f.attributes, f.pak, parent.aid)
+                # update IDs
+                f._populate_gid()
+                if parent is not None:
+                    f.puid = parent.uid
+            for f, _ in nodes:
+                f.children.rekey()
+            # the parent attribute of the root may have been rewritten: resolve it again
+            root.puid = None
+        clobbered = {f.uid for f, _, _ in saved if f.uid in original.features}
+        original.add_features(roots, include_children=True, relink=False)
+    except Exception:
+        added = [f.uid for f, _, _ in saved if f.uid in original.features and f.uid not in clobbered]
+        if added:
+            original.pop_features(added, include_children=False)
+        for f, attributes, gid in saved:
+            f.attributes, f.gid = attributes, gid
+        for f, _, _ in saved:
+            f.children.rekey()
+        original.add_features(roots, include_children=True, relink=False)
+        raise
+    return ((entries, root.to_gff_entry(include_children=True)) for entries, root in zip(old_entries, roots))
 
 def summarize_by_ftype(db : GAn) -> dict[str, list[GFeature]]:
-    out = dict()
-    for ftype in db.ftypes:
-        out[ftype] = [x for x in db.features.values() if x.feature_type == ftype]
-    return out
\ No newline at end of file
+    return {ftype : db.get_features_by_ftype(ftype) for ftype in db.ftypes}
\ No newline at end of file
@@ -1,6 +1,178 @@
+from collections.abc import MutableMapping, MutableSet
+import sys
+
 def load_attributes(s: str, kv_sep: str = '=') -> dict:
+    # keys are interned: the same ~20 keys repeat on every line of an annotation
     return {
-        k.strip(): v.strip()
+        sys.intern(k.strip()): v.strip()
         for x in s.strip().split(';') if x
         for k, v in [x.strip().split(kv_sep, 1)]
-    }
\ No newline at end of file
+    }
+
+def check_attributes(s : str, kv_sep : str = '='):
+    """
+    raises ValueError where load_attributes would fail (a non-empty segment without kv_sep)
+    """
+    for x in s.strip().split(';'):
+        if x and kv_sep not in x.strip():
+            raise ValueError(f'malformed attribute {x.strip()!r} (expected key{kv_sep}value)')
+
+class Attributes(MutableMapping):
+    """
+    attribute column kept as the raw string and parsed (load_attributes) only when touched;
+    get_ci / set_ci are case-insensitive lookups through a lowercase-key index
+    """
+    __slots__ = ('raw', 'kv_sep', '_d', '_lower')
+
+    def __init__(self, raw : str = None, kv_sep : str = '=', data : dict = None):
+        self.raw = raw
+        self.kv_sep = kv_sep
+        self._d = dict(data) if data is not None else (None if raw else {})
+        self._lower = None
+
+    @property
+    def parsed(self) -> bool:
+        return self._d is not None
+
+    def _dict(self) -> dict:
+        if self._d is None:
+            self._d = load_attributes(self.raw, kv_sep=self.kv_sep)
+            self.raw = None
+        return self._d
+
+    def _lower_index(self) -> dict:
+        if self._lower is None:
+            self._lower = {}
+            for k in self._dict():
+                self._lower.setdefault(k.lower(), k)
+        return self._lower
+
+    def _scan(self, ak : str):
+        """
+        value of ak straight from the raw string, or False when only a full parse can tell
+        """
+        s = self.raw
+        low = s.lower()
+        needle = ak.lower() + self.kv_sep
+        if self.kv_sep == '=' and ' ' in s:
+            return False
+        i = low.find(needle)
+        while i != -1:
+            j = i - 1
+            while j >= 0 and low[j] == ' ':
+                j -= 1
+            if j < 0 or low[j] == ';':
+                break
+            i = low.find(needle, i + 1)
+        if i == -1:
+            return None
+        if low.find(needle, i + 1) != -1:
+            # repeated / case-variant key: dict semantics decide
+            return False
+        i += len(needle)
+        j = s.find(';', i)
+        return s[i:j if j != -1 else None].strip()
+
+    def get_ci(self, ak : str):
+        """
+        value of the first key equal to ak ignoring case (None if absent)
+        """
+        if self._d is None:
+            v = self._scan(ak)
+            if v is not False:
+                return v
+        k = self._lower_index().get(ak.lower())
+        return None if k is None else self._d[k]
+
+    def set_ci(self, ak : str, value : str):
+        k = self._lower_index().get(ak.lower())
+        if k is None:
+            raise KeyError(f'{ak} not found')
+        self._d[k] = value
+
+    def copy(self) -> 'Attributes':
+        return Attributes(self.raw, self.kv_sep, self._d)
+
+    def canonical(self) -> str:
+        """
+        ';'-joined key=value string (the form hashed into uids and written by to_gff_entry)
+        """
+        if self._d is None and self.kv_sep == '=':
+            s = self.raw.strip()
+            if ' ' not in s and ';;' not in s and s[:1] != ';' and s[-1:] != ';':
+                parts = s.split(';')
+                keys = {p.partition('=')[0] for p in parts if '=' in p}
+                if len(keys) == len(parts): # unique keys, no malformed segment
+                    return s
+        return ';'.join([f'{k}={v}' for k, v in self._dict().items()])
+
+    def __getitem__(self, k):
+        return self._dict()[k]
+
+    def __setitem__(self, k, v):
+        d = self._dict()
+        if k not in d and self._lower is not None:
+            self._lower.setdefault(k.lower(), k)
+        d[k] = v
+
+    def __delitem__(self, k):
+        del self._dict()[k]
+        self._lower = None
+
+    def __contains__(self, k) -> bool:
+        return k in self._dict()
+
+    def __iter__(self):
+        return iter(self._dict())
+
+    def __len__(self) -> int:
+        return len(self._dict())
+
+    def __repr__(self) -> str:
+        return repr(self._dict())
+
+class OrderedSet(MutableSet):
+    """
+    insertion-ordered set (dict-backed): O(1) add / discard / membership;
+    indexing ([0], [-1]) is kept for code written against lists
+    """
+    __slots__ = ('_d',)
+
+    def __init__(self, items = ()):
+        self._d = dict.fromkeys(items)
+
+    def add(self, x):
+        self._d[x] = None
+
+    def discard(self, x):
+        self._d.pop(x, None)
+
+    def __getitem__(self, i):
+        if i == 0:
+            return next(iter(self._d))
+        return list(self._d)[i]
+
+    def __contains__(self, x) -> bool:
+        return x in self._d
+
+    def __iter__(self):
+        return iter(self._d)
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def __repr__(self) -> str:
+        return f'OrderedSet({list(self._d)})'
+
+def attributes_str(attributes) -> str:
+    if isinstance(attributes, Attributes):
+        return attributes.canonical()
+    return ';'.join([f'{k}={v}' for k, v in attributes.items()])
+
+def gtf_attributes_str(attributes) -> str:
+    """
+    gtf attribute column: key "value"; key "value";
+    """
+    if isinstance(attributes, Attributes) and not attributes.parsed and attributes.kv_sep == ' ':
+        return attributes.raw.strip()
+    return ' '.join([f'{k} {v};' if v[:1] == '"' else f'{k} "{v}";' for k, v in attributes.items()])
@@ -0,0 +1,192 @@
+"""
+bulk gff3 / gtf writer used by GAn.to_gff
+"""
+from mjol.utils import attributes_str, gtf_attributes_str
+from mjol.store import FeatureStore
+from mjol.sqlite import SqliteStore
+from mjol.compression import open_output, output_compression
+from operator import attrgetter, itemgetter
+import numpy as np
+
+CHUNK = 1 << 16 # lines per write
+
+def _table(gan, parents : bool = True) -> dict:
+    """
+    per-feature columns (features order) and, with parents, the parent position of each feature (-1: none)
+    """
+    if isinstance(gan.features, FeatureStore):
+        store = gan.features
+        store.sync()
+        rows = np.flatnonzero(store.column('alive'))
+        pos = np.full(store.n + 1, -1, dtype=np.int64) # row -> position; row -1 -> -1
+        pos[rows] = np.arange(len(rows))
+        t = {
+            k : np.array(store.pools[k].values, dtype=object)[store.column(k)[rows]].tolist()
+            for k in ['chr', 'src', 'feature_type', 'strand', 'frame']
+        }
+        t['start'] = store.column('start')[rows]
+        t['end'] = store.column('end')[rows]
+        score = store.column('score')[rows]
+        t['score'] = [None if s != s else s for s in score.tolist()]
+        t['attributes'] = [store.attrs[r] for r in rows.tolist()]
+        t['parent'] = pos[store.column('parent')[rows]]
+        return t
+    fs = list(gan.features.values())
+    keys = ['chr', 'src', 'feature_type', 'start', 'end', 'score', 'strand', 'frame', 'attributes']
+    # read field values straight from the instance dicts (pydantic attribute access is slower)
+    cols = list(zip(*map(itemgetter(*keys), [f.__dict__ for f in fs]))) or [()] * len(keys)
+    t = dict(zip(keys, map(list, cols)))
+    t['start'] = np.array(t['start'], dtype=np.int64)
+    t['end'] = np.array(t['end'], dtype=np.int64)
+    if not parents:
+        return t
+    pos = dict(zip(map(attrgetter('gid.uid'), fs), range(len(fs))))
+    t['parent'] = np.array([pos.get(puid, -1) for puid in map(attrgetter('gid.puid'), fs)], dtype=np.int64)
+    return t
+
+def _depth(parent : np.ndarray) -> np.ndarray:
+    depth = np.zeros(len(parent), dtype=np.int64)
+    p = parent.copy()
+    while True:
+        has = p >= 0
+        if not has.any():
+            return depth
+        depth[has] += 1
+        if depth.max() > len(parent):
+            raise RuntimeError('cycle in parent-child relationships')
+        p[has] = parent[p[has]]
+
+def sort_order(t : dict, chr_order : list = None) -> np.ndarray:
+    """
+    positions sorted by (chr, start), parents before children (ties: depth, then features order);
+    chromosomes follow chr_order, then order of first appearance
+    """
+    ranks = {c : i for i, c in enumerate(chr_order or [])}
+    for c in t['chr']:
+        if c not in ranks:
+            ranks[c] = len(ranks)
+    chr_rank = np.array([ranks[c] for c in t['chr']], dtype=np.int64)
+    n = len(chr_rank)
+    return np.lexsort((np.arange(n), _depth(t['parent']), t['start'], chr_rank))
+
+def _reach(chrs : list, ends : list) -> dict:
+    """
+    chr -> furthest end
+    """
+    reach = {}
+    for c, e in zip(chrs, ends):
+        if e > reach.get(c, 0):
+            reach[c] = e
+    return reach
+
+def _headers(gan, reach : dict) -> list[str]:
+    regions = {}
+    others = []
+    for d in gan.directives:
+        key = d.split()
+        if key[0] == '##sequence-region' and len(key) == 4:
+            regions[key[1]] = d
+        elif key[0] not in ['##gff-version', '##FASTA']:
+            others.append(d)
+    res = ['##gff-version 3']
+    for c, e in reach.items():
+        res.append(regions.get(c, f'##sequence-region {c} 1 {e}'))
+    res.extend(others)
+    return [x + '\n' for x in res]
+
+def _rows(gan, sort : bool, chr_order : list) -> tuple:
+    """
+    (rows of the nine gff columns, 1-based, in output order; chr -> furthest end)
+    """
+    t = _table(gan, parents=sort)
+    n = len(t['chr'])
+    if sort:
+        order = sort_order(t, chr_order)
+        idx = order.tolist()
+        take = lambda col: [col[i] for i in idx]
+    else:
+        order = np.arange(n)
+        take = list
+    chrs = take(t['chr'])
+    starts = (t['start'][order] + int(gan.is_0b)).tolist()
+    ends = t['end'][order].tolist()
+    rows = zip(
+        chrs, take(t['src']), take(t['feature_type']), starts, ends,
+        take(t['score']), take(t['strand']), take(t['frame']), take(t['attributes'])
+    )
+    return rows, _reach(chrs, ends)
+
+def _sqlite_rows(gan, sort : bool, chr_order : list) -> tuple:
+    """
+    _rows streamed from a SqliteStore
+    """
+    store = gan.features
+    present = store.chrs()
+    chrs = None
+    if sort:
+        chrs = [c for c in chr_order or [] if c in present]
+        chrs += [c for c in present if c not in chrs]
+    ends = store.reach()
+    offset = int(gan.is_0b)
+    rows = (
+        (chr, src, ftype, start + offset, end, score, strand, frame, attributes)
+        for chr, src, ftype, start, end, score, strand, frame, attributes in store.records(chrs)
+    )
+    return rows, {c : ends[c] for c in chrs or present}
+
+def write_gff(
+    gan,
+    fp : str,
+    sort : bool = False,
+    chr_order : list = None,
+    file_fmt : str = None,
+    headers : bool = False,
+    separators : bool = False,
+    compress : str = 'auto',
+    n_threads : int = 1
+):
+    """
+    writes the features of gan to fp.
+    sort : coordinate order (chr_order first), parents before children; otherwise features order
+    file_fmt : 'gff' (key=value attributes) or 'gtf' (key "value";), default gan.file_fmt
+    headers : ##gff-version / ##sequence-region (+ other directives of gan) on top (gff only)
+    separators : '###' wherever no feature written so far can be the parent of a later one (gff only, with sort)
+    compress : None, 'gzip', 'bgzf', 'zstd' or 'auto' (.gz / .bgz -> bgzf, .zst -> zstd, otherwise plain);
+    bgzf output can be indexed by mjol.regions.index_gff when sorted
+    n_threads : compression threads (bgzf, zstd)
+    """
+    file_fmt = (file_fmt or gan.file_fmt).lower()
+    if file_fmt not in ['gff', 'gff3', 'gtf']:
+        raise ValueError(f'unknown file format {file_fmt} (expected: [gff, gtf])')
+    gtf = file_fmt == 'gtf'
+    compress = output_compression(fp, compress)
+
+    if isinstance(gan.features, SqliteStore):
+        rows, extents = _sqlite_rows(gan, sort, chr_order)
+    else:
+        rows, extents = _rows(gan, sort, chr_order)
+    to_str = gtf_attributes_str if gtf else attributes_str
+    sep = separators and sort and not gtf
+
+    with open_output(fp, compress, n_threads) as out:
+        if headers and not gtf:
+            out.write(''.join(_headers(gan, extents)))
+        buf = []
+        last_chr, reach = None, -1 # furthest end written on last_chr
+        for chr, src, ftype, start, end, score, strand, frame, attributes in rows:
+            if sep:
+                if last_chr is not None and (chr != last_chr or start > reach):
+                    buf.append('###\n')
+                    reach = -1
+                last_chr = chr
+                reach = max(reach, end)
+            buf.append(
+                f'{chr}\t{src}\t{ftype}\t{start}\t{end}\t{score if score and score >= 0.0 else '.'}\t'
+                f'{strand}\t{frame}\t{to_str(attributes)}\n'
+            )
+            if len(buf) >= CHUNK:
+                out.write(''.join(buf))
+                buf.clear()
+        if sep and last_chr is not None:
+            buf.append('###\n')
+        out.write(''.join(buf))
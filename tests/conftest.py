@@ -0,0 +1,70 @@
+import random
+import pytest
+from mjol.gan import GAn
+
+# two coding genes (one per strand, the first with two isoforms) and a non-coding gene on chr2
+GFF3 = """##gff-version 3
+##sequence-region chr1 1 10000
+chr1\ttest\tgene\t1000\t5000\t.\t+\t.\tID=g1;Name=G1
+chr1\ttest\tmRNA\t1000\t5000\t.\t+\t.\tID=t1;Parent=g1
+chr1\ttest\texon\t1000\t1200\t.\t+\t.\tID=e1;Parent=t1
+chr1\ttest\texon\t1500\t1800\t.\t+\t.\tID=e2;Parent=t1
+chr1\ttest\texon\t4000\t5000\t.\t+\t.\tID=e3;Parent=t1
+chr1\ttest\tCDS\t1100\t1200\t.\t+\t0\tID=c1;Parent=t1
+chr1\ttest\tCDS\t1500\t1800\t.\t+\t1\tID=c1;Parent=t1
+chr1\ttest\tCDS\t4000\t4200\t.\t+\t0\tID=c1;Parent=t1
+chr1\ttest\tmRNA\t1000\t5000\t.\t+\t.\tID=t2;Parent=g1
+chr1\ttest\texon\t1000\t1200\t.\t+\t.\tID=e4;Parent=t2
+chr1\ttest\texon\t4000\t5000\t.\t+\t.\tID=e5;Parent=t2
+###
+chr1\ttest\tgene\t8000\t9000\t.\t-\t.\tID=g2;Name=G2
+chr1\ttest\tmRNA\t8000\t9000\t.\t-\t.\tID=t3;Parent=g2
+chr1\ttest\texon\t8000\t8300\t.\t-\t.\tID=e6;Parent=t3
+chr1\ttest\texon\t8600\t9000\t.\t-\t.\tID=e7;Parent=t3
+chr1\ttest\tCDS\t8200\t8300\t.\t-\t2\tID=c3;Parent=t3
+chr1\ttest\tCDS\t8600\t8700\t.\t-\t0\tID=c3;Parent=t3
+###
+chr2\ttest\tgene\t100\t600\t.\t+\t.\tID=g3;Name=G3
+chr2\ttest\tncRNA\t100\t600\t.\t+\t.\tID=t4;Parent=g3
+chr2\ttest\texon\t100\t600\t.\t+\t.\tID=e8;Parent=t4
+"""
+
+GTF = """chr1\ttest\ttranscript\t1000\t5000\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr1\ttest\texon\t1000\t1200\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr1\ttest\texon\t4000\t5000\t.\t+\t.\tgene_id "g1"; transcript_id "t1";
+chr2\ttest\ttranscript\t100\t600\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+chr2\ttest\texon\t100\t600\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+"""
+
+N_FEATURES = GFF3.count('\ttest\t')
+
+@pytest.fixture
+def gff3(tmp_path):
+    p = tmp_path / 'test.gff3'
+    p.write_text(GFF3)
+    return str(p)
+
+@pytest.fixture
+def gtf(tmp_path):
+    p = tmp_path / 'test.gtf'
+    p.write_text(GTF)
+    return str(p)
+
+@pytest.fixture
+def fasta(tmp_path):
+    rng = random.Random(0)
+    p = tmp_path / 'genome.fa'
+    with open(p, 'w') as fh:
+        for name, n in [('chr1', 10000), ('chr2', 1000)]:
+            seq = ''.join(rng.choice('ACGT') for _ in range(n))
+            fh.write(f'>{name}\n')
+            fh.write(''.join(seq[i:i + 60] + '\n' for i in range(0, n, 60)))
+    return str(p)
+
+def build(file_name : str, file_fmt : str = 'gff', coord_system : str = '1b', **kwargs) -> GAn:
+    gan = GAn(file_name=file_name, file_fmt=file_fmt, **kwargs)
+    gan.build_db(coord_system)
+    return gan
+
+def by_aid(gan : GAn, aid : str):
+    return gan.features[gan.lookup[aid][0]]
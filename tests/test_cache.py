@@ -0,0 +1,78 @@
+import os
+import pytest
+from mjol import cache
+from mjol.gan import GAn
+from mjol.store import FeatureStore
+from conftest import N_FEATURES, build, by_aid
+
+def _entries(cache_dir):
+    return sorted(n for n in os.listdir(cache_dir) if n.endswith('.gix'))
+
+def _no_build(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('built instead of loaded from the cache')
+    monkeypatch.setattr(GAn, '_build', fail)
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_cache_hit(gff3, tmp_path, monkeypatch, storage):
+    cache_dir = str(tmp_path / 'cache')
+    ref = build(gff3, storage=storage, cache_dir=cache_dir)
+    assert len(_entries(cache_dir)) == 1
+    _no_build(monkeypatch)
+    gan = build(gff3, storage=storage, cache_dir=cache_dir)
+    # the requested storage is kept
+    assert gan.storage == storage
+    assert isinstance(gan.features, FeatureStore) == (storage == 'columnar')
+    assert sorted(gan.features) == sorted(ref.features)
+    assert [f.aid for f in gan.query('chr1', 1000, 1200)] == [f.aid for f in ref.query('chr1', 1000, 1200)]
+    assert gan.exon_chains() == ref.exon_chains()
+    assert by_aid(gan, 't1').puid == by_aid(gan, 'g1').uid
+    gan.pop_feature(by_aid(gan, 'g3').uid)
+    assert len(gan.features) == N_FEATURES - 3
+
+def test_cache_miss(gff3, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    build(gff3, cache_dir=cache_dir)
+    build(gff3, cache_dir=cache_dir, uid_mode='xxh64') # other settings: another entry
+    assert len(_entries(cache_dir)) == 2
+    with open(gff3, 'a') as fh:
+        fh.write('chr2\ttest\tgene\t700\t800\t.\t+\t.\tID=g4\n')
+    os.utime(gff3, ns=(1, 1)) # a different mtime, whatever the clock resolution
+    assert len(build(gff3, cache_dir=cache_dir).features) == N_FEATURES + 1
+    # the stale entry of the same settings was replaced
+    assert len(_entries(cache_dir)) == 2
+
+def test_cache_follows_code(gff3, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    build(gff3, cache_dir=cache_dir)
+    assert cache.code_key().startswith(cache.mjol_version() + '+')
+    monkeypatch.setattr(cache, 'code_key', lambda : 'other')
+    calls = []
+    _build = GAn._build
+    monkeypatch.setattr(GAn, '_build', lambda self, *args : calls.append(1) or _build(self, *args))
+    build(gff3, cache_dir=cache_dir)
+    assert calls == [1]
+
+def test_cache_unreadable_entry(gff3, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    build(gff3, cache_dir=cache_dir)
+    path = os.path.join(cache_dir, _entries(cache_dir)[0])
+    with open(path, 'wb') as fh:
+        fh.write(b'junk')
+    assert len(build(gff3, cache_dir=cache_dir).features) == N_FEATURES
+    assert os.path.getsize(path) > 4
+
+def test_cache_eviction(gff3, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    for uid_mode in ['sha256', 'xxh64', 'xxh128']:
+        build(gff3, cache_dir=cache_dir, uid_mode=uid_mode)
+    sizes = [os.path.getsize(os.path.join(cache_dir, n)) for n in _entries(cache_dir)]
+    removed = cache.evict(cache_dir, max(sizes))
+    assert len(removed) == 2 and len(_entries(cache_dir)) == 1
+    cache.clear_cache(cache_dir)
+    assert _entries(cache_dir) == []
+
+def test_cache_key_modes(gff3):
+    with pytest.raises(ValueError):
+        cache.input_key(gff3, 'mtime')
+    assert cache.input_key(gff3, 'content') == cache.input_key(gff3, 'content')
@@ -0,0 +1,25 @@
+from mjol.compare import compare
+from conftest import build, by_aid
+
+def test_compare_self(gff3):
+    ref, query = build(gff3), build(gff3)
+    res = compare(ref, query)
+    assert res.class_counts() == {'exact' : 4, 'intron_chain' : 0, 'contained' : 0, 'overlapping' : 0, 'novel' : 0}
+    assert all(v['sensitivity'] == 1.0 and v['precision'] == 1.0 for v in res.stats.values())
+
+def test_compare_classes(gff3, tmp_path):
+    p = tmp_path / 'q.gff3'
+    p.write_text(
+        'chr1\tq\tmRNA\t1010\t4990\t.\t+\t.\tID=q1\n'
+        'chr1\tq\texon\t1010\t1200\t.\t+\t.\tParent=q1\n'
+        'chr1\tq\texon\t4000\t4990\t.\t+\t.\tParent=q1\n'
+        'chr1\tq\tmRNA\t8650\t8950\t.\t-\t.\tID=q2\n'
+        'chr1\tq\texon\t8650\t8950\t.\t-\t.\tParent=q2\n'
+        'chr1\tq\tmRNA\t20000\t21000\t.\t+\t.\tID=q3\n'
+        'chr1\tq\texon\t20000\t21000\t.\t+\t.\tParent=q3\n'
+    )
+    ref, query = build(gff3), build(str(p))
+    res = compare(ref, query)
+    classes = {query.features[uid].aid : c for uid, (c, _) in res.transcripts.items()}
+    assert classes == {'q1' : 'intron_chain', 'q2' : 'contained', 'q3' : 'novel'}
+    assert res.transcripts[by_aid(query, 'q1').uid][1] == by_aid(ref, 't2').uid
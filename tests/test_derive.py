@@ -0,0 +1,35 @@
+import pytest
+from conftest import N_FEATURES, build, by_aid
+
+def _rows(df, kind):
+    return sorted(zip(df[df['kind'] == kind]['start'].tolist(), df[df['kind'] == kind]['end'].tolist()))
+
+def test_derive(gff3):
+    df = build(gff3).derive()
+    assert _rows(df, 'intron') == [(1201, 1499), (1201, 3999), (1801, 3999), (8301, 8599)]
+    # minus strand: the part right of the CDS is upstream
+    assert _rows(df, 'five_prime_UTR') == [(1000, 1099), (8701, 9000)]
+    assert _rows(df, 'three_prime_UTR') == [(4201, 5000), (8000, 8199)]
+    spans = df[df['kind'] == 'span']
+    assert sorted(spans['feature_type'].tolist()) == ['gene'] * 3 + ['mRNA'] * 3 + ['ncRNA']
+
+def test_derive_0b(gff3):
+    df = build(gff3, coord_system='0b').derive(['intron'])
+    assert _rows(df, 'intron')[0] == (1200, 1499)
+
+def test_derive_unknown_kind(gff3):
+    with pytest.raises(ValueError):
+        build(gff3).derive(['exon'])
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_derive_insert(gff3, storage):
+    gan = build(gff3, storage=storage)
+    df = gan.derive(insert=True)
+    # only introns and UTRs are materialized; spans describe existing features
+    assert len(gan.features) == N_FEATURES + 8
+    assert gan.count_ftype('mRNA') == 3 and gan.count_ftype('gene') == 3
+    t1 = by_aid(gan, 't1')
+    assert sorted(c.feature_type for c in t1.children if c.feature_type not in ['exon', 'CDS']) == \
+        ['five_prime_UTR', 'intron', 'intron', 'three_prime_UTR']
+    new = df[df['kind'] != 'span']
+    assert all(gan.features[gan.norm_uid(uid)].puid == gan.norm_uid(puid) for uid, puid in zip(new['uid'], new['puid']))
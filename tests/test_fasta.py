@@ -0,0 +1,54 @@
+import os
+import pytest
+from mjol.fasta import fai_path, reverse_complement, translate
+from conftest import build, by_aid
+
+def _genome(fasta):
+    seqs, name = {}, None
+    for line in open(fasta):
+        if line.startswith('>'):
+            name = line[1:].strip()
+            seqs[name] = ''
+        else:
+            seqs[name] += line.strip()
+    return seqs
+
+@pytest.mark.parametrize('coord_system', ['1b', '0b'])
+def test_transcript_sequences(gff3, fasta, coord_system):
+    gan = build(gff3, coord_system=coord_system)
+    genome = _genome(fasta)
+    seqs = dict(gan.sequences(fasta))
+    assert os.path.exists(fai_path(fasta))
+    chr1 = genome['chr1']
+    assert seqs[by_aid(gan, 't1').uid] == chr1[999:1200] + chr1[1499:1800] + chr1[3999:5000]
+    assert seqs[by_aid(gan, 't3').uid] == reverse_complement(chr1[7999:8300] + chr1[8599:9000])
+    # coordinate order: chromosomes in FASTA order, then start
+    assert [uid for uid, _ in gan.sequences(fasta)][-1] == by_aid(gan, 't4').uid
+
+def test_cds_and_protein(gff3, fasta):
+    gan = build(gff3)
+    chr1 = _genome(fasta)['chr1']
+    t1, t3 = by_aid(gan, 't1').uid, by_aid(gan, 't3').uid
+    cds = dict(gan.sequences(fasta, 'cds'))
+    assert cds[t1] == chr1[1099:1200] + chr1[1499:1800] + chr1[3999:4200]
+    # minus strand: the 5'-most CDS segment (8600-8700) has phase 0
+    assert cds[t3] == reverse_complement(chr1[8199:8300] + chr1[8599:8700])
+    protein = dict(gan.sequences(fasta, 'protein', uids=[gan.uid_str(t1)]))
+    assert list(protein) == [t1]
+    assert protein[t1] == translate(cds[t1])
+
+def test_to_fasta(gff3, fasta, tmp_path):
+    gan = build(gff3)
+    out = str(tmp_path / 'tx.fa')
+    assert gan.to_fasta(out, fasta, width=0) == 4
+    lines = open(out).read().splitlines()
+    assert lines[0] == '>t1 chr1:1000-5000(+)'
+    assert len(lines) == 8
+
+def test_unknown_kind(gff3, fasta):
+    with pytest.raises(ValueError):
+        list(build(gff3).sequences(fasta, 'rna'))
+
+def test_translate():
+    assert translate('ATGGCCTAA') == 'MA*'
+    assert translate('CATGGCC', 1) == 'MA'
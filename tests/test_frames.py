@@ -0,0 +1,55 @@
+import pytest
+from mjol.gan import GAn, load_from_gix
+from conftest import N_FEATURES, build, by_aid
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_dataframe_round_trip(gff3, storage):
+    gan = build(gff3, storage=storage, uid_mode='xxh64')
+    df = gan.to_dataframe()
+    assert len(df) == N_FEATURES
+    assert list(df.columns[:4]) == ['uid', 'chr', 'src', 'feature_type']
+    t1 = by_aid(gan, 't1')
+    row = df[df['uid'] == gan.uid_str(t1.uid)].iloc[0]
+    assert row['puid'] == gan.uid_str(t1.puid)
+    res = GAn.from_dataframe(df, uid_mode='xxh64')
+    assert sorted(res.features) == sorted(gan.features)
+    assert by_aid(res, 't1').puid == t1.puid
+
+def test_dataframe_explode(gff3):
+    df = build(gff3).to_dataframe(explode=True, parents=False)
+    assert 'puid' not in df.columns
+    assert df['Name'].dropna().tolist() == ['G1', 'G2', 'G3']
+
+def test_dataframe_keeps_coordinate_system(gff3):
+    df = build(gff3, coord_system='0b').to_dataframe()
+    assert df.attrs['coord_system'] == '0b'
+    res = GAn.from_dataframe(df)
+    assert res.is_0b and by_aid(res, 'g1').start == 999
+
+def test_from_dataframe_missing_columns(gff3):
+    df = build(gff3).to_dataframe().drop(columns=['strand'])
+    with pytest.raises(ValueError):
+        GAn.from_dataframe(df)
+
+def test_arrow(gff3):
+    pytest.importorskip('pyarrow')
+    table = build(gff3).to_arrow()
+    assert table.num_rows == N_FEATURES
+    assert len(GAn.from_dataframe(table).features) == N_FEATURES
+
+@pytest.mark.parametrize('uid_mode', ['sha256', 'xxh64'])
+def test_dataframe_from_gix(gff3, tmp_path, uid_mode):
+    gan = build(gff3, storage='columnar', uid_mode=uid_mode)
+    path = str(tmp_path / 'a.gix')
+    gan.save_as_gix(path)
+    res = load_from_gix(path)
+    df, ref = res.to_dataframe(explode=True), gan.to_dataframe(explode=True)
+    assert df['uid'].tolist() == ref['uid'].tolist()
+    assert df['puid'].tolist() == ref['puid'].tolist()
+    assert df['ID'].tolist() == ref['ID'].tolist()
+
+def test_arrow_from_gix(gff3, tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'a.gix')
+    build(gff3, storage='columnar').save_as_gix(path)
+    assert load_from_gix(path).to_arrow().num_rows == N_FEATURES
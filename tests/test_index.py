@@ -0,0 +1,83 @@
+import pytest
+from conftest import build, by_aid
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_query_modes(gff3, storage):
+    gan = build(gff3, storage=storage)
+    assert {f.aid for f in gan.query('chr1', 1100, 1600, ftype='exon')} == {'e1', 'e4', 'e2'}
+    assert {f.aid for f in gan.query('chr1', 900, 1250, mode='contained')} == {'e1', 'e4', 'c1'}
+    assert {f.aid for f in gan.query('chr1', 8100, 8200, mode='containing')} == {'g2', 't3', 'e6'}
+    assert gan.query('chr1', 8100, 8200, strand='+') == []
+    assert gan.query('chr3', 1, 100) == []
+    with pytest.raises(ValueError):
+        gan.query('chr1', 1, 10, mode='bogus')
+
+def test_query_follows_add_pop(gff3):
+    gan = build(gff3)
+    assert gan.query('chr2', 100, 200)
+    gan.pop_feature(by_aid(gan, 'g3').uid)
+    assert gan.query('chr2', 100, 200) == []
+
+def test_match_chain(gff3):
+    gan = build(gff3)
+    t1, t2 = by_aid(gan, 't1'), by_aid(gan, 't2')
+    assert gan.match_chain('chr1', '+', [(1000, 1200), (4000, 5000)]) == [t2]
+    assert gan.match_chain('chr1', '+', [(1010, 1200), (4000, 4990)], mode='intron_chain') == [t2]
+    assert gan.match_chain('chr1', '+', [(1010, 1200), (4000, 4990)], mode='fuzzy', k=5) == []
+    assert gan.match_chain('chr1', '+', [(1010, 1200), (4000, 4990)], mode='fuzzy', k=10) == [t2]
+    assert gan.match_transcript(t1) == []
+    with pytest.raises(ValueError):
+        gan.match_chain('chr1', '+', [(1, 2)], mode='bogus')
+
+def test_match_chain_follows_pop(gff3):
+    gan = build(gff3)
+    chain = [(1000, 1200), (1500, 1800), (4000, 5000)]
+    assert [f.aid for f in gan.match_chain('chr1', '+', chain)] == ['t1']
+    gan.pop_feature(by_aid(gan, 'e2').uid)
+    assert gan.match_chain('chr1', '+', chain) == []
+    assert {f.aid for f in gan.match_chain('chr1', '+', [(1000, 1200), (4000, 5000)])} == {'t1', 't2'}
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_ftype_index_and_stats(gff3, storage):
+    gan = build(gff3, storage=storage)
+    assert gan.count_ftype('exon') == 8
+    assert [f.aid for f in gan.get_features_by_ftype('mRNA')] == ['t1', 't2', 't3']
+    gan.pop_feature(by_aid(gan, 't2').uid)
+    assert gan.count_ftype('exon') == 6
+    stats = gan.stats()
+    assert stats['features'] == len(gan.features)
+    assert stats['ftypes']['gene']['count'] == 3
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_tree_queries(gff3, storage):
+    gan = build(gff3, storage=storage)
+    g1, t1, e1 = (by_aid(gan, a).uid for a in ['g1', 't1', 'e1'])
+    assert [f.aid for f in gan.get_desc(g1)] == [f.aid for f in gan.iter_desc(g1)]
+    assert gan.subtree_size(g1) == 11 and gan.subtree_size(e1) == 1
+    assert gan.is_ancestor(g1, e1) and not gan.is_ancestor(e1, g1) and not gan.is_ancestor(g1, g1)
+    assert gan.get_ancestor(e1, 'gene').uid == g1 and gan.get_ancestor(e1).uid == g1
+    assert gan.get_ancestor(g1) is None and gan.get_ancestor(t1, 'exon') is None
+    entry = gan.get_feature(g1).to_gff_entry(include_children=True)
+    assert entry.count('\n') == 11 and entry.index('ID=e1;') < entry.index('ID=t2;')
+
+def _tree_state(gan):
+    uids = list(gan.features)
+    return [(gan.subtree_size(u), [f.uid for f in gan.get_desc(u)], getattr(gan.get_ancestor(u), 'uid', None)) for u in uids]
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_tree_index_follows_mutations(gff3, storage):
+    gan = build(gff3, storage=storage)
+    tree = gan._tree_index()
+    t1 = by_aid(gan, 't1')
+    gan.pop_feature(t1.uid)
+    assert gan.subtree_size(by_aid(gan, 'g1').uid) == 4
+    t3 = by_aid(gan, 't3')
+    gan.pop_feature(t3.uid, include_children=False) # its exons / CDSs become roots
+    assert gan.get_ancestor(by_aid(gan, 'e6').uid) is None
+    gan.add_feature(t1)
+    g1 = by_aid(gan, 'g1').uid
+    assert gan.subtree_size(g1) == 11 and gan.is_ancestor(g1, by_aid(gan, 'e1').uid)
+    assert gan._indexes['tree'] is tree # updated, not rebuilt
+    state = _tree_state(gan)
+    del gan._indexes['tree']
+    assert _tree_state(gan) == state
@@ -0,0 +1,23 @@
+from conftest import N_FEATURES, build, by_aid
+from mjol.gan import GAn
+
+def test_profiling(gff3):
+    events = []
+    gan = GAn(file_name=gff3, file_fmt='gff')
+    gan.enable_profiling(hook=lambda event, info : events.append(event))
+    gan.build_db()
+    gan.pop_feature(by_aid(gan, 'g3').uid)
+    report = gan.profile_report()
+    assert {'build_db', 'parse', 'link', 'pop_features'} <= set(report['phases'])
+    assert report['counters']['rows'] == N_FEATURES
+    assert report['counters']['popped'] == 3
+    assert 'build_db' in events and 'pop_features' in events
+    gan.disable_profiling()
+
+def test_profiling_disabled(gff3):
+    gan = build(gff3)
+    try:
+        gan.profile_report()
+    except RuntimeError:
+        return
+    assert False
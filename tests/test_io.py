@@ -0,0 +1,157 @@
+import gzip
+import pickle
+import pytest
+from mjol.base import GFeature, GId, bare_model
+from mjol.gan import GAn, load_from_gix
+from mjol.compare import compare
+from mjol.bgzf import bgzip, is_bgzf
+from mjol.compression import sniff
+from mjol.parser import ParseError
+from mjol.regions import index_gff
+from conftest import GFF3, N_FEATURES, build, by_aid
+
+def _lines(path):
+    return [l for l in open(path) if not l.startswith('#')]
+
+def test_to_gff_round_trip(gff3, tmp_path):
+    gan = build(gff3)
+    out = str(tmp_path / 'out.gff3')
+    gan.to_gff(out, sort=True)
+    assert sorted(_lines(out)) == sorted(l + '\n' for l in GFF3.splitlines() if not l.startswith('#'))
+    assert sorted(build(out).features) == sorted(gan.features)
+
+def test_to_gff_sorted_parents_first(gff3, tmp_path):
+    gan = build(gff3)
+    out = str(tmp_path / 'out.gff3')
+    gan.to_gff(out, sort=True, chr_order=['chr2', 'chr1'], headers=True)
+    lines = _lines(out)
+    assert lines[0].split('\t')[2] == 'gene' and lines[0].startswith('chr2')
+    types = [l.split('\t')[2] for l in lines if l.startswith('chr1')][:3]
+    assert types == ['gene', 'mRNA', 'mRNA']
+
+def test_to_gff_gtf(gff3, tmp_path):
+    out = str(tmp_path / 'out.gtf')
+    build(gff3).to_gff(out, file_fmt='gtf')
+    assert 'ID "g1";' in open(out).read()
+
+@pytest.mark.parametrize('suffix, compression', [('.gz', 'bgzf'), ('.bgz', 'bgzf')])
+def test_compressed_round_trip(gff3, tmp_path, suffix, compression):
+    gan = build(gff3)
+    out = str(tmp_path / ('out.gff3' + suffix))
+    gan.to_gff(out, sort=True)
+    assert sniff(out) == compression
+    assert sorted(build(out, n_workers=2).features) == sorted(gan.features)
+
+def test_gzip_input(gff3, tmp_path):
+    out = tmp_path / 'in.gff3.gz'
+    out.write_bytes(gzip.compress(GFF3.encode()))
+    assert sniff(str(out)) == 'gzip'
+    assert len(build(str(out)).features) == N_FEATURES
+
+def test_region_loading(gff3, tmp_path):
+    out = str(tmp_path / 'sorted.gff3.gz')
+    build(gff3).to_gff(out, sort=True)
+    assert is_bgzf(out)
+    index_gff(out)
+    gan = GAn(file_name=out, file_fmt='gff')
+    gan.build_db(regions=['chr1:8100-8200'])
+    assert {f.aid for f in gan.features.values()} == {'g2', 't3', 'e6', 'c3'}
+    assert by_aid(gan, 't3').puid == by_aid(gan, 'g2').uid
+    gan = GAn(file_name=out, file_fmt='gff')
+    gan.build_db(regions=['chr2'])
+    assert len(gan.features) == 3
+
+def test_region_loading_reports_file_lines(tmp_path):
+    p = tmp_path / 'bad.gff3'
+    p.write_text(
+        '##gff-version 3\n' +
+        ''.join(f'chr1\tt\tgene\t{i * 100000 + 1}\t{i * 100000 + 10}\t.\t+\t.\tID=g{i}\n' for i in range(5)) +
+        'chr1\tt\tgene\t900001\t900010\t.\t+\t.\tID=b;foo\n'
+    )
+    out = bgzip(str(p))
+    index_gff(out)
+    with pytest.raises(ParseError, match='line 7'):
+        GAn(file_name=out, file_fmt='gff').build_db(regions=['chr1:900000-900005'])
+
+def test_region_loading_requires_index(gff3):
+    with pytest.raises(Exception):
+        GAn(file_name=gff3, file_fmt='gff').build_db(regions=['chr1'])
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_gix_round_trip(gff3, tmp_path, storage):
+    gan = build(gff3, storage=storage)
+    path = str(tmp_path / 'a.gix')
+    gan.save_as_gix(path)
+    res = load_from_gix(path)
+    assert sorted(res.features) == sorted(gan.features)
+    assert res.iak == gan.iak and res.directives == gan.directives
+    t1 = by_aid(res, 't1')
+    assert t1.puid == by_aid(res, 'g1').uid
+    assert t1.get_chain('exon') == [(1000, 1200), (1500, 1800), (4000, 5000)]
+    out, ref = str(tmp_path / 'out.gff3'), str(tmp_path / 'ref.gff3')
+    res.to_gff(out, sort=True)
+    gan.to_gff(ref, sort=True)
+    assert open(out).read() == open(ref).read()
+
+@pytest.mark.parametrize('uid_mode', ['sha256', 'xxh64', 'seq'])
+def test_gix_loaded_queries(gff3, tmp_path, uid_mode):
+    # every column-backed operation must work on the mmapped store
+    gan = build(gff3, storage='columnar', uid_mode=uid_mode)
+    path = str(tmp_path / 'a.gix')
+    gan.save_as_gix(path)
+    res = load_from_gix(path)
+    assert [f.uid for f in res.query('chr1', 1000, 2000)] == [f.uid for f in gan.query('chr1', 1000, 2000)]
+    assert res.exon_chains() == gan.exon_chains()
+    assert res.count_ftype('exon') == gan.count_ftype('exon') == 8
+    assert res.stats() == gan.stats()
+    g1 = by_aid(res, 'g1').uid
+    assert [f.uid for f in res.get_desc(g1)] == [f.uid for f in gan.get_desc(g1)]
+    assert res.derive().equals(gan.derive())
+    assert compare(gan, res).class_counts()['exact'] == 4
+
+def _legacy_pickle(gan, path):
+    # a GAn as pickled by save_as_gix before the binary format: the old fields only,
+    # features with plain dict attributes / list children and no uid_mode
+    features = {}
+    for uid, f in gan.features.items():
+        features[uid] = bare_model(GFeature, {
+            'chr' : f.chr, 'src' : f.src, 'feature_type' : f.feature_type, 'start' : f.start, 'end' : f.end,
+            'score' : f.score, 'strand' : f.strand, 'frame' : f.frame, 'attributes' : dict(f.attributes),
+            'children' : [], 'iak' : f.iak, 'pak' : f.pak,
+            'gid' : bare_model(GId, {'uid' : f.uid, 'aid' : f.aid, 'paid' : f.paid, 'puid' : f.puid})
+        })
+    legacy = bare_model(GAn, {
+        'file_name' : gan.file_name, 'file_fmt' : gan.file_fmt, 'iak' : gan.iak, 'pak' : gan.pak,
+        'ftypes' : set(gan.ftypes), 'features' : features, 'lookup' : {k : list(v) for k, v in gan.lookup.items()},
+        'is_0b' : gan.is_0b
+    })
+    with open(path, 'wb') as fh:
+        pickle.dump(legacy, fh)
+
+@pytest.mark.parametrize('coord_system', ['1b', '0b'])
+def test_legacy_gix(gff3, tmp_path, coord_system):
+    gan = build(gff3, coord_system=coord_system)
+    path = str(tmp_path / 'legacy.gix')
+    _legacy_pickle(gan, path)
+    res = load_from_gix(path)
+    assert list(res.features) == list(gan.features) and res.is_0b == gan.is_0b
+    g1 = by_aid(res, 'g1')
+    assert [f.aid for f in res.get_desc(g1.uid)] == [f.aid for f in gan.get_desc(g1.uid)]
+    assert {f.aid for f in res.query('chr1', 8100, 8200)} == {'g2', 't3', 'e6', 'c3'}
+    res.pop_feature(g1.uid)
+    res.add_feature(g1)
+    assert len(res.features) == N_FEATURES
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_gix_lookup_order(gff3, tmp_path, storage):
+    gan = build(gff3, storage=storage)
+    gan.pop_feature(by_aid(gan, 'g1').uid, include_children=False)
+    g3 = by_aid(gan, 'g3')
+    gan.pop_feature(g3.uid)
+    gan.add_feature(g3) # re-added: moves to the end
+    path = str(tmp_path / 'a.gix')
+    gan.save_as_gix(path)
+    res = load_from_gix(path)
+    assert res.aids == gan.aids
+    res.lookup['t4'] # materialised buckets keep their place
+    assert list(res.lookup) == gan.aids
@@ -0,0 +1,109 @@
+import pytest
+from mjol.gan import GAn
+from mjol.tools import solve_synonym, solve_synonyms
+from conftest import N_FEATURES, build, by_aid
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_pop_and_add(gff3, storage):
+    gan = build(gff3, storage=storage)
+    g1 = by_aid(gan, 'g1')
+    entries = gan.pop_feature(g1.uid)
+    assert entries.count('\n') == 11
+    assert len(gan.features) == N_FEATURES - 11
+    assert 'g1' not in gan.lookup and 't1' not in gan.lookup
+    gan.add_feature(g1)
+    assert len(gan.features) == N_FEATURES
+    assert by_aid(gan, 't1').puid == by_aid(gan, 'g1').uid
+
+def test_pop_features_batch(gff3):
+    gan = build(gff3)
+    gan.pop_features([by_aid(gan, 'g2').uid, by_aid(gan, 'g3').uid])
+    assert len(gan.features) == 11
+    with pytest.raises(KeyError):
+        gan.pop_feature('missing')
+
+def test_pop_without_children_keeps_subtree_detached(gff3):
+    gan = build(gff3)
+    t3 = by_aid(gan, 't3')
+    gan.pop_feature(t3.uid, include_children=False)
+    assert t3 not in by_aid(gan, 'g2').children
+    assert len(gan.features) == N_FEATURES - 1
+
+def test_solve_synonym(gff3, tmp_path):
+    original = build(gff3)
+    p = tmp_path / 'new.gff3'
+    p.write_text('chr1\tnew\tgene\t1000\t5000\t.\t+\t.\tID=NEW1;Name=New\n')
+    new = build(str(p))
+    old, entries = solve_synonym(original, by_aid(original, 'g1').uid, new, by_aid(new, 'NEW1').uid, {'gene' : [('ID', 'ID'), ('Name', 'Name')]})
+    assert 'ID=g1' in old and 'ID=NEW1;Name=New' in entries
+    assert 'g1' not in original.lookup
+    assert len(original.features) == N_FEATURES
+    g = by_aid(original, 'NEW1')
+    assert all(c.puid == g.uid for c in g.children)
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_solve_synonym_relinks_root(gff3, tmp_path, storage):
+    original = build(gff3, storage=storage)
+    p = tmp_path / 'new.gff3'
+    p.write_text('chr1\tnew\tmRNA\t1000\t5000\t.\t+\t.\tID=T1;Parent=g2\n')
+    new = build(str(p))
+    solve_synonym(original, by_aid(original, 't1').uid, new, by_aid(new, 'T1').uid, {'mRNA' : [('ID', 'ID'), ('Parent', 'Parent')]})
+    t, g1, g2 = by_aid(original, 'T1'), by_aid(original, 'g1'), by_aid(original, 'g2')
+    assert t.puid == g2.uid
+    assert t in g2.children and t not in g1.children
+    assert all(c.puid == t.uid for c in t.children)
+
+def test_solve_synonym_restores_on_error(gff3, tmp_path, monkeypatch):
+    original = build(gff3)
+    p = tmp_path / 'new.gff3'
+    p.write_text('chr1\tnew\tgene\t1000\t5000\t.\t+\t.\tID=NEW1;Name=New\n')
+    new = build(str(p))
+    g1 = by_aid(original, 'g1')
+    entry = g1.to_gff_entry(include_children=True)
+    add_features, calls = GAn.add_features, []
+    def fail_once(self, features, **kwargs):
+        # fails half way through the first insertion
+        calls.append(1)
+        if len(calls) == 1:
+            add_features(self, [features[0]], include_children=False)
+            raise RuntimeError('boom')
+        return add_features(self, features, **kwargs)
+    monkeypatch.setattr(GAn, 'add_features', fail_once)
+    with pytest.raises(RuntimeError, match='boom'):
+        solve_synonym(original, g1.uid, new, by_aid(new, 'NEW1').uid, {'gene' : [('ID', 'ID'), ('Name', 'Name')]})
+    monkeypatch.undo()
+    assert len(original.features) == N_FEATURES
+    assert 'NEW1' not in original.lookup
+    g1 = by_aid(original, 'g1')
+    assert g1.to_gff_entry(include_children=True) == entry
+    assert by_aid(original, 't1').puid == g1.uid
+
+def test_solve_synonyms_batch(gff3, tmp_path):
+    original = build(gff3)
+    p = tmp_path / 'new.gff3'
+    p.write_text('chr1\tnew\tgene\t1000\t5000\t.\t+\t.\tID=NEW1\nchr1\tnew\tgene\t8000\t9000\t.\t-\t.\tID=NEW2\n')
+    new = build(str(p))
+    rule = {'gene' : [('ID', 'ID')]}
+    pairs = [(by_aid(original, a).uid, by_aid(new, b).uid) for a, b in [('g1', 'NEW1'), ('g2', 'NEW2')]]
+    res = list(solve_synonyms(original, new, pairs, rule))
+    assert [old.count('\n') for old, _ in res] == [11, 6]
+    assert 'ID=NEW2' in res[1][1]
+    assert len(original.features) == N_FEATURES
+    assert by_aid(original, 't3').puid == by_aid(original, 'NEW2').uid
+    # overlapping subtrees are rejected before anything is removed
+    with pytest.raises(ValueError):
+        solve_synonyms(original, new, [(by_aid(original, 'NEW1').uid, pairs[0][1]), (by_aid(original, 't1').uid, pairs[1][1])], rule)
+    assert len(original.features) == N_FEATURES
+
+def test_collisions_resolve_to_nearest(tmp_path):
+    p = tmp_path / 'par.gff3'
+    p.write_text(
+        'chrX\tt\tgene\t100\t500\t.\t+\t.\tID=par\n'
+        'chrY\tt\tgene\t100\t500\t.\t+\t.\tID=par\n'
+        'chrY\tt\tmRNA\t100\t500\t.\t+\t.\tID=tx;Parent=par\n'
+        'chrX\tt\tmRNA\t100\t500\t.\t+\t.\tID=tx;Parent=par\n'
+    )
+    gan = build(str(p))
+    for uid in gan.lookup['tx']:
+        f = gan.features[uid]
+        assert gan.features[f.puid].chr == f.chr
@@ -0,0 +1,42 @@
+import os
+import pytest
+import mjol.gan
+from mjol.parser import ParseError
+from conftest import GFF3, N_FEATURES, build
+
+@pytest.fixture
+def cpus(monkeypatch):
+    # several small shards on any machine
+    monkeypatch.setattr(os, 'process_cpu_count', lambda : 4)
+    monkeypatch.setattr(mjol.gan, 'SHARD_BYTES', 256)
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_parallel_matches_serial(gff3, cpus, storage):
+    ref = build(gff3, storage=storage)
+    gan = build(gff3, storage=storage, n_workers=4)
+    assert list(gan.features) == list(ref.features)
+    assert {aid : list(uids) for aid, uids in gan.lookup.items()} == {aid : list(uids) for aid, uids in ref.lookup.items()}
+    assert gan.directives == ref.directives
+    assert [c.uid for c in gan.features[gan.lookup['t1'][0]].children] == [c.uid for c in ref.features[ref.lookup['t1'][0]].children]
+
+def test_parallel_parse_error_reports_file_line(tmp_path, cpus):
+    lines = GFF3.splitlines(True)
+    lines.insert(20, 'chr2\tbad\n')
+    p = tmp_path / 'bad.gff3'
+    p.write_text(''.join(lines))
+    with pytest.raises(ParseError, match='line 21:'):
+        build(str(p), n_workers=4)
+    with pytest.raises(ParseError, match='line 21:'):
+        build(str(p))
+
+def test_parallel_stops_at_fasta(tmp_path, cpus):
+    p = tmp_path / 'fasta.gff3'
+    p.write_text(GFF3 + '##FASTA\n>chr1\n' + 'ACGT\tnot\ta\tfeature\n' * 200)
+    gan = build(str(p), n_workers=4)
+    assert len(gan.features) == N_FEATURES
+    assert gan.directives[-1] == '##FASTA'
+
+def test_workers_capped_at_cpus(gff3, monkeypatch):
+    monkeypatch.setattr(os, 'process_cpu_count', lambda : 1)
+    monkeypatch.setattr(mjol.gan, 'ProcessPoolExecutor', None) # a pool would fail
+    assert len(build(gff3, n_workers=8).features) == N_FEATURES
@@ -0,0 +1,50 @@
+import pytest
+from mjol.parser import FLUSH, parse_lines
+from conftest import GFF3, N_FEATURES, build, by_aid
+
+def test_parse_lines_rows_and_directives():
+    directives = []
+    rows = list(parse_lines(GFF3.splitlines(True), 'gff', directives))
+    assert directives == ['##gff-version 3', '##sequence-region chr1 1 10000']
+    assert rows.count(FLUSH) == 2
+    rows = [r for r in rows if r is not FLUSH]
+    assert len(rows) == N_FEATURES
+    assert rows[0]['start'] == 1000 and rows[0]['score'] is None
+    assert rows[0]['attributes'].get_ci('id') == 'g1'
+
+def test_parse_lines_stops_at_fasta():
+    lines = GFF3.splitlines(True)[:4] + ['##FASTA\n', '>chr1\n', 'ACGT\n']
+    assert len([r for r in parse_lines(lines, 'gff') if r is not FLUSH]) == 2
+
+def test_parse_lines_reports_line_numbers():
+    with pytest.raises(ValueError, match='line 2'):
+        list(parse_lines(['##gff-version 3\n', 'chr1\tx\tgene\n'], 'gff'))
+    with pytest.raises(ValueError, match='line 1'):
+        list(parse_lines(['chr1\tx\tgene\tA\t10\t.\t+\t.\tID=a\n'], 'gff'))
+
+def test_build_db_links_parents(gff3):
+    gan = build(gff3)
+    assert len(gan.features) == N_FEATURES
+    assert gan.ftypes == {'gene', 'mRNA', 'ncRNA', 'exon', 'CDS'}
+    t1 = by_aid(gan, 't1')
+    assert t1.puid == by_aid(gan, 'g1').uid
+    assert [c.aid for c in t1.children if c.feature_type == 'exon'] == ['e1', 'e2', 'e3']
+    assert len(gan.lookup['c1']) == 3
+
+def test_build_db_gtf(gtf):
+    gan = build(gtf, 'gtf', iak='transcript_id', pak='gene_id')
+    assert len(gan.features) == 5
+    t1 = gan.features[gan.lookup['"t1"'][0]]
+    assert (t1.feature_type, t1.attributes.get_ci('GENE_ID')) == ('transcript', '"g1"')
+
+def test_0b_coordinates(gff3):
+    gan = build(gff3, coord_system='0b')
+    assert (by_aid(gan, 'g1').start, by_aid(gan, 'g1').end) == (999, 5000)
+
+def test_invalid_settings(gff3):
+    with pytest.raises(ValueError):
+        build(gff3, coord_system='2b')
+    with pytest.raises(ValueError):
+        build(gff3, storage='bogus')
+    with pytest.raises(ValueError):
+        build(gff3, uid_mode='md5')
@@ -0,0 +1,64 @@
+import pytest
+from mjol.gan import load_from_sqlite
+from mjol.store import FeatureStore
+from conftest import N_FEATURES, build, by_aid
+
+@pytest.mark.parametrize('storage', ['columnar', 'sqlite'])
+def test_storage_matches_dict(gff3, tmp_path, storage):
+    ref = build(gff3)
+    kw = {'db_path' : str(tmp_path / 'a.db')} if storage == 'sqlite' else {}
+    gan = build(gff3, storage=storage, **kw)
+    assert sorted(gan.features) == sorted(ref.features)
+    assert set(gan.lookup) == set(ref.lookup)
+    t1 = by_aid(gan, 't1')
+    assert t1.puid == by_aid(ref, 't1').puid
+    assert t1.get_chain('exon') == by_aid(ref, 't1').get_chain('exon')
+    out, ref_out = tmp_path / 'out.gff3', tmp_path / 'ref.gff3'
+    gan.to_gff(str(out), sort=True)
+    ref.to_gff(str(ref_out), sort=True)
+    assert out.read_text() == ref_out.read_text()
+
+def test_columnar_store(gff3):
+    gan = build(gff3, storage='columnar')
+    assert isinstance(gan.features, FeatureStore)
+    assert len(gan.features) == N_FEATURES
+
+def test_sqlite_reopen(gff3, tmp_path):
+    db = str(tmp_path / 'a.db')
+    gan = build(gff3, storage='sqlite', db_path=db)
+    uids = sorted(gan.features)
+    gan.features.sync()
+    res = load_from_sqlite(db)
+    assert sorted(res.features) == uids
+    assert res.count_ftype('exon') == 8
+    assert [f.aid for f in res.query('chr1', 1100, 1600, ftype='exon')] == ['e1', 'e4', 'e2']
+
+def test_sqlite_small_cache_keeps_one_view_per_row(gff3, tmp_path):
+    gan = build(gff3, storage='sqlite', db_path=str(tmp_path / 'a.db'), cache_size=4)
+    g2 = by_aid(gan, 'g2')
+    t3 = g2.children[0]
+    for uid in list(gan.features): # cycles every row through the cache
+        gan.features[uid]
+    assert gan.features[g2.uid] is g2 and by_aid(gan, 't3') is t3
+    e6 = by_aid(gan, 'e6')
+    assert e6 in t3.children
+    gan.pop_feature(e6.uid)
+    # the held views see the removal
+    assert e6 not in t3.children and g2.to_gff_entry(include_children=True).count('\n') == 5
+    gan.add_feature(e6)
+    assert e6 in t3.children and g2.to_gff_entry(include_children=True).count('\n') == 6
+    assert len(gan.features) == N_FEATURES
+    # evicted but held views are written back on sync
+    t3.attributes['note'] = 'x'
+    for uid in list(gan.features):
+        gan.features[uid]
+    gan.features.sync()
+    res = load_from_sqlite(str(tmp_path / 'a.db'))
+    assert res.features[t3.uid].attributes['note'] == 'x'
+
+def test_sqlite_children_are_lazy(gff3, tmp_path):
+    gan = build(gff3, storage='sqlite', db_path=str(tmp_path / 'a.db'), cache_size=2)
+    g1 = by_aid(gan, 'g1')
+    assert len(gan.features._live) == 1 # the subtree is not materialised
+    assert [c.aid for c in g1.children] == ['t1', 't2']
+    assert len(list(g1.iter_desc())) == 10
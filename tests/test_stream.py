@@ -0,0 +1,51 @@
+import pytest
+from mjol.bgzf import bgzip
+from mjol.parser import ParseError
+from mjol.regions import index_gff
+from mjol.stream import stream_features
+from conftest import build
+
+def test_stream_filters(gff3):
+    assert [f.aid for f in stream_features(gff3, 'gff', ftype='gene')] == ['g1', 'g2', 'g3']
+    assert [f.aid for f in stream_features(gff3, 'gff', chr='chr2')] == ['g3', 't4', 'e8']
+    assert [f.aid for f in stream_features(gff3, 'gff', attr_filter={'name' : ['G2', 'G3']})] == ['g2', 'g3']
+    assert [f.aid for f in stream_features(gff3, 'gff', attr_filter={'ID' : lambda v : v.startswith('t')})] == ['t1', 't2', 't3', 't4']
+    assert [f.aid for f in stream_features(gff3, 'gff', region='chr1:8100-8200')] == ['g2', 't3', 'e6', 'c3']
+
+def test_stream_matches_build(gff3):
+    gan = build(gff3, uid_mode='xxh64')
+    for f in stream_features(gff3, 'gff', uid_mode='xxh64'):
+        assert f.uid in gan.features and gan.features[f.uid].aid == f.aid
+
+def test_stream_subtrees(gff3):
+    trees = list(stream_features(gff3, 'gff', ftype='mRNA', subtrees=True))
+    assert [f.aid for f in trees] == ['t1', 't2', 't3']
+    t1 = trees[0]
+    assert len(t1.children) == 6 and all(c.puid == t1.uid for c in t1.children)
+    # a match inside an open subtree is attached, not repeated
+    genes = list(stream_features(gff3, 'gff', attr_filter={'ID' : ['g1', 't1']}, subtrees=True))
+    assert [f.aid for f in genes] == ['g1'] and len(list(genes[0].iter_desc())) == 10
+
+def test_stream_gtf(gtf):
+    assert [f.feature_type for f in stream_features(gtf, 'gtf', attr_filter={'transcript_id' : 't2'})] == ['transcript', 'exon']
+
+def test_stream_errors(tmp_path):
+    p = tmp_path / 'bad.gff3'
+    p.write_text('chr1\tt\tgene\t1\t10\t.\t+\t.\tID=a\nchr1\tt\tgene\t1\t10\t.\t+\t.\tID=b;foo\n')
+    with pytest.raises(ParseError, match='line 2'):
+        list(stream_features(str(p), 'gff'))
+    p.write_text('chr1\tt\tgene\tx\t10\t.\t+\t.\tID=a\n')
+    with pytest.raises(ParseError, match='line 1'):
+        list(stream_features(str(p), 'gff'))
+
+def test_stream_region_errors_report_file_lines(tmp_path):
+    p = tmp_path / 'bad.gff3'
+    p.write_text(
+        '##gff-version 3\n' +
+        ''.join(f'chr1\tt\tgene\t{i * 100000 + 1}\t{i * 100000 + 10}\t.\t+\t.\tID=g{i}\n' for i in range(5)) +
+        'chr1\tt\tgene\t900001\t900010\t.\t+\t.\tID=b;foo\n'
+    )
+    out = bgzip(str(p))
+    index_gff(out)
+    with pytest.raises(ParseError, match='line 7'):
+        list(stream_features(out, 'gff', region='chr1:900000-900005'))
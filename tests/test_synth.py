@@ -0,0 +1,19 @@
+import os
+import sys
+from conftest import build
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+from synth import generate
+
+def test_generate_builds(tmp_path):
+    out = str(tmp_path / 'synth.gff3')
+    n = generate(out, genes=30, isoforms=3, exons=5, chrs=2, collision_rate=0.1, seed=1)
+    gan = build(out)
+    assert len(gan.features) == n
+    assert gan.count_ftype('gene') > 30 # plus the PAR-like copies
+    orphans = [f for f in gan.features.values() if f.paid and f.puid is None]
+    assert orphans == []
+
+def test_generate_gtf(tmp_path):
+    out = str(tmp_path / 'synth.gtf')
+    assert generate(out, genes=5, file_fmt='gtf') == sum(1 for _ in open(out))
@@ -0,0 +1,72 @@
+import pytest
+from mjol.utils import Attributes
+from conftest import N_FEATURES, build, by_aid
+
+@pytest.mark.parametrize('uid_mode', ['sha256', 'xxh64', 'xxh128', 'seq'])
+def test_uid_modes(gff3, uid_mode):
+    gan = build(gff3, uid_mode=uid_mode)
+    assert len(gan.features) == N_FEATURES
+    g1 = by_aid(gan, 'g1')
+    assert gan.get_feature(gan.uid_str(g1.uid)) is g1
+    assert by_aid(gan, 't1').puid == g1.uid
+    if uid_mode == 'seq':
+        assert sorted(gan.features) == list(range(N_FEATURES))
+
+def test_uids_are_deterministic(gff3):
+    assert build(gff3, uid_mode='xxh64').uids == build(gff3, uid_mode='xxh64').uids
+
+def test_attributes_lazy_and_case_insensitive():
+    a = Attributes('ID=g1;Name=G1;gene_type=protein_coding')
+    assert a.get_ci('name') == 'G1' and not a.parsed
+    assert a.get_ci('missing') is None
+    assert a.canonical() == 'ID=g1;Name=G1;gene_type=protein_coding'
+    a.set_ci('NAME', 'G2')
+    assert a['Name'] == 'G2' and a.parsed
+    assert a.canonical() == 'ID=g1;Name=G2;gene_type=protein_coding'
+    g = Attributes('gene_id "g1"; transcript_id "t1";', kv_sep=' ')
+    assert g.get_ci('TRANSCRIPT_ID') == '"t1"'
+
+@pytest.mark.parametrize('uid_mode', ['xxh64', 'seq'])
+def test_add_features_rekeys_other_uid_modes(gff3, uid_mode):
+    gan = build(gff3, uid_mode=uid_mode)
+    donor = build(gff3) # sha256
+    g1 = by_aid(donor, 'g1')
+    gan.pop_feature(by_aid(gan, 'g1').uid)
+    gan.add_feature(g1)
+    assert len(gan.features) == N_FEATURES
+    assert all(isinstance(uid, int) for uid in gan.features)
+    g = by_aid(gan, 'g1')
+    assert g is not g1 and g.uid_mode == uid_mode
+    if uid_mode == 'xxh64':
+        assert g.uid == build(gff3, uid_mode='xxh64').lookup['g1'][0]
+    t1 = by_aid(gan, 't1')
+    assert t1.puid == g.uid and g.children.get(t1.uid) is t1
+    assert {e.puid for e in t1.children} == {t1.uid}
+    # the donor keeps its own (sha256) features and indexes
+    assert g1.uid_mode == 'sha256' and by_aid(donor, 'g1') is g1
+    assert all(donor.features[uid].uid == uid for uid in donor.features)
+    assert by_aid(donor, 't1').puid == g1.uid and len(g1.children) == 2
+
+def test_add_features_seq_handles_from_another_gan(gff3):
+    gan, donor = build(gff3, uid_mode='seq'), build(gff3, uid_mode='seq')
+    g2 = by_aid(donor, 'g2')
+    uids = {aid : by_aid(donor, aid).uid for aid in ['g2', 't3', 'e6']}
+    gan.add_features([g2], relink=False) # handles already taken here: copies get new ones
+    assert len(gan.features) == N_FEATURES + 6
+    assert {aid : by_aid(donor, aid).uid for aid in uids} == uids
+    new = gan.features[gan.lookup['g2'][-1]]
+    assert new is not g2 and new.uid >= N_FEATURES
+    assert all(c.puid == new.uid for c in new.children)
+
+@pytest.mark.parametrize('raw', ['ID=a;foo', 'ID=a; ;Name=b'])
+def test_malformed_attributes_are_rejected(raw):
+    a = Attributes(raw)
+    with pytest.raises(ValueError):
+        a.canonical()
+
+def test_build_rejects_malformed_attributes(tmp_path):
+    p = tmp_path / 'bad.gff3'
+    p.write_text('chr1\tt\tgene\t1\t10\t.\t+\t.\tID=a\nchr1\tt\tgene\t1\t10\t.\t+\t.\tID=b;foo\n')
+    for uid_mode in ['sha256', 'seq']:
+        with pytest.raises(ValueError, match='line 2'):
+            build(str(p), uid_mode=uid_mode)